@@ -0,0 +1,62 @@
+"""
+嵌入批次排程模組 - 依 Token 長度排序並在 Token 預算內組成動態批次
+"""
+from typing import List, Optional
+
+
+def estimate_token_lengths(texts: List[str], tokenizer=None,
+                           max_seq_length: Optional[int] = None) -> List[int]:
+    """
+    估計每段文字送入模型時的 Token 數（超過最大序列長度的部分會被截斷）
+
+    Args:
+        texts: 文字列表
+        tokenizer: Hugging Face tokenizer（可選，未提供時以字元數估計）
+        max_seq_length: 模型最大序列長度（可選）
+
+    Returns:
+        Token 數列表
+    """
+    if not texts:
+        return []
+    if tokenizer is not None:
+        encoded = tokenizer(texts, add_special_tokens=True)['input_ids']
+        lengths = [len(ids) for ids in encoded]
+    else:
+        lengths = [len(text) + 2 for text in texts]
+    if max_seq_length:
+        lengths = [min(length, max_seq_length) for length in lengths]
+    return lengths
+
+
+def plan_batches(lengths: List[int], max_batch_size: int, token_budget: int) -> List[List[int]]:
+    """
+    依長度由長到短排序，組成填充後 Token 數不超過預算的批次
+
+    批次內每段文字都會填充到最長那段的長度，因此成本為「批次大小 × 最長長度」。
+    排序後相近長度的文字同批，短文字的批次可以放入更多文字。
+
+    Args:
+        lengths: 每段文字的 Token 數
+        max_batch_size: 每批最多文字數
+        token_budget: 每批填充後的 Token 總數上限
+
+    Returns:
+        批次列表，每個批次為原始索引的列表
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    batch_max = 0
+    for index in order:
+        length = max(lengths[index], 1)
+        if batch and (len(batch) >= max_batch_size
+                      or (len(batch) + 1) * max(batch_max, length) > token_budget):
+            batches.append(batch)
+            batch = []
+            batch_max = 0
+        batch.append(index)
+        batch_max = max(batch_max, length)
+    if batch:
+        batches.append(batch)
+    return batches
@@ -0,0 +1,492 @@
+"""
+效能基準測試腳本 - 量測各項操作的延遲與吞吐量
+
+使用暫存目錄建立獨立的資料庫、目錄、快照與快取，不會影響專案中的資料。
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import config
+
+
+# config 中所有會被寫入的儲存位置（設定名稱 → 暫存目錄中的名稱）
+_STORAGE_PATHS = {
+    'QDRANT_PATH': "qdrant_data",
+    'NUMPY_STORE_PATH': "numpy_store",
+    'CATALOG_PATH': "catalog.db",
+    'SNAPSHOT_DIR': "snapshots",
+    'EMBEDDING_CACHE_DIR': "embedding_cache",
+    'BULK_JOURNAL_DIR': "ingest_journals",
+    'DATA_DIR': "data",
+}
+
+
+def _use_temp_storage():
+    """將所有儲存位置（資料庫、目錄、快照、快取與匯入紀錄）指向暫存目錄"""
+    temp_dir = tempfile.mkdtemp(prefix="localrag_bench_")
+    for name, file_name in _STORAGE_PATHS.items():
+        setattr(config, name, os.path.join(temp_dir, file_name))
+    return temp_dir
+
+
+def _percentile(values, pct):
+    """計算百分位數"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _random_vectors(count: int, rng) -> np.ndarray:
+    """產生 L2 正規化的隨機向量"""
+    vectors = rng.standard_normal((count, config.VECTOR_SIZE)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_filtered_search(max_datasets: int = 32, points_per_dataset: int = 500,
+                          queries: int = 50):
+    """
+    量測過濾搜尋延遲隨資料集數量增加的變化
+
+    Args:
+        max_datasets: 最多建立的資料集數量
+        points_per_dataset: 每個資料集的點數
+        queries: 每種設定執行的查詢次數
+    """
+    _use_temp_storage()
+    from vector_db import VectorDatabase
+
+    rng = np.random.default_rng(0)
+    db = VectorDatabase()
+    names = [f"dataset-{i:03d}" for i in range(max_datasets)]
+    for name in names:
+        vectors = _random_vectors(points_per_dataset, rng)
+        chunks = [f"{name} chunk {i}" for i in range(points_per_dataset)]
+        db.insert_documents(chunks, vectors.tolist(), "bench.txt", name)
+
+    query_vectors = _random_vectors(queries, rng).tolist()
+    print(f"集合大小: {max_datasets * points_per_dataset} 點 "
+          f"({max_datasets} 個資料集 × {points_per_dataset})")
+    print(f"{'選擇資料集':>10} {'結果數':>6} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+
+    selections = [None]
+    count = 1
+    while count <= max_datasets:
+        selections.append(names[:count])
+        count *= 2
+
+    for selected in selections:
+        latencies = []
+        hits = 0
+        for vector in query_vectors:
+            start = time.perf_counter()
+            results = db.search(vector, data_names=selected, limit=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(results)
+        label = "全部" if selected is None else str(len(selected))
+        print(f"{label:>10} {hits / queries:>6.1f} "
+              f"{statistics.median(latencies):>10.2f} {_percentile(latencies, 99):>10.2f}")
+
+
+def bench_embedding_batching(chunks: int = 2000):
+    """
+    比較模型預設批次與依長度動態組批的嵌入吞吐量
+
+    Args:
+        chunks: 測試的分塊數量（長短混合）
+    """
+    _use_temp_storage()
+    config.EMBEDDING_CACHE_ENABLED = False
+    from document_processor import DocumentProcessor
+
+    rng = np.random.default_rng(0)
+    words = ["alpha", "beta", "gamma", "delta", "資料", "文件", "檢索", "error-0x1F"]
+    texts = [
+        " ".join(rng.choice(words, size=int(rng.integers(5, 250))))
+        for _ in range(chunks)
+    ]
+    processor = DocumentProcessor()
+    processor.embedding_backend.encode(texts[:8])  # 預熱
+
+    start = time.perf_counter()
+    processor.embedding_backend.encode(texts)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    processor._encode(texts)
+    scheduled = time.perf_counter() - start
+
+    print(f"分塊數: {chunks}")
+    print(f"預設批次:   {baseline:.2f} 秒 ({chunks / baseline:.0f} 塊/秒)")
+    print(f"動態組批:   {scheduled:.2f} 秒 ({chunks / scheduled:.0f} 塊/秒)")
+    print(f"加速比:     {baseline / scheduled:.2f}x")
+
+
+def bench_vector_path(chunks: int = 100000):
+    """
+    比較嵌入向量以巢狀 Python 列表或連續 float32 陣列保存的記憶體與時間
+
+    Args:
+        chunks: 向量數量
+    """
+    from embedding_backends import normalize_embeddings
+
+    rng = np.random.default_rng(0)
+    model_output = rng.standard_normal((chunks, config.VECTOR_SIZE)).astype(np.float32)
+
+    # 原本的路徑：模型輸出以 tolist() 轉為巢狀列表後傳遞
+    start = time.perf_counter()
+    as_lists = model_output.tolist()
+    list_seconds = time.perf_counter() - start
+    # 外層列表 + 每列的列表 + 每個元素各自的 float 物件
+    list_bytes = (sys.getsizeof(as_lists) + sum(sys.getsizeof(row) for row in as_lists)
+                  + sys.getsizeof(0.0) * chunks * config.VECTOR_SIZE)
+    del as_lists
+
+    # 目前的路徑：複製為連續 float32 陣列並 L2 正規化
+    start = time.perf_counter()
+    as_array = normalize_embeddings(model_output.copy())
+    array_seconds = time.perf_counter() - start
+    array_bytes = as_array.nbytes
+    del as_array
+
+    print(f"向量數: {chunks} × {config.VECTOR_SIZE} 維")
+    print(f"{'':<12} {'記憶體 (MB)':>12} {'時間 (ms)':>10}")
+    print(f"{'Python 列表':<12} {list_bytes / 1024 / 1024:>12.1f} {list_seconds * 1000:>10.1f}")
+    print(f"{'float32 陣列':<12} {array_bytes / 1024 / 1024:>12.1f} {array_seconds * 1000:>10.1f}")
+    print(f"節省: 記憶體 {list_bytes / array_bytes:.1f}x，時間 {list_seconds / array_seconds:.1f}x "
+          f"（寫入時每批 {config.UPSERT_BATCH_SIZE} 個點轉為列表的成本兩者相同）")
+
+
+# 在子程序中將儲存位置指向暫存目錄後啟動 MCP Server（stdio 模式）
+_SERVER_BOOTSTRAP = (
+    "import json, sys, config\n"
+    "for name, path in json.loads(sys.argv[1]).items(): setattr(config, name, path)\n"
+    "sys.argv = ['mcp_server.py'] + sys.argv[2:]\n"
+    "import mcp_server\n"
+    "mcp_server.main()\n"
+)
+
+
+# 在新的子程序中量測匯入模組的時間（秒）
+_IMPORT_TIMER = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "__import__(sys.argv[1])\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def _import_seconds(module: str) -> float:
+    """在新的 Python 程序中匯入模組所需的秒數（不含直譯器啟動）"""
+    import subprocess
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_TIMER, module],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def bench_startup(runs: int = 5):
+    """
+    量測 MCP Server（stdio 模式）從啟動到回應第一個請求的時間，以及其中匯入模組的成本
+    
+    mcp 套件的 __init__ 會匯入 FastMCP 與 HTTP 傳輸（starlette、uvicorn、SSE、
+    StreamableHTTP），因此 stdio 模式也會付出這部分的匯入時間，另外列出供參考。
+    vector_stores（qdrant_client 與其 gRPC、httpx）在第一次搜尋時才匯入，
+    只計入第一次 search 的時間。
+    
+    Args:
+        runs: 重複啟動次數
+    """
+    import asyncio
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    _use_temp_storage()
+    server_params = StdioServerParameters(
+        command=sys.executable,
+        args=["-c", _SERVER_BOOTSTRAP,
+              json.dumps({name: getattr(config, name) for name in _STORAGE_PATHS}), "bench"],
+        env=dict(os.environ),
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+    async def measure():
+        start = time.perf_counter()
+        with open(os.devnull, "w") as errlog:
+            async with stdio_client(server_params, errlog=errlog) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    await session.call_tool("list_data_sources", arguments={})
+                    listed = time.perf_counter() - start
+                    await session.call_tool("search_documents", arguments={"query": "startup"})
+                    searched = time.perf_counter() - start
+        return listed, searched
+
+    list_times = []
+    search_times = []
+    for _ in range(runs):
+        listed, searched = asyncio.run(measure())
+        list_times.append(listed * 1000)
+        search_times.append(searched * 1000)
+
+    print(f"啟動次數: {runs}")
+    print(f"{'請求':>20} {'中位數 (ms)':>12} {'最大 (ms)':>12}")
+    print(f"{'list_data_sources':>20} {statistics.median(list_times):>12.0f} {max(list_times):>12.0f}")
+    print(f"{'第一次 search':>20} {statistics.median(search_times):>12.0f} {max(search_times):>12.0f}")
+
+    print("其中匯入模組的時間:")
+    for module in ("mcp", "mcp_server", "vector_stores"):
+        seconds = [_import_seconds(module) * 1000 for _ in range(runs)]
+        print(f"{'import ' + module:>20} {statistics.median(seconds):>12.0f} {max(seconds):>12.0f}")
+
+
+def _free_port() -> int:
+    """取得一個未使用的本機埠號"""
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_concurrent_search(clients: int = 50, requests_per_client: int = 10,
+                            points: int = 5000):
+    """
+    以多個並行客戶端透過 StreamableHTTP 呼叫 search_documents，量測延遲分布
+    
+    Args:
+        clients: 並行客戶端數量
+        requests_per_client: 每個客戶端的查詢次數
+        points: 資料庫中的點數
+    """
+    import asyncio
+    import contextlib
+    import io
+    import threading
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    _use_temp_storage()
+    import mcp_server
+    from vector_db import VectorDatabase
+
+    rng = np.random.default_rng(0)
+    db = VectorDatabase()
+    db.insert_documents(
+        [f"bench chunk {i}" for i in range(points)],
+        _random_vectors(points, rng).tolist(),
+        "bench.txt",
+        "bench"
+    )
+
+    port = _free_port()
+    mcp_server.initialize_server(["bench"], vector_db=db, warm_up=False)
+    mcp_server._get_query_encoder().encode("warm up")
+    server = mcp_server.create_http_server("127.0.0.1", port)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    url = f"http://127.0.0.1:{port}{config.MCP_SERVER_PATH}/"
+    latencies = []
+    busy = 0
+
+    async def client(client_id: int):
+        nonlocal busy
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                for i in range(requests_per_client):
+                    # 每個查詢都不同，避免命中結果快取
+                    query = f"client {client_id} query {i} error-{rng.integers(1_000_000)}"
+                    start = time.perf_counter()
+                    result = await session.call_tool("search_documents", arguments={"query": query})
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if result.content[0].text.startswith("錯誤"):
+                        busy += 1
+
+    # 負載期間另一個客戶端持續呼叫不需要模型的 list_data_sources，
+    # 量測搜尋是否阻塞事件迴圈上的其他請求
+    probe_latencies = []
+
+    async def probe(stop: "asyncio.Event"):
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    await session.call_tool("list_data_sources", arguments={})
+                    probe_latencies.append((time.perf_counter() - start) * 1000)
+                    await asyncio.sleep(0.05)
+
+    async def run_all():
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(stop))
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        stop.set()
+        await probe_task
+
+    start = time.perf_counter()
+    # 搜尋日誌寫到 stderr，量測期間略過
+    with contextlib.redirect_stderr(io.StringIO()):
+        asyncio.run(run_all())
+    elapsed = time.perf_counter() - start
+
+    server.should_exit = True
+    thread.join(timeout=5)
+
+    total = clients * requests_per_client
+    print(f"並行客戶端: {clients}，每個 {requests_per_client} 次查詢，集合大小: {points} 點")
+    print(f"搜尋並行上限: {config.MCP_SEARCH_CONCURRENCY}，排隊上限: {config.MCP_SEARCH_QUEUE_SIZE}")
+    print(f"p50: {statistics.median(latencies):.1f} ms")
+    print(f"p99: {_percentile(latencies, 99):.1f} ms")
+    print(f"吞吐量: {total / elapsed:.1f} 查詢/秒")
+    print(f"忙碌拒絕: {busy}")
+    if probe_latencies:
+        print(f"負載期間 list_data_sources p50: {statistics.median(probe_latencies):.1f} ms，"
+              f"p99: {_percentile(probe_latencies, 99):.1f} ms")
+
+
+class _ForwardCostBackend:
+    """
+    模擬運算受限的嵌入模型：每次前向運算有固定成本加上每個文字的成本，
+    且同時只能執行一次（模型已占滿 CPU/GPU），向量仍由原本的後端產生
+    """
+
+    def __init__(self, backend, forward_ms: float, per_text_ms: float):
+        self._backend = backend
+        self._forward_s = forward_ms / 1000
+        self._per_text_s = per_text_ms / 1000
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+    def encode(self, texts, batch_size: int = 32):
+        with self._lock:
+            time.sleep(self._forward_s + self._per_text_s * len(texts))
+        return self._backend.encode(texts, batch_size=batch_size)
+
+
+def bench_query_coalescing(callers: int = 50, queries_per_caller: int = 10,
+                           forward_ms: float = 10.0, per_text_ms: float = 0.5):
+    """
+    比較逐一向量化與合併同時到達的查詢（批次向量化 + 批次搜尋）的吞吐量
+
+    合併省下的是每次模型前向運算與每次搜尋請求的固定成本，因此使用批次搜尋為
+    一次矩陣乘法的 NumPy 儲存（本地 Qdrant 逐一搜尋，看不出差異），並分別量測
+    設定中的後端與模擬每次前向運算有固定成本的運算受限模型（Transformer 的情況）。
+
+    Args:
+        callers: 同時呼叫 search_documents 的協程數
+        queries_per_caller: 每個協程的查詢次數
+        forward_ms: 模擬模型每次前向運算的固定成本（毫秒）
+        per_text_ms: 模擬模型每個查詢文字的成本（毫秒）
+    """
+    import asyncio
+    import contextlib
+    import io
+
+    _use_temp_storage()
+    import mcp_server
+    from query_encoder import QueryEncoder
+    from vector_db import VectorDatabase
+
+    async def caller(prefix: str, caller_id: int):
+        for i in range(queries_per_caller):
+            # 每個查詢都不同，避免命中快取
+            await mcp_server.search_documents(f"{prefix} caller {caller_id} query {i} 檢索")
+
+    async def run(prefix: str):
+        await asyncio.gather(*(caller(prefix, c) for c in range(callers)))
+
+    total = callers * queries_per_caller
+    settings = [
+        ("逐一處理", 0, 1),
+        (f"合併 ({config.QUERY_BATCH_WINDOW_MS} ms, 最多 {config.QUERY_BATCH_MAX_SIZE})",
+         config.QUERY_BATCH_WINDOW_MS, config.QUERY_BATCH_MAX_SIZE),
+    ]
+    saved = (config.QUERY_BATCH_WINDOW_MS, config.QUERY_BATCH_MAX_SIZE,
+             config.VECTOR_STORE, config.SEARCH_MODE)
+    try:
+        # NumPy 儲存的批次搜尋是一次矩陣乘法；本地 Qdrant 逐一搜尋，會掩蓋向量化的差異
+        config.VECTOR_STORE = "numpy"
+        config.SEARCH_MODE = "dense"
+        rng = np.random.default_rng(0)
+        db = VectorDatabase()
+        db.insert_documents(
+            [f"bench chunk {i}" for i in range(1000)],
+            _random_vectors(1000, rng).tolist(),
+            "bench.txt",
+            "bench"
+        )
+        backend = QueryEncoder().embedding_backend
+        backend.encode(["warm up"])
+        backends = [
+            ("設定中的後端", backend),
+            (f"模擬模型 ({forward_ms:g} ms/次 + {per_text_ms:g} ms/查詢)",
+             _ForwardCostBackend(backend, forward_ms, per_text_ms)),
+        ]
+
+        print(f"同時呼叫: {callers}，共 {total} 個查詢")
+        for backend_label, query_backend in backends:
+            print(backend_label)
+            mcp_server.initialize_server(["bench"], vector_db=db, warm_up=False,
+                                         query_encoder=QueryEncoder(query_backend))
+            for label, window_ms, max_size in settings:
+                mcp_server._search_coalescer = None
+                config.QUERY_BATCH_WINDOW_MS = window_ms
+                config.QUERY_BATCH_MAX_SIZE = max_size
+                start = time.perf_counter()
+                with contextlib.redirect_stderr(io.StringIO()):
+                    asyncio.run(run(f"{backend_label} {label}"))
+                elapsed = time.perf_counter() - start
+                print(f"  {label:<24} {total / elapsed:>8.1f} 查詢/秒")
+    finally:
+        (config.QUERY_BATCH_WINDOW_MS, config.QUERY_BATCH_MAX_SIZE,
+         config.VECTOR_STORE, config.SEARCH_MODE) = saved
+        mcp_server._search_coalescer = None
+
+
+BENCHMARKS = {
+    'filtered-search': bench_filtered_search,
+    'embedding-batching': bench_embedding_batching,
+    'startup': bench_startup,
+    'concurrent-search': bench_concurrent_search,
+    'query-coalescing': bench_query_coalescing,
+    'vector-path': bench_vector_path,
+}
+
+
+def main():
+    """主程式入口"""
+    parser = argparse.ArgumentParser(description="Local RAG 效能基準測試")
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        choices=sorted(BENCHMARKS),
+        help="要執行的測試（預設全部）"
+    )
+    args = parser.parse_args()
+
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        print("=" * 60)
+        print(f"基準測試: {name}")
+        print("=" * 60)
+        BENCHMARKS[name]()
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+批次寫入模組 - 分批（可平行）寫入向量儲存，記錄已寫入的批次供中斷後續傳
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows 不支援 flock，不檢查同時匯入
+    fcntl = None
+
+
+def _read_journal(path: str) -> Dict[Tuple[str, str], Dict[str, int]]:
+    """
+    讀取紀錄檔中尚未完成同步的檔案（忽略中斷時寫了一半的最後一行）
+
+    Returns:
+        (資料名稱, 檔名) → {點 ID: chunk_index}
+    """
+    files: Dict[Tuple[str, str], Dict[str, int]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            key = (entry['data_name'], entry['file_name'])
+            if entry.get('done'):
+                files.pop(key, None)
+            else:
+                files.setdefault(key, {}).update(entry['points'])
+    return files
+
+
+def unfinished_files(directory: str = None) -> List[Tuple[str, str]]:
+    """
+    所有匯入紀錄中尚未完成同步的檔案（中斷的匯入），供開啟資料庫時修復資料目錄
+
+    Args:
+        directory: 紀錄檔目錄（預設 config.BULK_JOURNAL_DIR）
+
+    Returns:
+        (資料名稱, 檔名) 列表
+    """
+    directory = directory or config.BULK_JOURNAL_DIR
+    if not os.path.isdir(directory):
+        return []
+    files = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".jsonl"):
+            files.extend(_read_journal(os.path.join(directory, name)))
+    return files
+
+
+class IngestJournal:
+    """
+    匯入紀錄（JSONL，每個資料名稱一個檔案）
+
+    檔案開始同步時附加一行 {data_name, file_name, points: {}}，
+    每寫入完成一批點就附加一行 {data_name, file_name, points: {點 ID: chunk_index}}，
+    檔案完成同步後附加 {data_name, file_name, done: true}。
+    匯入中斷時，下次執行可直接沿用已寫入的點，不必重新嵌入與寫入。
+
+    開啟時取得該資料名稱的獨佔鎖，同一個資料名稱同時只能有一個匯入；
+    不同資料名稱的匯入使用各自的紀錄檔，可以同時進行。
+    """
+
+    def __init__(self, data_name: str, directory: str = None):
+        """
+        Args:
+            data_name: 資料名稱
+            directory: 紀錄檔目錄（預設 config.BULK_JOURNAL_DIR）
+
+        Raises:
+            RuntimeError: 其他程序正在匯入同一個資料名稱
+        """
+        directory = directory or config.BULK_JOURNAL_DIR
+        os.makedirs(directory, exist_ok=True)
+        # 檔名保留可讀的資料名稱，並加上雜湊避免不同名稱替換字元後相同
+        safe_name = re.sub(r"[^\w.-]", "_", data_name)[:64]
+        digest = hashlib.sha1(data_name.encode("utf-8")).hexdigest()[:8]
+        self.path = os.path.join(directory, f"{safe_name}-{digest}.jsonl")
+        self._files: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._lock_file = self._acquire_lock(data_name)
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _acquire_lock(self, data_name: str):
+        """取得資料名稱的獨佔鎖（鎖檔保留不刪除，避免其他程序鎖到已刪除的檔案）"""
+        lock_file = open(self.path + ".lock", "a")
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f"資料名稱 {data_name} 正在由其他程序匯入，請等待完成後再試")
+        return lock_file
+
+    def _load(self):
+        """讀取既有紀錄"""
+        if os.path.exists(self.path):
+            self._files = _read_journal(self.path)
+
+    def _append(self, entry: Dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def committed(self, data_name: str, file_name: str) -> Dict[str, int]:
+        """
+        取得檔案在先前中斷的匯入中已寫入的點
+
+        Returns:
+            點 ID → chunk_index（沒有紀錄時為空字典）
+        """
+        with self._lock:
+            return dict(self._files.get((data_name, file_name), {}))
+
+    def begin_file(self, data_name: str, file_name: str):
+        """
+        檔案開始同步（寫入或刪除任何點之前呼叫），中斷時下次開啟資料庫只需重新統計紀錄中的檔案
+        """
+        with self._lock:
+            if (data_name, file_name) not in self._files:
+                self._files[(data_name, file_name)] = {}
+                self._append({'data_name': data_name, 'file_name': file_name, 'points': {}})
+
+    def record(self, data_name: str, file_name: str, points: Dict[str, int]):
+        """記錄一批已寫入的點"""
+        with self._lock:
+            self._files.setdefault((data_name, file_name), {}).update(points)
+            self._append({'data_name': data_name, 'file_name': file_name, 'points': points})
+
+    def finish_file(self, data_name: str, file_name: str):
+        """檔案已完成同步，之後不再需要其紀錄"""
+        with self._lock:
+            if self._files.pop((data_name, file_name), None) is not None:
+                self._append({'data_name': data_name, 'file_name': file_name, 'done': True})
+
+    def close(self):
+        """關閉紀錄檔（只保留尚未完成的檔案，全部完成時刪除紀錄檔）並釋放鎖"""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+            try:
+                if not self._files:
+                    os.remove(self.path)
+                    return
+                temp_path = self.path + ".tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    for (data_name, file_name), points in self._files.items():
+                        f.write(json.dumps({'data_name': data_name, 'file_name': file_name,
+                                            'points': points}, ensure_ascii=False) + "\n")
+                os.replace(temp_path, self.path)
+            finally:
+                self._lock_file.close()
+
+
+class BulkWriter:
+    """
+    批次寫入器
+
+    點累積到 batch_size 個後送出一次 upsert。連線 Qdrant Server 時以多個執行緒
+    平行寫入（嵌入下一批的同時上傳這一批），同時進行中的批次數量有上限，
+    記憶體用量不會隨文件大小增加；本地檔案模式在呼叫端執行緒中依序寫入。
+    """
+
+    def __init__(self, vector_db, journal: Optional[IngestJournal] = None,
+                 batch_size: int = None, workers: int = None,
+                 log: Callable[[str], None] = print):
+        """
+        Args:
+            vector_db: 向量資料庫實例
+            journal: 匯入紀錄（可選，提供時記錄每個寫入完成的批次）
+            batch_size: 每次寫入的點數（預設 config.UPSERT_BATCH_SIZE）
+            workers: 平行寫入的執行緒數量（預設 config.BULK_WRITE_WORKERS，不支援平行寫入的儲存固定為 1）
+            log: 進度訊息回調（定期回報寫入速度）
+        """
+        self.vector_db = vector_db
+        self.journal = journal
+        self.batch_size = batch_size or config.UPSERT_BATCH_SIZE
+        if not vector_db.store.supports_parallel_writes:
+            # 本地檔案模式與 NumPy 儲存以單一鎖保護，平行寫入沒有效益
+            workers = 1
+        self.workers = workers or config.BULK_WRITE_WORKERS
+        self.log = log
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-write") \
+            if self.workers > 1 else None
+        # 進行中的批次上限：每個執行緒一批寫入中、一批等待中
+        self._slots = threading.BoundedSemaphore(self.workers * 2)
+        self._futures: List[Future] = []
+        self._batch: List = []
+        self._batch_key: Optional[Tuple[str, str]] = None
+
+        self._stats_lock = threading.Lock()
+        self.points_written = 0
+        self._start_time = time.time()
+        self._last_report = self._start_time
+
+    def write(self, chunks: List[str], embeddings: List[List[float]],
+              file_name: str, data_name: str,
+              chunk_hashes: Optional[List[str]] = None,
+              chunk_indexes: Optional[List[int]] = None) -> int:
+        """
+        加入文件分塊（參數同 VectorDatabase.insert_documents），滿一批即送出
+
+        Returns:
+            加入的點數量
+        """
+        count = 0
+        for point in self.vector_db.build_points(chunks, embeddings, file_name, data_name,
+                                                 chunk_hashes=chunk_hashes,
+                                                 chunk_indexes=chunk_indexes):
+            if self._batch and self._batch_key != (data_name, file_name):
+                # 每批只包含同一個檔案的點，紀錄才能對應到檔案
+                self._submit()
+            self._batch_key = (data_name, file_name)
+            self._batch.append(point)
+            count += 1
+            if len(self._batch) >= self.batch_size:
+                self._submit()
+        return count
+
+    def _submit(self):
+        """送出目前累積的一批點"""
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        if self._executor is None:
+            self._upsert(self._batch_key, batch)
+            return
+        self._slots.acquire()
+        future = self._executor.submit(self._upsert, self._batch_key, batch)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upsert(self, key: Tuple[str, str], batch: List):
+        """寫入一批點並記錄"""
+        self.vector_db.upsert_points(batch)
+        if self.journal is not None:
+            self.journal.record(key[0], key[1], {
+                point_id: payload['chunk_index'] for point_id, _, payload in batch
+            })
+        with self._stats_lock:
+            self.points_written += len(batch)
+
+    def wait(self):
+        """送出累積的點並等待所有批次寫入完成（寫入失敗時拋出例外）"""
+        self._submit()
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+        now = time.time()
+        if now - self._last_report >= config.BULK_PROGRESS_INTERVAL:
+            self._last_report = now
+            self.log(f"已寫入 {self.points_written} 個點 ({self.points_per_second:.0f} points/s)")
+
+    @property
+    def points_per_second(self) -> float:
+        """從開始到目前的平均寫入速度"""
+        elapsed = time.time() - self._start_time
+        return self.points_written / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        """等待所有批次寫入完成並關閉執行緒池"""
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
@@ -0,0 +1,224 @@
+"""
+資料目錄模組 - 以 SQLite 維護資料名稱與檔案的統計資訊
+"""
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+class DataCatalog:
+    """
+    資料名稱目錄
+
+    - files: 每個 (資料名稱, 檔名) 的檔案雜湊、分塊數與文字位元組數
+    - data_names: 每個資料名稱的彙總統計，寫入檔案時同步更新
+    列出資料名稱只需讀取 data_names 表，與向量點的數量無關。
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite 檔案路徑
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "data_name TEXT NOT NULL, file_name TEXT NOT NULL, file_hash TEXT, "
+            "chunk_count INTEGER NOT NULL, byte_size INTEGER NOT NULL, "
+            "PRIMARY KEY (data_name, file_name))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS data_names ("
+            "data_name TEXT PRIMARY KEY, file_count INTEGER NOT NULL, "
+            "chunk_count INTEGER NOT NULL, byte_size INTEGER NOT NULL)"
+        )
+
+    def _transaction(self):
+        """開始寫入交易（呼叫端需持有鎖）"""
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def _adjust(self, data_name: str, files: int, chunks: int, size: int):
+        """調整資料名稱的彙總統計，檔案數歸零時移除該資料名稱"""
+        self._conn.execute(
+            "INSERT INTO data_names (data_name, file_count, chunk_count, byte_size) "
+            "VALUES (?, 0, 0, 0) ON CONFLICT(data_name) DO NOTHING",
+            (data_name,)
+        )
+        self._conn.execute(
+            "UPDATE data_names SET file_count = file_count + ?, "
+            "chunk_count = chunk_count + ?, byte_size = byte_size + ? WHERE data_name = ?",
+            (files, chunks, size, data_name)
+        )
+        self._conn.execute(
+            "DELETE FROM data_names WHERE data_name = ? AND file_count <= 0", (data_name,)
+        )
+
+    def record_file(self, data_name: str, file_name: str, file_hash: Optional[str],
+                    chunk_count: int, byte_size: int):
+        """
+        記錄（或覆寫）一個檔案的統計資訊
+
+        Args:
+            data_name: 資料名稱
+            file_name: 檔案名稱
+            file_hash: 檔案內容雜湊
+            chunk_count: 分塊數量
+            byte_size: 分塊文字的 UTF-8 位元組數
+        """
+        with self._lock:
+            self._transaction()
+            try:
+                old = self._conn.execute(
+                    "SELECT chunk_count, byte_size FROM files WHERE data_name = ? AND file_name = ?",
+                    (data_name, file_name)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files "
+                    "(data_name, file_name, file_hash, chunk_count, byte_size) VALUES (?, ?, ?, ?, ?)",
+                    (data_name, file_name, file_hash, chunk_count, byte_size)
+                )
+                if old is None:
+                    self._adjust(data_name, 1, chunk_count, byte_size)
+                else:
+                    self._adjust(data_name, 0, chunk_count - old[0], byte_size - old[1])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove_file(self, data_name: str, file_name: str):
+        """
+        移除一個檔案的記錄
+
+        Args:
+            data_name: 資料名稱
+            file_name: 檔案名稱
+        """
+        with self._lock:
+            self._transaction()
+            try:
+                old = self._conn.execute(
+                    "SELECT chunk_count, byte_size FROM files WHERE data_name = ? AND file_name = ?",
+                    (data_name, file_name)
+                ).fetchone()
+                if old is not None:
+                    self._conn.execute(
+                        "DELETE FROM files WHERE data_name = ? AND file_name = ?",
+                        (data_name, file_name)
+                    )
+                    self._adjust(data_name, -1, -old[0], -old[1])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove_data_name(self, data_name: str):
+        """
+        移除資料名稱及其所有檔案記錄
+
+        Args:
+            data_name: 資料名稱
+        """
+        with self._lock:
+            self._transaction()
+            try:
+                self._conn.execute("DELETE FROM files WHERE data_name = ?", (data_name,))
+                self._conn.execute("DELETE FROM data_names WHERE data_name = ?", (data_name,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_data_names(self) -> List[str]:
+        """取得所有資料名稱（排序）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data_name FROM data_names ORDER BY data_name"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_data_name_stats(self) -> List[Dict]:
+        """
+        取得每個資料名稱的統計資訊
+
+        Returns:
+            包含 data_name、file_count、chunk_count、byte_size 的字典列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data_name, file_count, chunk_count, byte_size "
+                "FROM data_names ORDER BY data_name"
+            ).fetchall()
+        return [
+            {
+                'data_name': row[0],
+                'file_count': row[1],
+                'chunk_count': row[2],
+                'byte_size': row[3]
+            }
+            for row in rows
+        ]
+
+    def get_files(self, data_name: str) -> List[str]:
+        """取得資料名稱下的所有檔名"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_name FROM files WHERE data_name = ? ORDER BY file_name",
+                (data_name,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_file_hashes(self, data_name: str) -> Dict[str, Optional[str]]:
+        """取得資料名稱下每個檔案的檔案雜湊"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_name, file_hash FROM files WHERE data_name = ?",
+                (data_name,)
+            ).fetchall()
+        return dict(rows)
+
+    def total_chunks(self) -> int:
+        """所有資料名稱的分塊總數"""
+        with self._lock:
+            row = self._conn.execute("SELECT SUM(chunk_count) FROM data_names").fetchone()
+        return row[0] or 0
+
+    def rebuild(self, files: Iterable[Dict]):
+        """
+        以完整的檔案清單重建目錄
+
+        Args:
+            files: 包含 data_name、file_name、file_hash、chunk_count、byte_size 的字典
+        """
+        with self._lock:
+            self._transaction()
+            try:
+                self._conn.execute("DELETE FROM files")
+                self._conn.execute("DELETE FROM data_names")
+                for record in files:
+                    self._conn.execute(
+                        "INSERT INTO files "
+                        "(data_name, file_name, file_hash, chunk_count, byte_size) VALUES (?, ?, ?, ?, ?)",
+                        (record['data_name'], record['file_name'], record['file_hash'],
+                         record['chunk_count'], record['byte_size'])
+                    )
+                self._conn.execute(
+                    "INSERT INTO data_names (data_name, file_count, chunk_count, byte_size) "
+                    "SELECT data_name, COUNT(*), SUM(chunk_count), SUM(byte_size) "
+                    "FROM files GROUP BY data_name"
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        """關閉目錄檔案"""
+        with self._lock:
+            self._conn.close()
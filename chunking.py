@@ -0,0 +1,311 @@
+"""
+文字分塊模組 - 可替換的分塊策略（字元、Markdown 結構、Token 長度）
+"""
+import re
+from typing import Iterator, List, Optional, Tuple
+
+import config
+
+
+# 分塊的最小單位: (起始位置, 結束位置, 類型)，類型為 heading / table / code / text
+Span = Tuple[int, int, str]
+
+_HEADING_RE = re.compile(r"\s{0,3}#{1,6}\s")
+_SENTENCE_END_RE = re.compile(r"[。！？；!?;]+|\.(?=\s)|\n")
+_LINE_END_RE = re.compile(r"\n")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class Chunker:
+    """分塊策略基底類別"""
+
+    def __init__(self, chunk_size: int, overlap: int):
+        """
+        Args:
+            chunk_size: 每塊大小上限
+            overlap: 相鄰分塊的重疊大小（必須小於 chunk_size）
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size 必須大於 0: {chunk_size}")
+        if overlap < 0 or overlap >= chunk_size:
+            raise ValueError(f"overlap 必須介於 0 與 chunk_size 之間: overlap={overlap}, chunk_size={chunk_size}")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """逐一產生文字分塊"""
+        raise NotImplementedError
+
+    def chunk(self, text: str) -> List[str]:
+        """取得所有文字分塊"""
+        return list(self.iter_chunks(text))
+
+
+class CharacterChunker(Chunker):
+    """固定字元數切割（原始策略）"""
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        start = 0
+        text_length = len(text)
+        step = self.chunk_size - self.overlap
+
+        while start < text_length:
+            chunk = text[start:start + self.chunk_size]
+            if chunk.strip():  # 只加入非空白的分塊
+                yield chunk
+            start += step
+
+
+class MarkdownChunker(Chunker):
+    """
+    依 Markdown 結構分塊
+
+    先依標題、段落、表格、程式碼區塊切成區塊；過長的區塊再依句子、
+    空白、最後才以固定長度切割。標題一律開始新的分塊，表格只在列之間切割。
+    每個層級都以單次正規表示式掃描找出邊界，整體為線性時間。
+    """
+
+    # 以字元位置計算分塊長度（包含區塊間的空白）；Token 策略改為加總各單位長度
+    measure_by_span = True
+
+    def _lengths(self, texts: List[str]) -> List[int]:
+        """批次計算文字長度"""
+        return [len(text) for text in texts]
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        spans, lengths = self._atoms(text)
+        limit = self.chunk_size
+
+        first = 0  # 目前分塊的第一個單位
+        size = 0
+        i = 0
+        while i < len(spans):
+            start, end, kind = spans[i]
+            if i > first:
+                if self.measure_by_span:
+                    new_size = end - spans[first][0]
+                else:
+                    new_size = size + lengths[i]
+                if kind == 'heading' or new_size > limit:
+                    yield text[spans[first][0]:spans[i - 1][1]]
+                    first = i if kind == 'heading' else self._overlap_start(spans, lengths, first, i)
+                    size = self._size(spans, lengths, first, i)
+                    continue
+                size = new_size
+            else:
+                size = lengths[i]
+            i += 1
+
+        if first < len(spans):
+            yield text[spans[first][0]:spans[-1][1]]
+
+    def _size(self, spans: List[Span], lengths: List[int], first: int, stop: int) -> int:
+        """計算 spans[first:stop] 組成的分塊長度"""
+        if first >= stop:
+            return 0
+        if self.measure_by_span:
+            return spans[stop - 1][1] - spans[first][0]
+        return sum(lengths[first:stop])
+
+    def _overlap_start(self, spans: List[Span], lengths: List[int], first: int, stop: int) -> int:
+        """
+        決定下一個分塊的起點：從上一塊結尾往回取不超過 overlap 的單位，
+        並保留空間給下一個單位，確保每次都有進度
+        """
+        if self.overlap <= 0:
+            return stop
+        next_length = lengths[stop]
+        new_first = stop
+        while new_first - 1 > first:
+            candidate = new_first - 1
+            if self.measure_by_span:
+                overlap_size = spans[stop - 1][1] - spans[candidate][0]
+                total = spans[stop][1] - spans[candidate][0]
+            else:
+                overlap_size = sum(lengths[candidate:stop])
+                total = overlap_size + next_length
+            if overlap_size > self.overlap or total > self.chunk_size:
+                break
+            new_first = candidate
+        return new_first
+
+    def _atoms(self, text: str) -> Tuple[List[Span], List[int]]:
+        """將文字切成長度不超過上限的最小單位"""
+        spans = self._blocks(text)
+        lengths = self._lengths([text[s:e] for s, e, _ in spans])
+
+        for splitter in (self._split_sentences, self._split_words, self._split_hard):
+            if not any(length > self.chunk_size for length in lengths):
+                break
+            new_spans: List[Span] = []
+            new_lengths: List[Optional[int]] = []
+            for span, length in zip(spans, lengths):
+                if length <= self.chunk_size:
+                    new_spans.append(span)
+                    new_lengths.append(length)
+                else:
+                    parts = splitter(text, span, length)
+                    new_spans.extend(parts)
+                    new_lengths.extend([None] * len(parts))
+
+            # 只計算新切出的單位長度
+            pending = [i for i, length in enumerate(new_lengths) if length is None]
+            measured = self._lengths([text[new_spans[i][0]:new_spans[i][1]] for i in pending])
+            for i, length in zip(pending, measured):
+                new_lengths[i] = length
+            spans, lengths = new_spans, new_lengths
+
+        return spans, lengths
+
+    @staticmethod
+    def _blocks(text: str) -> List[Span]:
+        """單次逐行掃描，切出標題、表格、程式碼與段落區塊"""
+        blocks: List[Span] = []
+        block_start = None
+        block_end = 0
+        block_kind = None
+
+        def close():
+            nonlocal block_start, block_kind
+            if block_start is not None:
+                blocks.append((block_start, block_end, block_kind))
+            block_start = None
+            block_kind = None
+
+        pos = 0
+        text_length = len(text)
+        while pos < text_length:
+            newline = text.find("\n", pos)
+            line_end = text_length if newline == -1 else newline
+            line = text[pos:line_end]
+            stripped = line.strip()
+
+            if block_kind == 'code':
+                block_end = line_end
+                if stripped.startswith("```"):
+                    close()
+            elif stripped.startswith("```"):
+                close()
+                block_start, block_end, block_kind = pos, line_end, 'code'
+            elif not stripped:
+                close()
+            elif _HEADING_RE.match(line):
+                close()
+                blocks.append((pos, line_end, 'heading'))
+            else:
+                kind = 'table' if stripped.startswith("|") else 'text'
+                if block_kind != kind:
+                    close()
+                    block_start, block_kind = pos, kind
+                block_end = line_end
+
+            pos = line_end + 1
+        close()
+        return blocks
+
+    @staticmethod
+    def _split_by(pattern: "re.Pattern", text: str, span: Span,
+                  keep_delimiter: bool = True) -> List[Span]:
+        """依正規表示式找到的邊界切割區間，並去除各段前後空白"""
+        start, end, kind = span
+        parts: List[Span] = []
+        piece_start = start
+        for match in pattern.finditer(text, start, end):
+            cut = match.end() if keep_delimiter else match.start()
+            if cut > piece_start:
+                parts.append((piece_start, cut, kind))
+            piece_start = match.end()
+        if piece_start < end:
+            parts.append((piece_start, end, kind))
+
+        stripped: List[Span] = []
+        for s, e, k in parts:
+            while s < e and text[s].isspace():
+                s += 1
+            while e > s and text[e - 1].isspace():
+                e -= 1
+            if s < e:
+                stripped.append((s, e, k))
+        return stripped or [span]
+
+    def _split_sentences(self, text: str, span: Span, length: int) -> List[Span]:
+        """依句子切割；表格與程式碼只在行之間切割"""
+        if span[2] in ('table', 'code'):
+            return self._split_by(_LINE_END_RE, text, span)
+        return self._split_by(_SENTENCE_END_RE, text, span)
+
+    def _split_words(self, text: str, span: Span, length: int) -> List[Span]:
+        """依空白切割成詞"""
+        return self._split_by(_WHITESPACE_RE, text, span, keep_delimiter=False)
+
+    def _split_hard(self, text: str, span: Span, length: int) -> List[Span]:
+        """最後手段：依長度比例以固定字元數切割"""
+        start, end, kind = span
+        step = max(1, (end - start) * self.chunk_size // max(length, 1))
+        return [(s, min(s + step, end), kind) for s in range(start, end, step)]
+
+
+class TokenChunker(MarkdownChunker):
+    """
+    以嵌入模型的 Token 數量為上限的 Markdown 結構分塊
+
+    確保每個分塊都不會超過模型的最大序列長度而被截斷。
+    """
+
+    measure_by_span = False
+
+    def __init__(self, chunk_size: int, overlap: int, tokenizer):
+        """
+        Args:
+            chunk_size: 每塊的 Token 數上限
+            overlap: 重疊的 Token 數
+            tokenizer: Hugging Face tokenizer（需支援批次呼叫）
+        """
+        super().__init__(chunk_size, overlap)
+        self.tokenizer = tokenizer
+
+    def _lengths(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False)['input_ids']
+        return [len(ids) for ids in encoded]
+
+
+CHUNKERS = {
+    'character': CharacterChunker,
+    'markdown': MarkdownChunker,
+    'token': TokenChunker,
+}
+
+
+def create_chunker(strategy: str = None, chunk_size: int = None,
+                   overlap: int = None, tokenizer=None) -> Chunker:
+    """
+    依名稱建立分塊器
+
+    Args:
+        strategy: 分塊策略（預設 config.CHUNK_STRATEGY）
+        chunk_size: 每塊大小（token 策略為 Token 數）
+        overlap: 重疊大小（token 策略為 Token 數）
+        tokenizer: token 策略使用的 tokenizer
+
+    Returns:
+        分塊器實例
+    """
+    strategy = strategy or config.CHUNK_STRATEGY
+    if strategy not in CHUNKERS:
+        raise ValueError(f"未知的分塊策略: {strategy}（可用: {', '.join(CHUNKERS)}）")
+
+    if strategy == 'token':
+        if tokenizer is None:
+            raise ValueError("token 分塊策略需要 tokenizer")
+        return TokenChunker(
+            chunk_size if chunk_size is not None else config.CHUNK_TOKENS,
+            overlap if overlap is not None else config.CHUNK_OVERLAP_TOKENS,
+            tokenizer
+        )
+
+    return CHUNKERS[strategy](
+        chunk_size if chunk_size is not None else config.CHUNK_SIZE,
+        overlap if overlap is not None else config.CHUNK_OVERLAP
+    )
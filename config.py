@@ -3,10 +3,68 @@
 """
 import os
 
-# Qdrant 設定 - 使用本地檔案系統
-QDRANT_PATH = os.path.join(os.path.dirname(__file__), "qdrant_data")
+# Qdrant 設定
+# 連線模式: local（本地檔案，同一時間只有一個程序能開啟）/ server（Qdrant Server，
+# GUI、匯入與多個 MCP Server 可同時連線）/ memory（記憶體，測試用）
+QDRANT_MODE = "local"
+QDRANT_PATH = os.path.join(os.path.dirname(__file__), "qdrant_data")  # local 模式的資料目錄
 COLLECTION_NAME = "documents"
 
+# Qdrant Server 連線（QDRANT_MODE = "server"）
+QDRANT_HOST = "localhost"
+QDRANT_PORT = 6333  # REST 埠號
+QDRANT_GRPC_PORT = 6334
+QDRANT_PREFER_GRPC = True  # 優先使用 gRPC（批次寫入與搜尋的序列化成本較低）
+QDRANT_HTTPS = False
+QDRANT_API_KEY = os.environ.get("QDRANT_API_KEY")
+QDRANT_TIMEOUT = 10  # 每個請求的逾時秒數
+QDRANT_POOL_SIZE = 16  # REST 連線池大小（搜尋與平行寫入的執行緒共用同一個客戶端）
+QDRANT_RETRIES = 3  # 連線錯誤、逾時與 429/5xx 回應的重試次數
+QDRANT_RETRY_BACKOFF = 0.5  # 第一次重試前等待的秒數（之後每次加倍）
+QDRANT_REVISION_SECONDS = 5.0  # 其他程序可能寫入時，搜尋結果快取最多沿用的秒數
+
+# 需要建立 payload 索引的欄位（欄位名稱 → 索引類型），用於資料名稱/檔案過濾
+PAYLOAD_INDEX_FIELDS = {
+    'data_name': 'keyword',
+    'file_name': 'keyword',
+}
+
+# Collection 儲存與索引設定（建立 collection 時套用；既有 collection 以 migrate_collection.py 遷移）
+# 本地檔案模式為暴力搜尋，只有連線 Qdrant Server 時量化與 HNSW 設定才會生效
+VECTOR_QUANTIZATION = None  # None / "scalar"（int8，向量記憶體約 1/4）/ "binary"（1 bit，約 1/32）
+QUANTIZATION_ALWAYS_RAM = True  # 量化向量常駐記憶體（原始向量可放在磁碟）
+QUANTIZATION_RESCORE = True  # 以原始向量重新計算量化搜尋的候選分數
+QUANTIZATION_OVERSAMPLING = 2.0  # 量化搜尋時取回 limit × 此倍數的候選再重新計分
+VECTORS_ON_DISK = False  # 原始向量存放於磁碟（memmap），記憶體只保留量化向量與索引
+PAYLOAD_ON_DISK = False  # payload（分塊文字）存放於磁碟
+HNSW_M = 16  # HNSW 每個節點的連結數（越大越準確，索引越大）
+HNSW_EF_CONSTRUCT = 100  # 建立索引時的候選數
+HNSW_EF = None  # 搜尋時的候選數（None 使用 Qdrant 預設）
+HNSW_ON_DISK = False  # HNSW 索引存放於磁碟
+MIGRATION_BATCH_SIZE = 256  # 遷移 collection 時每批複製的點數
+
+# 向量儲存: qdrant（Qdrant 本地檔案模式）/ numpy（NumPy 記憶體映射，小型部署用，不支援詞彙索引）
+# 切換儲存後以 python migrate_collection.py --from qdrant 複製既有資料
+VECTOR_STORE = "qdrant"
+NUMPY_STORE_PATH = os.path.join(os.path.dirname(__file__), "numpy_store")
+NUMPY_STORE_FLUSH_SECONDS = 5.0  # 寫入期間儲存欄位檔的間隔秒數（匯入或刪除結束時也會儲存）
+NUMPY_COMPACT_RATIO = 0.2  # 已刪除的點超過此比例時壓縮檔案
+NUMPY_SEARCH_BLOCK_ROWS = 65536  # 精確搜尋時每次矩陣乘法的列數（控制暫存記憶體）
+NUMPY_IVF_LISTS = 0  # IVF 粗分群數量（0 表示一律精確搜尋；建議約 √點數）
+NUMPY_IVF_PROBES = 8  # 每個查詢搜尋的群數量（越大越準確）
+NUMPY_IVF_MIN_POINTS = 100000  # 點數達此數量才建立 IVF 索引
+NUMPY_IVF_TRAIN_PER_LIST = 64  # 訓練時每群的取樣點數
+NUMPY_IVF_ITERATIONS = 10  # k-means 迭代次數
+
+# 資料目錄（資料名稱與檔案統計，SQLite）
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), "catalog.db")
+
+# 唯讀快照（匯入後發佈選定資料名稱的不可變版本，MCP Server 從最新版本唯讀服務）
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "snapshots")
+SNAPSHOT_KEEP = 3  # 保留的快照版本數（仍在服務舊版本的 MCP Server 切換前不會失效）
+SNAPSHOT_POLL_SECONDS = 2.0  # MCP Server 檢查是否有新版本的間隔秒數
+MCP_SERVE_SNAPSHOTS = False  # 獨立的 MCP Server 從最新快照服務（或以 --snapshot 啟用），不開啟正在寫入的資料庫
+
 # MCP Server HTTP 設定
 MCP_SERVER_HOST = "127.0.0.1"
 MCP_SERVER_PORT = 3001
@@ -17,9 +75,63 @@ MCP_SERVER_URL = f"http://{MCP_SERVER_HOST}:{MCP_SERVER_PORT}{MCP_SERVER_PATH}"
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 VECTOR_SIZE = 384  # all-MiniLM-L6-v2 的向量維度
 
+# 嵌入模型後端: sentence-transformers（PyTorch）/ onnx（ONNX Runtime，需安裝 onnxruntime）/ hash（測試用）
+EMBEDDING_BACKEND = "sentence-transformers"
+EMBEDDING_NORMALIZE = True  # 嵌入向量在編碼時 L2 正規化（餘弦相似度等同內積）
+ONNX_QUANTIZE = False  # onnx 後端是否使用動態 int8 量化
+ONNX_THREADS = 0  # ONNX Runtime 執行緒數（0 表示自動）
+ONNX_MODEL_DIR = os.path.join(os.path.dirname(__file__), "onnx_models")  # 量化模型存放位置
+
+# 嵌入批次排程（依 Token 長度排序後動態組批）
+EMBEDDING_BATCH_SIZE = 64  # 每批最多文字數
+EMBEDDING_TOKEN_BUDGET = 8192  # 每批填充後的 Token 總數上限
+
+# 嵌入向量快取（依模型與分塊文字雜湊持久化保存，LRU 淘汰）
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(__file__), "embedding_cache")
+EMBEDDING_CACHE_MAX_ENTRIES = 100000  # 約 150 MB（384 維 float32）
+
+# MCP 查詢快取（程序內 LRU）
+QUERY_EMBEDDING_CACHE_SIZE = 1024  # 查詢向量快取數量
+SEARCH_RESULT_CACHE_SIZE = 256  # 搜尋結果快取數量（資料變動時失效）
+MCP_WARMUP = True  # MCP Server 啟動後在背景預先載入模型與資料庫（否則於第一次搜尋時載入）
+MCP_SEARCH_CONCURRENCY = 4  # 同時執行的搜尋數量（向量化與資料庫查詢在執行緒池中進行）
+MCP_SEARCH_QUEUE_SIZE = 64  # 超過並行數量時最多排隊的搜尋數，再多則回覆忙碌
+QUERY_BATCH_WINDOW_MS = 2  # 合併同時到達的查詢：第一個查詢到達後等待的毫秒數
+QUERY_BATCH_MAX_SIZE = 32  # 每批最多合併的查詢數（達到時立即送出）
+
+# 混合檢索（稠密向量 + BM25 稀疏向量，以 Reciprocal Rank Fusion 合併），預設關閉：
+# 啟用時設定 LEXICAL_INDEX_ENABLED = True 與 SEARCH_MODE = "hybrid"，既有 collection 執行 migrate_collection.py
+LEXICAL_INDEX_ENABLED = False  # 建立 collection 時一併建立稀疏向量索引（既有 collection 需遷移後才有）
+SEARCH_MODE = "dense"  # dense（只用向量）/ sparse（只用詞彙）/ hybrid（兩者合併），沒有詞彙索引時一律使用向量
+HYBRID_CANDIDATES_FACTOR = 4  # 混合檢索時每種方式取回 limit × 此倍數的候選
+HYBRID_RRF_K = 60  # RRF 常數
+LEXICAL_BM25_K1 = 1.2  # BM25 詞頻飽和參數
+LEXICAL_BM25_B = 0.75  # BM25 長度正規化參數
+LEXICAL_AVG_DOC_TOKENS = 256  # 分塊平均 Token 數的估計值（BM25 長度正規化用）
+
+# 重新排序（本地 Cross-Encoder，需額外下載模型）
+RERANK_ENABLED = False  # 是否對搜尋候選結果重新排序
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"  # Cross-Encoder 模型
+RERANK_CANDIDATES = 20  # 重新排序前每個查詢取回的候選數量（不少於 limit）
+RERANK_BATCH_SIZE = 16  # 每次推論的 (查詢, 分塊) 組合數量
+RERANK_MAX_LENGTH = 256  # 每個組合的最大 Token 數
+RERANK_BUDGET_MS = 250  # 重新排序的延遲預算（毫秒），超過時保留向量排序；0 表示不限制
+
 # 文字分塊參數
+CHUNK_STRATEGY = "markdown"  # character（固定字元）/ markdown（依標題、段落、句子）/ token（依模型 Token 數）
 CHUNK_SIZE = 500  # 每個分塊的字元數
 CHUNK_OVERLAP = 50  # 分塊重疊字元數
+CHUNK_TOKENS = 254  # token 策略的每塊 Token 數上限（不超過模型最大序列長度）
+CHUNK_OVERLAP_TOKENS = 32  # token 策略的重疊 Token 數
+
+# 批次匯入參數
+INGEST_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # 文件轉換程序數量
+INGEST_EMBED_BATCH_SIZE = 256  # 累積多少分塊後送入嵌入模型
+UPSERT_BATCH_SIZE = 128  # 每次寫入向量儲存的點數
+BULK_WRITE_WORKERS = 4  # 連線 Qdrant Server 時平行寫入的執行緒數量（本地檔案模式固定為 1）
+BULK_JOURNAL_DIR = os.path.join(os.path.dirname(__file__), "ingest_journals")  # 已寫入批次的紀錄（每個資料名稱一個檔案，中斷後續傳）
+BULK_PROGRESS_INTERVAL = 5.0  # 回報寫入速度的間隔秒數
 
 # 支援的檔案格式
 SUPPORTED_EXTENSIONS = {
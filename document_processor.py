@@ -1,18 +1,34 @@
 """
 文件處理模組 - 使用 Markitdown 轉換文件並進行向量化
 """
-from markitdown import MarkItDown
-from sentence_transformers import SentenceTransformer
 import os
-from typing import List, Dict
+from typing import List, Dict, Iterator
+import numpy as np
+from embedding_backends import create_embedding_backend, normalize_embeddings
+from embedding_cache import EmbeddingCache
+from batching import estimate_token_lengths, plan_batches
+from chunking import create_chunker
 import config
 
 
 class DocumentProcessor:
     def __init__(self):
         """初始化文件處理器"""
-        self.markitdown = MarkItDown()
-        self.embedding_model = SentenceTransformer(config.EMBEDDING_MODEL)
+        self._markitdown = None
+        self.embedding_backend = create_embedding_backend()
+        self.embedding_cache = (
+            EmbeddingCache(model_name=self.embedding_backend.cache_id)
+            if config.EMBEDDING_CACHE_ENABLED else None
+        )
+        self.chunker = self._create_chunker()
+    
+    @property
+    def markitdown(self):
+        """MarkItDown 轉換器（第一次轉換文件時才載入，只做查詢嵌入時不需要）"""
+        if self._markitdown is None:
+            from markitdown import MarkItDown
+            self._markitdown = MarkItDown()
+        return self._markitdown
         
     def convert_to_markdown(self, file_path: str) -> str:
         """
@@ -30,6 +46,26 @@ class DocumentProcessor:
         except Exception as e:
             raise Exception(f"文件轉換失敗: {str(e)}")
     
+    def _create_chunker(self, chunk_size: int = None, overlap: int = None):
+        """
+        依 config.CHUNK_STRATEGY 建立分塊器
+        
+        token 策略的分塊大小不會超過嵌入模型的最大序列長度（扣除特殊 Token）。
+        """
+        if config.CHUNK_STRATEGY != 'token':
+            return create_chunker(chunk_size=chunk_size, overlap=overlap)
+        
+        if chunk_size is None:
+            chunk_size = config.CHUNK_TOKENS
+            max_seq_length = self.embedding_backend.max_seq_length
+            if max_seq_length:
+                chunk_size = min(chunk_size, max_seq_length - 2)
+        return create_chunker(
+            chunk_size=chunk_size,
+            overlap=overlap,
+            tokenizer=self.embedding_backend.tokenizer
+        )
+    
     def chunk_text(self, text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
         """
         將文字分塊處理
@@ -42,25 +78,52 @@ class DocumentProcessor:
         Returns:
             文字分塊列表
         """
-        if chunk_size is None:
-            chunk_size = config.CHUNK_SIZE
-        if overlap is None:
-            overlap = config.CHUNK_OVERLAP
+        return list(self.iter_chunks(text, chunk_size, overlap))
+    
+    def iter_chunks(self, text: str, chunk_size: int = None, overlap: int = None) -> Iterator[str]:
+        """
+        逐一產生文字分塊（不一次建立完整列表）
+        
+        Args:
+            text: 輸入文字
+            chunk_size: 每塊大小
+            overlap: 重疊大小
             
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            end = start + chunk_size
-            chunk = text[start:end]
-            if chunk.strip():  # 只加入非空白的分塊
-                chunks.append(chunk)
-            start = end - overlap
+        Yields:
+            非空白的文字分塊
+        """
+        if chunk_size is None and overlap is None:
+            chunker = self.chunker
+        else:
+            chunker = self._create_chunker(chunk_size, overlap)
+        yield from chunker.iter_chunks(text)
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        依 Token 長度分組批次送入模型，再還原為輸入順序
+        
+        Args:
+            texts: 文字列表
             
-        return chunks
+        Returns:
+            形狀為 (文字數, 向量維度) 的陣列
+        """
+        lengths = estimate_token_lengths(
+            texts,
+            tokenizer=self.embedding_backend.tokenizer,
+            max_seq_length=self.embedding_backend.max_seq_length
+        )
+        batches = plan_batches(lengths, config.EMBEDDING_BATCH_SIZE, config.EMBEDDING_TOKEN_BUDGET)
+        
+        embeddings = np.zeros((len(texts), config.VECTOR_SIZE), dtype=np.float32)
+        for batch in batches:
+            embeddings[batch] = self.embedding_backend.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch)
+            )
+        return embeddings
     
-    def embed_text(self, texts: List[str]) -> List[List[float]]:
+    def embed_text(self, texts: List[str]) -> np.ndarray:
         """
         將文字轉換為嵌入向量
         
@@ -68,10 +131,27 @@ class DocumentProcessor:
             texts: 文字列表
             
         Returns:
-            嵌入向量列表
+            形狀為 (文字數, 向量維度) 的 float32 陣列
+            （config.EMBEDDING_NORMALIZE 時已 L2 正規化）
         """
-        embeddings = self.embedding_model.encode(texts, show_progress_bar=True)
-        return embeddings.tolist()
+        if self.embedding_cache is None:
+            return normalize_embeddings(self._encode(texts))
+        
+        # 只將快取未命中的文字送入模型（相同文字只計算一次）
+        cached = self.embedding_cache.get_many(texts)
+        missing = list(dict.fromkeys(
+            text for text, vector in zip(texts, cached) if vector is None
+        ))
+        if missing:
+            computed = self._encode(missing)
+            self.embedding_cache.put_many(missing, computed)
+            computed_rows = {text: row for row, text in enumerate(missing)}
+        
+        embeddings = np.empty((len(texts), config.VECTOR_SIZE), dtype=np.float32)
+        for i, (text, vector) in enumerate(zip(texts, cached)):
+            embeddings[i] = vector if vector is not None else computed[computed_rows[text]]
+        # 快取保存模型原始輸出，正規化在輸出時進行（切換設定不需清除快取）
+        return normalize_embeddings(embeddings)
     
     def process_document(self, file_path: str, data_name: str) -> Dict:
         """
@@ -0,0 +1,244 @@
+"""
+嵌入模型後端模組 - 可替換的向量化實作（PyTorch、ONNX Runtime、測試用雜湊）
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+import config
+
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """
+    依 config.EMBEDDING_NORMALIZE 將嵌入向量就地 L2 正規化
+
+    Args:
+        embeddings: 形狀為 (文字數, 向量維度) 的 float32 陣列
+
+    Returns:
+        同一個陣列（連續記憶體的 float32）
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if config.EMBEDDING_NORMALIZE and len(embeddings):
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    return embeddings
+
+
+class EmbeddingBackend:
+    """
+    嵌入模型後端基底類別
+
+    子類別需提供 tokenizer、max_seq_length、dimension 與 encode()。
+    tokenizer 必須可用 tokenizer(texts, add_special_tokens=...) 批次呼叫並回傳 input_ids，
+    供分塊與批次排程估計 Token 數。
+    """
+
+    tokenizer = None
+    max_seq_length = None
+    dimension = config.VECTOR_SIZE
+
+    @property
+    def cache_id(self) -> str:
+        """嵌入快取使用的模型識別字串（不同後端輸出不完全相同時需區分）"""
+        return config.EMBEDDING_MODEL
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        將文字轉換為嵌入向量
+
+        Args:
+            texts: 文字列表
+            batch_size: 批次大小
+
+        Returns:
+            形狀為 (文字數, 向量維度) 的 float32 陣列
+        """
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """使用 sentence-transformers（PyTorch）的後端"""
+
+    def __init__(self, model_name: str = None):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name or config.EMBEDDING_MODEL
+        self.model = SentenceTransformer(self.model_name)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    @property
+    def cache_id(self) -> str:
+        return self.model_name
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    使用 ONNX Runtime 的 CPU 後端
+
+    從 Hugging Face 下載模型提供的 ONNX 匯出檔（onnx/model.onnx），
+    可選擇以動態 int8 量化產生較小、較快的模型。
+    池化方式與 sentence-transformers 的 mean pooling 一致，依 config.EMBEDDING_NORMALIZE 進行 L2 正規化。
+    """
+
+    def __init__(self, model_name: str = None, quantize: bool = None):
+        import onnxruntime
+        from huggingface_hub import hf_hub_download
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name or config.EMBEDDING_MODEL
+        self.quantize = config.ONNX_QUANTIZE if quantize is None else quantize
+
+        model_path = hf_hub_download(self.model_name, "onnx/model.onnx")
+        if self.quantize:
+            model_path = self._quantized_model(model_path)
+
+        options = onnxruntime.SessionOptions()
+        if config.ONNX_THREADS:
+            options.intra_op_num_threads = config.ONNX_THREADS
+        self.session = onnxruntime.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {item.name for item in self.session.get_inputs()}
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.max_seq_length = self._read_max_seq_length(hf_hub_download)
+        self.normalize = config.EMBEDDING_NORMALIZE
+
+        # 以實際輸出確認維度
+        self.dimension = self.encode(["dimension probe"]).shape[1]
+
+    @property
+    def cache_id(self) -> str:
+        return f"{self.model_name}#onnx-int8" if self.quantize else f"{self.model_name}#onnx"
+
+    def _quantized_model(self, model_path: str) -> str:
+        """產生（或沿用）動態 int8 量化後的模型檔"""
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        os.makedirs(config.ONNX_MODEL_DIR, exist_ok=True)
+        safe_name = self.model_name.replace("/", "__")
+        quantized_path = os.path.join(config.ONNX_MODEL_DIR, f"{safe_name}.int8.onnx")
+        if not os.path.exists(quantized_path):
+            print(f"量化 ONNX 模型: {quantized_path}", file=sys.stderr)
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def _read_max_seq_length(self, hf_hub_download) -> int:
+        """讀取 sentence-transformers 設定的最大序列長度"""
+        try:
+            with open(hf_hub_download(self.model_name, "sentence_bert_config.json"), encoding="utf-8") as f:
+                return int(json.load(f)["max_seq_length"])
+        except Exception:
+            return min(int(self.tokenizer.model_max_length), 512)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            encoded = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            inputs = {
+                name: encoded[name].astype(np.int64)
+                for name in ("input_ids", "attention_mask", "token_type_ids")
+                if name in self._input_names and name in encoded
+            }
+            if "token_type_ids" in self._input_names and "token_type_ids" not in inputs:
+                inputs["token_type_ids"] = np.zeros_like(inputs["input_ids"])
+
+            token_embeddings = self.session.run(None, inputs)[0]
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype(np.float32))
+
+        if not outputs:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.concatenate(outputs)
+
+
+class _HashTokenizer:
+    """雜湊後端使用的簡易 tokenizer：英數詞與單一 CJK 字元各為一個 Token"""
+
+    pattern = re.compile(r"[A-Za-z0-9_\-\.]+|[^\sA-Za-z0-9_\-\.]")
+
+    def tokenize(self, text: str) -> List[str]:
+        return self.pattern.findall(text.lower())
+
+    def __call__(self, texts: List[str], add_special_tokens: bool = True, **kwargs) -> Dict:
+        extra = 2 if add_special_tokens else 0
+        return {'input_ids': [[0] * (len(self.tokenize(text)) + extra) for text in texts]}
+
+
+class HashBackend(EmbeddingBackend):
+    """
+    確定性的雜湊嵌入（測試與離線環境使用）
+
+    以 Token 的雜湊值投影到固定維度並 L2 正規化，不需下載模型，
+    相同文字永遠得到相同向量，共用詞彙越多的文字相似度越高。
+    """
+
+    def __init__(self, dimension: int = None):
+        self.dimension = dimension or config.VECTOR_SIZE
+        self.tokenizer = _HashTokenizer()
+        self.max_seq_length = 256
+
+    @property
+    def cache_id(self) -> str:
+        return f"hash-{self.dimension}"
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in self.tokenizer.tokenize(text)[:self.max_seq_length]:
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                embeddings[row, (value >> 1) % self.dimension] += sign
+            norm = np.linalg.norm(embeddings[row])
+            if norm > 0:
+                embeddings[row] /= norm
+        return embeddings
+
+
+EMBEDDING_BACKENDS = {
+    'sentence-transformers': SentenceTransformerBackend,
+    'onnx': OnnxBackend,
+    'hash': HashBackend,
+}
+
+
+def create_embedding_backend(name: str = None) -> EmbeddingBackend:
+    """
+    依名稱建立嵌入模型後端
+
+    Args:
+        name: 後端名稱（預設 config.EMBEDDING_BACKEND）
+
+    Returns:
+        嵌入模型後端實例
+    """
+    name = name or config.EMBEDDING_BACKEND
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"未知的嵌入後端: {name}（可用: {', '.join(EMBEDDING_BACKENDS)}）")
+    return EMBEDDING_BACKENDS[name]()
@@ -0,0 +1,205 @@
+"""
+嵌入向量快取模組 - 以記憶體映射檔儲存 float32 向量，SQLite 索引並以 LRU 淘汰
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+import config
+
+
+def normalize_text(text: str) -> str:
+    """正規化分塊文字（合併連續空白），讓格式差異不影響快取命中"""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    持久化的嵌入向量快取
+
+    - vectors.f32: 形狀為 (容量, 維度) 的 float32 記憶體映射檔，每列一個向量
+    - index.db: SQLite 索引，記錄 key → 列位置與最後使用順序
+    鍵值為 (模型名稱, 正規化文字) 的 SHA-256，快取滿時淘汰最久未使用的向量。
+    """
+
+    def __init__(self, cache_dir: str = None, dimension: int = None,
+                 max_entries: int = None, model_name: str = None):
+        """
+        初始化快取，設定與既有快取不符時會重建
+
+        Args:
+            cache_dir: 快取目錄（預設 config.EMBEDDING_CACHE_DIR）
+            dimension: 向量維度（預設 config.VECTOR_SIZE）
+            max_entries: 最多保存的向量數（預設 config.EMBEDDING_CACHE_MAX_ENTRIES）
+            model_name: 嵌入模型名稱（預設 config.EMBEDDING_MODEL）
+        """
+        self.cache_dir = cache_dir or config.EMBEDDING_CACHE_DIR
+        self.dimension = dimension or config.VECTOR_SIZE
+        self.max_entries = max_entries or config.EMBEDDING_CACHE_MAX_ENTRIES
+        self.model_name = model_name or config.EMBEDDING_MODEL
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+        self._conn = sqlite3.connect(
+            os.path.join(self.cache_dir, "index.db"),
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER UNIQUE NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)"
+        )
+
+        layout = f"{self.dimension}x{self.max_entries}"
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'layout'").fetchone()
+        if row is None or row[0] != layout or not os.path.exists(self._vectors_path):
+            # 維度或容量改變，舊的向量檔無法沿用
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('layout', ?)", (layout,)
+            )
+            mode = "w+"
+        else:
+            mode = "r+"
+        self._vectors = np.memmap(
+            self._vectors_path, dtype=np.float32, mode=mode,
+            shape=(self.max_entries, self.dimension)
+        )
+
+        row = self._conn.execute("SELECT MAX(last_used) FROM entries").fetchone()
+        self._clock = row[0] or 0
+
+    def key(self, text: str) -> str:
+        """計算 (模型, 正規化文字) 的快取鍵"""
+        content = f"{self.model_name}\0{normalize_text(text)}"
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        批次查詢快取
+
+        Args:
+            texts: 文字列表
+
+        Returns:
+            與輸入對應的向量列表，未命中者為 None
+        """
+        keys = [self.key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            slots = self._lookup_slots(list(set(keys)))
+            if not slots:
+                return results
+
+            self._clock += 1
+            self._conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(self._clock, key) for key in slots]
+            )
+            for i, key in enumerate(keys):
+                slot = slots.get(key)
+                if slot is not None:
+                    results[i] = np.array(self._vectors[slot])
+        return results
+
+    def put_many(self, texts: List[str], vectors) -> None:
+        """
+        批次寫入快取，超過容量時淘汰最久未使用的向量
+
+        Args:
+            texts: 文字列表
+            vectors: 對應的向量（二維陣列或向量列表）
+        """
+        entries = {}
+        for text, vector in zip(texts, vectors):
+            entries[self.key(text)] = vector
+        if not entries:
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 已存在的鍵值（其他程序可能剛寫入）只更新使用順序，避免被本次淘汰
+                row = self._conn.execute("SELECT MAX(last_used) FROM entries").fetchone()
+                self._clock = max(self._clock, row[0] or 0) + 1
+                existing = self._lookup_slots(list(entries))
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(self._clock, key) for key in existing]
+                )
+
+                new_keys = [key for key in entries if key not in existing]
+                slots = self._allocate_slots(len(new_keys))
+                # 單批大於快取容量時，超出的部分不寫入
+                new_keys = new_keys[:len(slots)]
+
+                self._conn.executemany(
+                    "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, slot, self._clock) for key, slot in zip(new_keys, slots)]
+                )
+                for key, slot in zip(new_keys, slots):
+                    self._vectors[slot] = np.asarray(entries[key], dtype=np.float32)
+                self._vectors.flush()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _lookup_slots(self, keys: List[str]) -> dict:
+        """分批查詢已存在的鍵值位置"""
+        slots = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            slots.update(self._conn.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+            ).fetchall())
+        return slots
+
+    def _allocate_slots(self, count: int) -> List[int]:
+        """配置 count 個列位置：先用尚未使用的列，不足時淘汰最久未使用的項目"""
+        if count <= 0:
+            return []
+        used = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if used < self.max_entries:
+            # 尚未填滿時，列位置依序配置
+            max_slot = self._conn.execute("SELECT MAX(slot) FROM entries").fetchone()[0]
+            next_slot = 0 if max_slot is None else max_slot + 1
+            free = min(count, self.max_entries - next_slot)
+            slots = list(range(next_slot, next_slot + max(free, 0)))
+        else:
+            slots = []
+
+        shortage = count - len(slots)
+        if shortage > 0:
+            # 只淘汰本次寫入之前的項目
+            evicted = self._conn.execute(
+                "SELECT key, slot FROM entries WHERE last_used < ? ORDER BY last_used LIMIT ?",
+                (self._clock, shortage)
+            ).fetchall()
+            self._conn.executemany(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted]
+            )
+            slots.extend(slot for _, slot in evicted)
+        return slots
+
+    def close(self):
+        """關閉快取檔案"""
+        with self._lock:
+            self._vectors.flush()
+            self._conn.close()
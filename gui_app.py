@@ -4,13 +4,11 @@ Tkinter GUI 應用程式
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
-import subprocess
-import sys
 import os
 from typing import List
 
 from document_processor import DocumentProcessor
-from vector_db import VectorDatabase
+from ingestion import collect_files, common_root, ingest_files
 import config
 
 
@@ -21,16 +19,38 @@ class LocalRAGApp:
         self.root.title("Local RAG 文件管理系統")
         self.root.geometry("900x700")
         
-        # 初始化核心組件
-        self.processor = DocumentProcessor()
-        self.vector_db = VectorDatabase()
-        self.mcp_process = None
+        # 核心組件在背景執行緒載入，避免模型載入期間視窗無回應
+        self.processor = None
+        self.vector_db = None
+        self._processor_ready = threading.Event()
+        
+        # 程序內的 MCP Server（HTTP/SSE），與 GUI 共用模型與資料庫
+        self.mcp_server = None
+        self.mcp_thread = None
         
         # 設定 GUI
         self._setup_ui()
         
-        # 載入現有資料
-        self._refresh_data_list()
+        # 載入資料庫與模型（資料庫就緒後即載入現有資料）
+        self._log("正在載入資料庫與嵌入模型...")
+        threading.Thread(target=self._load_components, daemon=True).start()
+    
+    def _load_components(self):
+        """背景載入向量資料庫與文件處理器"""
+        try:
+            from vector_db import VectorDatabase
+            self.vector_db = VectorDatabase()
+            self.root.after(0, self._refresh_data_list)
+            
+            self.processor = DocumentProcessor()
+            self.root.after(0, lambda: self._log("✓ 嵌入模型已載入"))
+        except Exception as e:
+            error = str(e)
+            self.root.after(0, lambda: self._log(f"✗ 載入失敗: {error}"))
+            self.root.after(0, lambda: messagebox.showerror("錯誤", f"載入失敗: {error}"))
+        finally:
+            # 載入失敗時不讓上傳永遠等待，上傳時會重新嘗試建立並回報錯誤
+            self._processor_ready.set()
         
     def _setup_ui(self):
         """設定 UI 元件"""
@@ -49,18 +69,23 @@ class LocalRAGApp:
             row=0, column=0, padx=5, pady=5
         )
         
+        # 選擇資料夾按鈕（批次匯入）
+        ttk.Button(upload_frame, text="選擇資料夾", command=self._select_folder).grid(
+            row=0, column=1, padx=5, pady=5, sticky="w"
+        )
+        
         # 顯示選擇的檔案
         self.file_label = ttk.Label(upload_frame, text="未選擇檔案", foreground="gray")
-        self.file_label.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        self.file_label.grid(row=0, column=2, padx=5, pady=5, sticky="w")
         
         # 資料名稱輸入
         ttk.Label(upload_frame, text="資料名稱:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
         self.data_name_entry = ttk.Entry(upload_frame, width=40)
-        self.data_name_entry.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        self.data_name_entry.grid(row=1, column=1, columnspan=2, padx=5, pady=5, sticky="w")
         
         # 上傳按鈕
         self.upload_btn = ttk.Button(upload_frame, text="上傳並處理", command=self._upload_file, state="disabled")
-        self.upload_btn.grid(row=2, column=0, columnspan=2, pady=10)
+        self.upload_btn.grid(row=2, column=0, columnspan=3, pady=10)
         
         # ===== 資料列表區域 =====
         data_frame = ttk.LabelFrame(main_frame, text="已儲存的資料", padding="10")
@@ -79,8 +104,12 @@ class LocalRAGApp:
         self.data_listbox.pack(side="left", fill="both", expand=True)
         scrollbar.config(command=self.data_listbox.yview)
         
-        # 刪除按鈕
-        ttk.Button(data_frame, text="刪除選中的資料", command=self._delete_selected).pack(pady=5)
+        # 刪除與發佈按鈕
+        data_button_frame = ttk.Frame(data_frame)
+        data_button_frame.pack(pady=5)
+        ttk.Button(data_button_frame, text="刪除選中的資料", command=self._delete_selected).pack(side="left", padx=5)
+        self.publish_btn = ttk.Button(data_button_frame, text="發佈快照", command=self._publish_snapshot)
+        self.publish_btn.pack(side="left", padx=5)
         
         # ===== MCP Server 區域 =====
         mcp_frame = ttk.LabelFrame(main_frame, text="MCP Server 控制", padding="10")
@@ -92,6 +121,14 @@ class LocalRAGApp:
         self.selected_data_text = scrolledtext.ScrolledText(mcp_frame, height=6, width=40, wrap="word", state="disabled")
         self.selected_data_text.pack(fill="both", expand=True, pady=5)
         
+        # 端點名稱（留空為預設端點 /mcp；不同名稱可同時服務不同資料）
+        endpoint_frame = ttk.Frame(mcp_frame)
+        endpoint_frame.pack(fill="x", pady=(5, 0))
+        ttk.Label(endpoint_frame, text="端點名稱:").pack(side="left")
+        self.endpoint_entry = ttk.Entry(endpoint_frame, width=20)
+        self.endpoint_entry.pack(side="left", padx=5)
+        ttk.Label(endpoint_frame, text="(留空為預設端點)", foreground="gray").pack(side="left")
+        
         # 按鈕框架
         button_frame = ttk.Frame(mcp_frame)
         button_frame.pack(fill="x", pady=5)
@@ -131,7 +168,7 @@ class LocalRAGApp:
         self.log_text.config(state="disabled")
         
     def _select_file(self):
-        """選擇檔案"""
+        """選擇檔案（可多選）"""
         filetypes = [
             ("所有支援格式", " ".join([f"*{ext}" for ext in config.SUPPORTED_EXTENSIONS.keys()])),
             ("PDF 文件", "*.pdf"),
@@ -141,23 +178,44 @@ class LocalRAGApp:
             ("PowerPoint", "*.pptx *.ppt"),
         ]
         
-        filename = filedialog.askopenfilename(
+        filenames = filedialog.askopenfilenames(
             title="選擇要上傳的文件",
             filetypes=filetypes
         )
         
-        if filename:
-            if self.processor.is_supported_file(filename):
-                self.selected_file = filename
-                self.file_label.config(text=os.path.basename(filename), foreground="black")
-                self.upload_btn.config(state="normal")
-                self._log(f"已選擇檔案: {os.path.basename(filename)}")
+        if filenames:
+            supported = [f for f in filenames if DocumentProcessor.is_supported_file(f)]
+            if supported:
+                self._set_selected_files(supported)
             else:
                 messagebox.showerror("錯誤", "不支援的檔案格式")
                 
+    def _select_folder(self):
+        """選擇資料夾，匯入其中所有支援的檔案"""
+        folder = filedialog.askdirectory(title="選擇要上傳的資料夾")
+        
+        if folder:
+            files = collect_files([folder])
+            if files:
+                self._set_selected_files(files, root=folder)
+            else:
+                messagebox.showerror("錯誤", "資料夾中沒有支援的檔案")
+                
+    def _set_selected_files(self, files: List[str], root: str = None):
+        """更新已選擇的檔案（root 為匯入根目錄，檔案以相對此目錄的路徑區分）"""
+        self.selected_files = list(files)
+        self.selected_root = root or common_root(files)
+        if len(files) == 1:
+            label = os.path.basename(files[0])
+        else:
+            label = f"{os.path.basename(files[0])} 等 {len(files)} 個檔案"
+        self.file_label.config(text=label, foreground="black")
+        self.upload_btn.config(state="normal")
+        self._log(f"已選擇檔案: {label}")
+                
     def _upload_file(self):
         """上傳並處理檔案"""
-        if not hasattr(self, 'selected_file'):
+        if not getattr(self, 'selected_files', None):
             messagebox.showwarning("警告", "請先選擇檔案")
             return
             
@@ -167,27 +225,41 @@ class LocalRAGApp:
             return
         
         # 在背景執行緒中處理
+        files = self.selected_files
+        root = self.selected_root
         self.upload_btn.config(state="disabled")
-        self._log(f"開始處理檔案: {os.path.basename(self.selected_file)}")
+        self._log(f"開始處理 {len(files)} 個檔案")
+        
+        def log(message: str):
+            self.root.after(0, lambda: self._log(f"  {message}"))
         
         def process_thread():
             try:
-                # 處理文件
-                result = self.processor.process_document(self.selected_file, data_name)
+                if not self._processor_ready.is_set():
+                    log("等待嵌入模型載入完成...")
+                    self._processor_ready.wait()
                 
-                # 插入資料庫
-                count = self.vector_db.insert_documents(
-                    chunks=result['chunks'],
-                    embeddings=result['embeddings'],
-                    file_name=result['file_name'],
-                    data_name=data_name
+                # 批次轉換、嵌入並插入資料庫
+                summary = ingest_files(
+                    files,
+                    data_name,
+                    processor=self.processor,
+                    vector_db=self.vector_db,
+                    log=log,
+                    root=root
                 )
+                count = summary['chunks']
                 
-                # 更新 UI
-                self.root.after(0, lambda: self._upload_complete(data_name, count))
+                if summary['failed'] and not summary['files']:
+                    error = summary['failed'][0][1]
+                    self.root.after(0, lambda: self._upload_error(error))
+                else:
+                    # 更新 UI
+                    self.root.after(0, lambda: self._upload_complete(data_name, count))
                 
             except Exception as e:
-                self.root.after(0, lambda: self._upload_error(str(e)))
+                error = str(e)
+                self.root.after(0, lambda: self._upload_error(error))
         
         threading.Thread(target=process_thread, daemon=True).start()
         
@@ -197,6 +269,7 @@ class LocalRAGApp:
         self.upload_btn.config(state="normal")
         self.data_name_entry.delete(0, "end")
         self.file_label.config(text="未選擇檔案", foreground="gray")
+        self.selected_files = []
         self._refresh_data_list()
         messagebox.showinfo("成功", f"文件已成功儲存到資料庫\n分塊數量: {count}")
         
@@ -208,6 +281,8 @@ class LocalRAGApp:
         
     def _refresh_data_list(self):
         """重新載入資料列表"""
+        if self.vector_db is None:
+            return
         self.data_listbox.delete(0, "end")
         data_names = self.vector_db.get_all_data_names()
         for name in data_names:
@@ -222,15 +297,72 @@ class LocalRAGApp:
         if not selected_indices:
             messagebox.showwarning("警告", "請先選擇要刪除的資料")
             return
+        if self.vector_db is None:
+            messagebox.showwarning("警告", "資料庫仍在載入中，請稍候")
+            return
             
         selected_names = [self.data_listbox.get(i) for i in selected_indices]
         
-        if messagebox.askyesno("確認", f"確定要刪除這些資料嗎?\n{', '.join(selected_names)}"):
-            for name in selected_names:
-                count = self.vector_db.delete_by_data_name(name)
-                self._log(f"已刪除: {name} ({count} 個分塊)")
-            self._refresh_data_list()
-            messagebox.showinfo("成功", "已刪除選中的資料")
+        if not messagebox.askyesno("確認", f"確定要刪除這些資料嗎?\n{', '.join(selected_names)}"):
+            return
+        
+        # 在背景執行緒中刪除，避免大型資料阻塞視窗
+        def delete_thread():
+            try:
+                for i, name in enumerate(selected_names, 1):
+                    def progress(deleted: int, total: int, name=name, i=i):
+                        message = f"  刪除中 ({i}/{len(selected_names)}) {name}: {deleted}/{total} 個分塊"
+                        self.root.after(0, lambda: self._log(message))
+                    
+                    count = self.vector_db.delete_by_data_name(name, progress=progress)
+                    message = f"已刪除: {name} ({count} 個分塊)"
+                    self.root.after(0, lambda message=message: self._log(message))
+                self.root.after(0, self._delete_complete)
+            except Exception as e:
+                error = str(e)
+                self.root.after(0, lambda: self._delete_error(error))
+        
+        threading.Thread(target=delete_thread, daemon=True).start()
+    
+    def _delete_complete(self):
+        """刪除完成回調"""
+        self._refresh_data_list()
+        messagebox.showinfo("成功", "已刪除選中的資料")
+    
+    def _delete_error(self, error_msg: str):
+        """刪除錯誤回調"""
+        self._log(f"✗ 刪除失敗: {error_msg}")
+        self._refresh_data_list()
+        messagebox.showerror("錯誤", f"刪除失敗: {error_msg}")
+    
+    def _publish_snapshot(self):
+        """將選中的資料發佈為唯讀快照（獨立的 MCP Server 以 --snapshot 從最新版本服務）"""
+        selected_indices = self.data_listbox.curselection()
+        if not selected_indices:
+            messagebox.showwarning("警告", "請先選擇要發佈的資料")
+            return
+        if self.vector_db is None:
+            messagebox.showwarning("警告", "資料庫仍在載入中，請稍候")
+            return
+        
+        selected_names = [self.data_listbox.get(i) for i in selected_indices]
+        self.publish_btn.config(state="disabled")
+        self._log(f"發佈快照: {', '.join(selected_names)}")
+        
+        def publish_thread():
+            try:
+                import snapshots
+                manifest = snapshots.publish_snapshot(selected_names, self.vector_db)
+                message = f"✓ 已發佈快照 {manifest['name']} ({manifest['points']} 個分塊)"
+                self.root.after(0, lambda: self._log(message))
+            except Exception as e:
+                error = str(e)
+                self.root.after(0, lambda: self._log(f"✗ 發佈失敗: {error}"))
+                self.root.after(0, lambda: messagebox.showerror("錯誤", f"發佈失敗: {error}"))
+            finally:
+                self.root.after(0, lambda: self.publish_btn.config(state="normal"))
+        
+        threading.Thread(target=publish_thread, daemon=True).start()
     
     def _update_selected_data_display(self, event=None):
         """更新已選資料的顯示"""
@@ -252,72 +384,117 @@ class LocalRAGApp:
             
             
     def _start_mcp_server(self):
-        """啟動 MCP Server (stdio 模式 - 標準 MCP 協議)"""
+        """
+        啟動程序內的 MCP Server（HTTP/SSE 模式），或在執行中的 Server 新增端點
+        
+        所有端點共用 GUI 已載入的嵌入模型與資料庫，不會另外開啟 Qdrant。
+        """
         # 取得選中的資料名稱
         selected_indices = self.data_listbox.curselection()
         if not selected_indices:
             messagebox.showwarning("警告", "請先在左側列表選擇要提供服務的資料\n\n提示: 可以按住 Ctrl 鍵多選")
             return
+        if self.processor is None or self.vector_db is None:
+            messagebox.showwarning("警告", "嵌入模型仍在載入中，請稍候")
+            return
             
         selected_names = [self.data_listbox.get(i) for i in selected_indices]
+        endpoint = self.endpoint_entry.get().strip()
+        
+        if self.mcp_server is not None and self.mcp_server.should_exit:
+            messagebox.showwarning("警告", "MCP Server 仍在停止中，請先停止後再啟動")
+            return
         
-        # 啟動 MCP Server 程序（stdio 模式）
         try:
-            cmd = [sys.executable, "mcp_server.py"] + selected_names
-            self.mcp_process = subprocess.Popen(
-                cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=os.path.dirname(__file__) if os.path.dirname(__file__) else os.getcwd()
-            )
-            
-            # 儲存選中的資料名稱供顯示
-            self.current_mcp_data = selected_names
-            
-            # 更新 UI
-            self.start_mcp_btn.config(state="disabled")
-            self.stop_mcp_btn.config(state="normal")
-            self.mcp_status_label.config(text="● 運行中", foreground="green")
+            import mcp_server
             
-            # 顯示連接資訊 - stdio 模式
-            mcp_info = f"MCP Server 已啟動\n\n"
-            mcp_info += f"模式: stdio (標準 MCP 協議)\n\n"
-            mcp_info += f"服務資料: {', '.join(selected_names)}\n\n"
-            mcp_info += f"配置方式:\n"
-            mcp_info += f"參考 MCP_USAGE.md 配置 Claude Desktop 或 GitHub Copilot"
-            
-            self.mcp_command_text.config(state="normal")
-            self.mcp_command_text.delete("1.0", "end")
-            self.mcp_command_text.insert("1.0", mcp_info)
-            self.mcp_command_text.config(state="disabled")
+            if self.mcp_server is None:
+                mcp_server.initialize_server(
+                    [],
+                    processor=self.processor,
+                    vector_db=self.vector_db,
+                    warm_up=False
+                )
+            mcp_server.register_endpoint(endpoint, selected_names)
+            self._log(f"✓ 端點 {self._endpoint_url(endpoint)}: {', '.join(selected_names)}")
             
-            self._log(f"✓ MCP Server 已啟動 (stdio 標準協議)")
-            self._log(f"  服務資料: {', '.join(selected_names)}")
-            self._log(f"  進程 ID: {self.mcp_process.pid}")
+            if self.mcp_server is None:
+                self.mcp_server = mcp_server.create_http_server()
+                self.mcp_thread = threading.Thread(target=self.mcp_server.run, daemon=True)
+                self.mcp_thread.start()
+                self.mcp_status_label.config(text="● 啟動中", foreground="orange")
+                self.root.after(100, self._check_mcp_started)
+            else:
+                self._show_mcp_endpoints()
             
         except Exception as e:
             messagebox.showerror("錯誤", f"啟動 MCP Server 失敗:\n{str(e)}")
             self._log(f"✗ MCP Server 啟動失敗: {str(e)}")
-            import traceback
-            traceback.print_exc()
+    
+    def _check_mcp_started(self):
+        """等待背景執行緒中的 Server 完成啟動（埠號被占用時執行緒會結束）"""
+        if self.mcp_server is None:
+            return
+        if self.mcp_server.started:
+            self.start_mcp_btn.config(text="＋ 新增端點")
+            self.stop_mcp_btn.config(state="normal")
+            self.mcp_status_label.config(text="● 運行中", foreground="green")
+            self._show_mcp_endpoints()
+            self._log(f"✓ MCP Server 已啟動 (HTTP/SSE): {config.MCP_SERVER_URL}")
+        elif not self.mcp_thread.is_alive():
+            self.mcp_server = None
+            self.mcp_thread = None
+            self.mcp_status_label.config(text="● 未啟動", foreground="gray")
+            self._log(f"✗ MCP Server 啟動失敗（埠號 {config.MCP_SERVER_PORT} 可能已被使用）")
+            messagebox.showerror("錯誤", f"啟動 MCP Server 失敗\n埠號 {config.MCP_SERVER_PORT} 可能已被使用")
+        else:
+            self.root.after(100, self._check_mcp_started)
+    
+    @staticmethod
+    def _endpoint_url(endpoint: str) -> str:
+        """端點的 StreamableHTTP URL"""
+        prefix = f"/{endpoint}" if endpoint else ""
+        return f"http://{config.MCP_SERVER_HOST}:{config.MCP_SERVER_PORT}{prefix}{config.MCP_SERVER_PATH}"
+    
+    def _show_mcp_endpoints(self):
+        """顯示所有端點的連接資訊"""
+        import mcp_server
+        
+        mcp_info = "模式: HTTP/SSE（StreamableHTTP 與 SSE 皆可）\n\n"
+        for endpoint, data_names in mcp_server.get_endpoints().items():
+            if data_names:
+                mcp_info += f"{self._endpoint_url(endpoint)}\n  {', '.join(data_names)}\n"
+        mcp_info += "\n配置方式: 參考 MCP_USAGE.md"
+        
+        self.mcp_command_text.config(state="normal")
+        self.mcp_command_text.delete("1.0", "end")
+        self.mcp_command_text.insert("1.0", mcp_info)
+        self.mcp_command_text.config(state="disabled")
             
     def _stop_mcp_server(self):
-        """停止 MCP Server"""
-        if hasattr(self, 'mcp_process') and self.mcp_process:
+        """停止 MCP Server（移除所有端點）"""
+        if self.mcp_server is not None:
             try:
-                self.mcp_process.terminate()
-                self.mcp_process.wait(timeout=3)
-            except subprocess.TimeoutExpired:
-                self.mcp_process.kill()
-                self.mcp_process.wait()
+                self.mcp_server.should_exit = True
+                self.mcp_thread.join(timeout=5)
+                if self.mcp_thread.is_alive():
+                    # 仍有連線未結束時，不再等待連線與背景工作直接關閉
+                    self.mcp_server.force_exit = True
+                    self.mcp_thread.join(timeout=2)
             except Exception as e:
                 self._log(f"停止時發生錯誤: {e}")
-            finally:
-                self.mcp_process = None
+            
+            if self.mcp_thread.is_alive():
+                # 保留參考：埠號仍被占用，可再按一次停止，也不會在同一埠號重複啟動
+                self.mcp_status_label.config(text="● 停止中", foreground="orange")
+                self._log(f"✗ MCP Server 未能停止（埠號 {config.MCP_SERVER_PORT} 仍被占用）")
+                messagebox.showerror("錯誤", f"MCP Server 未能停止\n埠號 {config.MCP_SERVER_PORT} 仍被占用，請稍後再試")
+                return
+            self.mcp_server = None
+            self.mcp_thread = None
         
         # 更新 UI
-        self.start_mcp_btn.config(state="normal")
+        self.start_mcp_btn.config(text="▶ Start Server")
         self.stop_mcp_btn.config(state="disabled")
         self.mcp_status_label.config(text="● 未啟動", foreground="gray")
         
@@ -330,7 +507,7 @@ class LocalRAGApp:
             
     def cleanup(self):
         """清理資源"""
-        if self.mcp_process:
+        if self.mcp_server is not None:
             self._stop_mcp_server()
 
 
@@ -0,0 +1,497 @@
+"""
+批次匯入模組 - 以多程序平行轉換文件，並共用單一嵌入階段批次寫入 Qdrant
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import config
+
+
+# 子程序內的 MarkItDown 實例（每個 worker 只建立一次）
+_worker_markitdown = None
+
+
+def _init_worker():
+    """子程序初始化：只載入 MarkItDown，不載入嵌入模型"""
+    global _worker_markitdown
+    from markitdown import MarkItDown
+    _worker_markitdown = MarkItDown()
+
+
+def _convert_worker(file_path: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    在子程序中轉換單一文件
+
+    Args:
+        file_path: 文件路徑
+
+    Returns:
+        (文件路徑, Markdown 文字, 錯誤訊息) - 成功時錯誤訊息為 None
+    """
+    try:
+        result = _worker_markitdown.convert(file_path)
+        return file_path, result.text_content, None
+    except Exception as e:
+        return file_path, None, f"文件轉換失敗: {str(e)}"
+
+
+def collect_files(paths: Iterable[str], recursive: bool = True) -> List[str]:
+    """
+    展開目錄與檔案路徑，只保留支援的檔案格式
+
+    Args:
+        paths: 檔案或目錄路徑
+        recursive: 是否遞迴搜尋子目錄
+
+    Returns:
+        排序後的檔案路徑列表（去重）
+    """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                for dir_path, _, file_names in os.walk(path):
+                    for file_name in file_names:
+                        files.add(os.path.join(dir_path, file_name))
+            else:
+                for file_name in os.listdir(path):
+                    files.add(os.path.join(path, file_name))
+        elif os.path.isfile(path):
+            files.add(path)
+
+    return sorted(
+        os.path.abspath(f) for f in files
+        if os.path.splitext(f)[1].lower() in config.SUPPORTED_EXTENSIONS
+    )
+
+
+def common_root(paths: Iterable[str]) -> Optional[str]:
+    """
+    匯入路徑的共同根目錄（目錄本身或檔案所在的目錄）
+
+    Args:
+        paths: 檔案或目錄路徑
+
+    Returns:
+        共同根目錄；沒有共同根目錄（例如位於不同磁碟）時為 None
+    """
+    dirs = [
+        os.path.abspath(path) if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+        for path in paths
+    ]
+    try:
+        return os.path.commonpath(dirs) if dirs else None
+    except ValueError:
+        return None
+
+
+def file_key(file_path: str, root: Optional[str]) -> str:
+    """
+    檔案在資料名稱中的識別名稱：相對於匯入根目錄的路徑（以 / 分隔），
+    不同子目錄中的同名檔案因此不會互相覆蓋；不在根目錄下時使用檔名
+
+    Args:
+        file_path: 檔案路徑
+        root: 匯入根目錄（None 表示只使用檔名）
+
+    Returns:
+        檔案識別名稱（資料目錄、payload 的 file_name 與匯入紀錄共用）
+    """
+    if root is not None:
+        try:
+            relative = os.path.relpath(os.path.abspath(file_path), root)
+        except ValueError:
+            # 位於不同磁碟（Windows）
+            relative = None
+        # 比對第一層路徑，名稱以 .. 開頭的檔案（例如 ..notes.md）仍在根目錄下
+        if relative is not None and relative.split(os.sep, 1)[0] != os.pardir:
+            return relative.replace(os.sep, "/")
+    return os.path.basename(file_path)
+
+
+class _FileSync:
+    """單一檔案的增量同步狀態：比對分塊雜湊，只保留需要重新嵌入的分塊"""
+
+    def __init__(self, vector_db, data_name: str, file_name: str,
+                 file_hash: str, existing: Optional[Dict[str, int]] = None):
+        from vector_db import hash_text, make_point_id
+        self._hash_text = hash_text
+        self._make_point_id = make_point_id
+
+        self.vector_db = vector_db
+        self.data_name = data_name
+        self.file_name = file_name
+        self.file_hash = file_hash
+        self.existing = existing or {}
+        self.seen = set()
+        self.moved: Dict[str, int] = {}
+        self.index = 0
+        self.inserted = 0
+        self.byte_size = 0
+
+    def add(self, chunk: str) -> Optional[Tuple[int, str]]:
+        """
+        加入下一個分塊
+
+        Returns:
+            (chunk_index, 分塊雜湊) 表示需要嵌入；資料庫已有相同分塊則回傳 None
+        """
+        chunk_hash = self._hash_text(chunk)
+        point_id = self._make_point_id(self.data_name, self.file_name, chunk_hash)
+        if point_id in self.seen:
+            # 同一檔案內重複的分塊只保留一份（不佔用 chunk_index，索引保持連續）
+            return None
+        self.seen.add(point_id)
+        index = self.index
+        self.index += 1
+        self.byte_size += len(chunk.encode("utf-8"))
+
+        if point_id in self.existing:
+            if self.existing[point_id] != index:
+                self.moved[point_id] = index
+            return None
+        return index, chunk_hash
+
+    def finish(self) -> Dict:
+        """更新位置變動的分塊、移除過時分塊並標記檔案同步完成"""
+        stale = [point_id for point_id in self.existing if point_id not in self.seen]
+        self.vector_db.update_chunk_indexes(self.moved)
+        deleted = self.vector_db.delete_points(stale)
+        self.vector_db.mark_file_synced(self.data_name, self.file_name, self.file_hash,
+                                        len(self.seen), self.byte_size)
+        return {
+            'chunks': len(self.seen),
+            'inserted': self.inserted,
+            'reused': len(self.seen) - self.inserted,
+            'deleted': deleted
+        }
+
+
+def ingest_files(file_paths: List[str], data_name: str,
+                 processor=None, vector_db=None,
+                 max_workers: Optional[int] = None,
+                 embed_batch_size: Optional[int] = None,
+                 log: Callable[[str], None] = print,
+                 root: Optional[str] = None) -> Dict:
+    """
+    批次匯入多個文件：平行轉換 → 分塊 → 共用嵌入 → 批次寫入
+
+    以內容雜湊做增量同步：檔案雜湊未變的檔案直接略過（不轉換），
+    變動的檔案只嵌入新增或修改的分塊，並移除已不存在的舊分塊。
+
+    轉換在程序池中執行，主程序同時負責分塊與嵌入。
+    分塊逐一產生並累積到 embed_batch_size 個後一次送入模型，再由 BulkWriter
+    分批寫入資料庫（連線 Qdrant Server 時與下一批的嵌入同時進行），
+    因此記憶體用量受批次大小限制，大型文件也會被拆成多批寫入。
+    已寫入的批次記錄在匯入紀錄中，中斷後重新匯入會沿用已寫入的分塊。
+    檔案以相對於 root 的路徑識別（見 file_key），重新匯入時應使用相同的根目錄。
+
+    Args:
+        file_paths: 文件路徑列表
+        data_name: 資料名稱
+        processor: 文件處理器實例（可選）
+        vector_db: 向量資料庫實例（可選）
+        max_workers: 轉換程序數量（預設 config.INGEST_WORKERS）
+        embed_batch_size: 每次嵌入的分塊數量（預設 config.INGEST_EMBED_BATCH_SIZE）
+        log: 進度訊息回調
+        root: 匯入根目錄（預設為所有檔案的共同目錄，見 common_root）
+
+    Returns:
+        匯入結果統計字典
+    """
+    if processor is None:
+        from document_processor import DocumentProcessor
+        processor = DocumentProcessor()
+    if vector_db is None:
+        from vector_db import VectorDatabase
+        vector_db = VectorDatabase()
+    if max_workers is None:
+        max_workers = config.INGEST_WORKERS
+    if embed_batch_size is None:
+        embed_batch_size = config.INGEST_EMBED_BATCH_SIZE
+    if root is None:
+        root = common_root(file_paths)
+    from vector_db import hash_file
+    from bulk_writer import BulkWriter, IngestJournal
+
+    start_time = time.time()
+    summary = {
+        'data_name': data_name,
+        'files': 0,
+        'skipped': 0,
+        'chunks': 0,
+        'embedded': 0,
+        'deleted': 0,
+        'resumed': 0,
+        'failed': []
+    }
+
+    # 比對已同步的檔案雜湊，未變更的檔案不需要轉換
+    known_hashes = vector_db.get_file_hashes(data_name)
+    file_hashes: Dict[str, str] = {}
+    file_names: Dict[str, str] = {}
+    used_names = set()
+    changed_paths = []
+    for file_path in file_paths:
+        file_name = file_key(file_path, root)
+        if file_name in used_names:
+            summary['failed'].append((file_name, f"與其他檔案的名稱相同: {file_path}"))
+            log(f"✗ {file_name}: 與其他檔案的名稱相同（{file_path}）")
+            continue
+        file_names[file_path] = file_name
+        used_names.add(file_name)
+        try:
+            file_hash = hash_file(file_path)
+        except OSError as e:
+            summary['failed'].append((file_name, str(e)))
+            log(f"✗ {file_name}: {str(e)}")
+            continue
+        if known_hashes.get(file_name) == file_hash:
+            summary['skipped'] += 1
+            continue
+        file_hashes[file_path] = file_hash
+        changed_paths.append(file_path)
+    if summary['skipped']:
+        log(f"○ {summary['skipped']} 個檔案未變更，略過")
+
+    journal = IngestJournal(data_name)
+    writer = BulkWriter(vector_db, journal=journal, log=log)
+
+    # 待嵌入的片段: [同步狀態, 分塊, 分塊雜湊, chunk_index, 是否為該檔最後一段]
+    pending: List[list] = []
+    pending_chunks = 0
+    # 所有分塊已送出寫入、等待寫入完成後才能標記同步完成的檔案
+    finishing: List[_FileSync] = []
+
+    def finish_files():
+        """等待已送出的批次寫入完成，再完成這些檔案的同步"""
+        writer.wait()
+        for sync in finishing:
+            result = sync.finish()
+            journal.finish_file(data_name, sync.file_name)
+            summary['files'] += 1
+            summary['chunks'] += result['chunks']
+            summary['embedded'] += result['inserted']
+            summary['deleted'] += result['deleted']
+            log(f"✓ {sync.file_name} ({result['chunks']} 個分塊, "
+                f"新增 {result['inserted']}, 沿用 {result['reused']}, 移除 {result['deleted']})")
+        finishing.clear()
+
+    def flush():
+        """將累積的分塊一次嵌入，再依檔案片段送出寫入"""
+        nonlocal pending, pending_chunks
+        if not pending:
+            return
+        all_chunks = [chunk for segment in pending for chunk in segment[1]]
+        embeddings = processor.embed_text(all_chunks) if all_chunks else []
+
+        # 上一批在嵌入期間寫入，此時才確認完成
+        finish_files()
+
+        offset = 0
+        for sync, chunks, chunk_hashes, chunk_indexes, is_last in pending:
+            if chunks:
+                sync.inserted += writer.write(
+                    chunks=chunks,
+                    embeddings=embeddings[offset:offset + len(chunks)],
+                    file_name=sync.file_name,
+                    data_name=data_name,
+                    chunk_hashes=chunk_hashes,
+                    chunk_indexes=chunk_indexes
+                )
+                offset += len(chunks)
+            if is_last:
+                finishing.append(sync)
+
+        pending = []
+        pending_chunks = 0
+
+    def handle(file_path: str, text: Optional[str], error: Optional[str]):
+        """將已轉換的文件逐塊比對雜湊，需要嵌入的分塊加入待嵌入佇列"""
+        nonlocal pending_chunks
+        file_name = file_names[file_path]
+        if error is not None:
+            summary['failed'].append((file_name, error))
+            log(f"✗ {file_name}: {error}")
+            return
+
+        # 在修改任何點之前記錄，中斷時下次開啟資料庫只需重新統計這些檔案
+        journal.begin_file(data_name, file_name)
+        vector_db.begin_file_sync(data_name, file_name)
+        if file_name in known_hashes:
+            existing = vector_db.get_file_points(data_name, file_name)
+        else:
+            # 從未同步過的檔案只需確認上次中斷時已寫入的點是否仍存在
+            committed = journal.committed(data_name, file_name)
+            existing = vector_db.get_existing_points(list(committed)) if committed else None
+            if existing:
+                summary['resumed'] += 1
+                log(f"○ {file_name}: 沿用上次中斷前已寫入的 {len(existing)} 個分塊")
+        sync = _FileSync(vector_db, data_name, file_name, file_hashes[file_path], existing)
+
+        segment = None
+        for chunk in processor.iter_chunks(text):
+            added = sync.add(chunk)
+            if added is None:
+                continue
+            if segment is None:
+                segment = [sync, [], [], [], False]
+                pending.append(segment)
+            segment[1].append(chunk)
+            segment[3].append(added[0])
+            segment[2].append(added[1])
+            pending_chunks += 1
+            if pending_chunks >= embed_batch_size:
+                flush()
+                segment = None
+
+        if segment is None:
+            pending.append([sync, [], [], [], True])
+        else:
+            segment[4] = True
+
+    error = None
+    try:
+        if len(changed_paths) <= 1 or max_workers <= 1:
+            # 少量檔案不值得啟動程序池，直接使用現有的處理器
+            for file_path in changed_paths:
+                try:
+                    text = processor.convert_to_markdown(file_path)
+                except Exception as e:
+                    handle(file_path, None, str(e))
+                    continue
+                handle(file_path, text, None)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_init_worker) as pool:
+                # 同時最多 2 × max_workers 個檔案在轉換中或等待處理，
+                # 已轉換的 Markdown 處理完就釋放，記憶體用量不隨檔案數量增加
+                paths = iter(changed_paths)
+                running = {pool.submit(_convert_worker, path)
+                           for path in islice(paths, max_workers * 2)}
+                while running:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    # 先補上新的轉換，子程序在主程序嵌入期間繼續工作
+                    running.update(pool.submit(_convert_worker, path)
+                                   for path in islice(paths, len(done)))
+                    while done:
+                        handle(*done.pop().result())
+        flush()
+        finish_files()
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        # 每個步驟各自執行：一個失敗不會略過其他步驟，也不會取代匯入本身的例外
+        # （匯入結束才儲存，NumPy 儲存在匯入期間只定期儲存）
+        close_error = None
+        for close in (writer.close, journal.close, vector_db.flush):
+            try:
+                close()
+            except Exception as e:
+                log(f"✗ 結束匯入時發生錯誤: {e}")
+                close_error = close_error or e
+        if close_error is not None and error is None:
+            raise close_error
+
+    summary['elapsed'] = time.time() - start_time
+    summary['points_written'] = writer.points_written
+    summary['points_per_second'] = writer.points_per_second
+    if writer.points_written:
+        log(f"寫入 {writer.points_written} 個點 ({writer.points_per_second:.0f} points/s)")
+    return summary
+
+
+def main():
+    """命令列入口"""
+    parser = argparse.ArgumentParser(
+        description="Local RAG 批次匯入 - 將目錄或多個檔案匯入指定的資料名稱"
+    )
+
+    parser.add_argument(
+        "data_name",
+        help="資料名稱"
+    )
+
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="要匯入的檔案或目錄"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.INGEST_WORKERS,
+        help=f"文件轉換程序數量（預設: {config.INGEST_WORKERS}）"
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=config.INGEST_EMBED_BATCH_SIZE,
+        help=f"每次嵌入的分塊數量（預設: {config.INGEST_EMBED_BATCH_SIZE}）"
+    )
+
+    parser.add_argument(
+        "--no-recursive",
+        action="store_true",
+        help="不遞迴搜尋子目錄"
+    )
+
+    parser.add_argument(
+        "--publish",
+        action="store_true",
+        help="匯入完成後發佈唯讀快照（包含目前快照的資料名稱與本次的資料名稱）"
+    )
+
+    args = parser.parse_args()
+
+    files = collect_files(args.paths, recursive=not args.no_recursive)
+    root = common_root(args.paths)
+    if not files:
+        print("找不到支援的檔案", file=sys.stderr)
+        return 1
+
+    from vector_db import VectorDatabase
+    vector_db = VectorDatabase()
+
+    print(f"開始匯入 {len(files)} 個檔案到: {args.data_name}")
+    summary = ingest_files(
+        files,
+        args.data_name,
+        vector_db=vector_db,
+        max_workers=args.workers,
+        embed_batch_size=args.batch_size,
+        root=root
+    )
+
+    print(f"完成: {summary['files']} 個檔案, {summary['chunks']} 個分塊 "
+          f"(新嵌入 {summary['embedded']}, 移除 {summary['deleted']}), "
+          f"略過 {summary['skipped']} 個未變更檔案, 耗時 {summary['elapsed']:.1f} 秒 "
+          f"({summary['points_per_second']:.0f} points/s)")
+    if summary['failed']:
+        print(f"失敗 {len(summary['failed'])} 個檔案:")
+        for file_name, error in summary['failed']:
+            print(f"  - {file_name}: {error}")
+        return 1
+
+    if args.publish:
+        import snapshots
+        version = snapshots.current_version()
+        data_names = set(snapshots.read_manifest(version)['data_names']) if version else set()
+        data_names &= set(vector_db.get_all_data_names())
+        data_names.add(args.data_name)
+        manifest = snapshots.publish_snapshot(sorted(data_names), vector_db)
+        print(f"已發佈快照 {manifest['name']}: {', '.join(manifest['data_names'])} "
+              f"({manifest['points']} 個點)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+詞彙索引模組 - CJK 感知的斷詞與 BM25 稀疏向量（搭配 Qdrant 的 IDF modifier）
+"""
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import config
+
+
+# 英數識別碼（可含 - _ . : / 連接，例如 E-1042、0x1F、ABC-123.4）或連續的 CJK 字元
+_TOKEN_RE = re.compile(
+    r"[0-9a-z]+(?:[\-_.:/][0-9a-z]+)*"
+    r"|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]+"
+)
+_PART_SPLIT_RE = re.compile(r"[\-_.:/]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    斷詞：英數識別碼保留完整形式並另外加入各組成部分；
+    CJK 連續字元切成相鄰二字組（單一字元則保留單字）
+
+    Args:
+        text: 輸入文字
+
+    Returns:
+        Token 列表（可重複，供計算詞頻）
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if token[0].isascii():
+            tokens.append(token)
+            parts = _PART_SPLIT_RE.split(token)
+            if len(parts) > 1:
+                tokens.extend(part for part in parts if part)
+        elif len(token) == 1:
+            tokens.append(token)
+        else:
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return tokens
+
+
+def token_id(token: str) -> int:
+    """將 Token 雜湊為 32 位元的稀疏向量維度"""
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _to_sparse(weights: Dict[int, float]) -> Tuple[List[int], List[float]]:
+    indices = sorted(weights)
+    return indices, [weights[index] for index in indices]
+
+
+def document_vector(text: str) -> Tuple[List[int], List[float]]:
+    """
+    文件的 BM25 詞頻權重（IDF 由 Qdrant 的 IDF modifier 在查詢時計算）
+
+    權重為 tf·(k1+1) / (tf + k1·(1 - b + b·dl/avgdl))，
+    avgdl 使用 config.LEXICAL_AVG_DOC_TOKENS 的固定估計值。
+
+    Args:
+        text: 分塊文字
+
+    Returns:
+        (維度列表, 權重列表)
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return [], []
+    k1 = config.LEXICAL_BM25_K1
+    b = config.LEXICAL_BM25_B
+    length_norm = 1 - b + b * len(tokens) / config.LEXICAL_AVG_DOC_TOKENS
+
+    weights: Dict[int, float] = {}
+    for token, tf in Counter(tokens).items():
+        index = token_id(token)
+        weights[index] = weights.get(index, 0.0) + tf * (k1 + 1) / (tf + k1 * length_norm)
+    return _to_sparse(weights)
+
+
+def query_vector(text: str) -> Tuple[List[int], List[float]]:
+    """
+    查詢的稀疏向量（每個不重複的 Token 權重為 1）
+
+    Args:
+        text: 查詢文字
+
+    Returns:
+        (維度列表, 權重列表)
+    """
+    return _to_sparse({token_id(token): 1.0 for token in tokenize(text)})
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], limit: int, k: int = None) -> List[Dict]:
+    """
+    以 Reciprocal Rank Fusion 合併多個排序結果
+
+    每個結果的分數為 Σ 1 / (k + 名次)，同一分塊以 (資料名稱, 檔名, chunk_index) 判斷。
+
+    Args:
+        rankings: 各檢索方式的結果列表（依相關度排序）
+        limit: 返回結果數量
+        k: RRF 常數（預設 config.HYBRID_RRF_K）
+
+    Returns:
+        合併後的結果列表，score 為 RRF 分數
+    """
+    k = config.HYBRID_RRF_K if k is None else k
+    fused: Dict[Tuple, Dict] = {}
+    scores: Dict[Tuple, float] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, 1):
+            key = (result['data_name'], result['file_name'], result['chunk_index'])
+            if key not in fused:
+                fused[key] = dict(result)
+                scores[key] = 0.0
+            scores[key] += 1.0 / (k + rank)
+
+    ordered = sorted(fused, key=lambda key: scores[key], reverse=True)[:limit]
+    results = []
+    for key in ordered:
+        result = fused[key]
+        result['score'] = scores[key]
+        results.append(result)
+    return results
@@ -7,10 +7,14 @@ import os
 # 確保可以導入本地模組
 sys.path.insert(0, os.path.dirname(__file__))
 
+import config
 from gui_app import main as gui_main
 
 
 if __name__ == "__main__":
     print("啟動 Local RAG 系統...")
-    print("使用本地 Qdrant 資料庫，資料存儲在 qdrant_data/ 目錄")
+    if config.QDRANT_MODE == "server":
+        print(f"使用 Qdrant Server: {config.QDRANT_HOST}:{config.QDRANT_PORT}")
+    else:
+        print("使用本地 Qdrant 資料庫，資料存儲在 qdrant_data/ 目錄")
     gui_main()
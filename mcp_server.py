@@ -1,30 +1,69 @@
 """
 Local RAG MCP Server - 參考 Microsoft MarkItDown 實作
 支援 stdio 和 HTTP/SSE 雙模式
+
+HTTP 模式可在同一個程序中提供多個具名端點（/<端點>/mcp、/<端點>/sse），
+每個端點只能檢索自己的資料名稱，所有端點共用同一個模型與資料庫。
+獨立執行時可從最新的唯讀快照服務（--snapshot），發佈新版本後自動切換。
 """
 import contextlib
 import sys
 import os
+import re
 import argparse
-from collections.abc import AsyncIterator
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+# mcp 套件的 __init__ 會一併匯入 FastMCP、starlette、uvicorn 與 SSE / StreamableHTTP 傳輸，
+# 任何 mcp 匯入都包含這部分成本（約 0.4 秒，見 benchmark.py startup），stdio 模式也無法避免
 from mcp.server.fastmcp import FastMCP
-from starlette.applications import Starlette
-from mcp.server.sse import SseServerTransport
-from starlette.requests import Request
-from starlette.routing import Mount, Route
-from starlette.types import Receive, Scope, Send
-from mcp.server import Server
-from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
-import uvicorn
-from typing import List, Optional
 
 import config
+from query_cache import LRUCache
+
+if TYPE_CHECKING:
+    # 只用於型別標註
+    import uvicorn
+    from mcp.server import Server
+    from starlette.applications import Starlette
+    from vector_db import VectorDatabase
+
+
+# 端點名稱 → 允許檢索的資料名稱；"" 為預設端點（stdio 模式與 /mcp、/sse）
+_endpoints: Dict[str, List[str]] = {"": []}
+_endpoints_lock = threading.Lock()
 
+# 目前請求所屬的端點（HTTP 模式由路由設定，stdio 模式固定為預設端點）
+_current_endpoint: ContextVar[str] = ContextVar("local_rag_endpoint", default="")
 
-# 全域變數用於儲存選定的資料和實例
-_selected_data_names: List[str] = []
-_processor = None
+_ENDPOINT_NAME_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_\-]*")
+_RESERVED_ENDPOINT_NAMES = {"mcp", "sse", "messages"}
+
+# 共用的查詢編碼器、資料庫與重新排序器實例
+_query_encoder = None
 _vector_db = None
+_reranker = None
+
+# 從唯讀快照服務時的快照追蹤器（snapshots.SnapshotReader）
+_snapshot_reader = None
+
+# 模型與資料庫在第一次使用時才載入（或由背景執行緒預熱）
+_components_lock = threading.Lock()
+_warmup_thread: Optional[threading.Thread] = None
+
+# 搜尋結果快取（查詢向量快取由 QueryEncoder 持有）
+_search_result_cache = LRUCache(config.SEARCH_RESULT_CACHE_SIZE)
+
+# 搜尋執行緒池與執行中（含排隊）的搜尋數量
+_search_executor: Optional[ThreadPoolExecutor] = None
+_pending_searches = 0
+_pending_lock = threading.Lock()
+_search_coalescer = None
 
 
 # 初始化 FastMCP server
@@ -33,40 +72,378 @@ mcp = FastMCP("local-rag")
 
 def initialize_server(selected_data_names: List[str],
                      processor=None,
-                     vector_db=None):
+                     vector_db=None,
+                     warm_up: bool = None,
+                     query_encoder=None):
     """
     初始化 MCP Server 的資料
     
+    Server 只需要將查詢向量化，因此使用只載入嵌入模型的 QueryEncoder，
+    不建立 DocumentProcessor（MarkItDown）。未提供的查詢編碼器與向量資料庫
+    在第一次搜尋時才載入，讓 Server 啟動後能立即回應 list_data_sources。
+    未提供向量資料庫且 config.MCP_SERVE_SNAPSHOTS 啟用時，從最新的唯讀快照服務；
+    此時預設端點未指定資料名稱表示服務快照中的所有資料名稱。
+    會清除先前註冊的具名端點。
+    
     Args:
-        selected_data_names: 資料名稱列表
-        processor: 文件處理器實例（可選）
+        selected_data_names: 預設端點允許檢索的資料名稱列表
+        processor: 文件處理器實例（可選，提供時共用其嵌入模型）
         vector_db: 向量資料庫實例（可選）
+        warm_up: 是否在背景執行緒預先載入模型與資料庫（預設 config.MCP_WARMUP）
+        query_encoder: 查詢編碼器實例（可選）
     """
-    global _selected_data_names, _processor, _vector_db
+    global _query_encoder, _vector_db, _warmup_thread, _snapshot_reader
     
-    _selected_data_names = selected_data_names
+    with _endpoints_lock:
+        _endpoints.clear()
+        _endpoints[""] = list(selected_data_names)
+    _search_result_cache.clear()
     
-    if processor is not None:
-        _processor = processor
-    else:
-        from document_processor import DocumentProcessor
-        _processor = DocumentProcessor()
-        
-    if vector_db is not None:
+    if query_encoder is None and processor is not None:
+        from query_encoder import QueryEncoder
+        query_encoder = QueryEncoder(processor.embedding_backend)
+    
+    with _components_lock:
+        _query_encoder = query_encoder
         _vector_db = vector_db
-    else:
-        from vector_db import VectorDatabase
-        _vector_db = VectorDatabase()
+        if vector_db is None and config.MCP_SERVE_SNAPSHOTS:
+            from snapshots import SnapshotReader
+            _snapshot_reader = SnapshotReader()
+        else:
+            _snapshot_reader = None
+    
+    if warm_up is None:
+        warm_up = config.MCP_WARMUP
+    if warm_up and (query_encoder is None or vector_db is None):
+        _warmup_thread = threading.Thread(target=_warm_up, name="mcp-warmup", daemon=True)
+        _warmup_thread.start()
+
+
+def register_endpoint(name: str, data_names: List[str]):
+    """
+    註冊（或更新）端點允許檢索的資料名稱，可在 Server 執行中呼叫
+    
+    Args:
+        name: 端點名稱（"" 為預設端點；其他名稱僅限英數字、底線與連字號）
+        data_names: 允許檢索的資料名稱列表
+    """
+    if name and (not _ENDPOINT_NAME_RE.fullmatch(name) or name in _RESERVED_ENDPOINT_NAMES):
+        raise ValueError(f"無效的端點名稱: {name}")
+    with _endpoints_lock:
+        _endpoints[name] = list(data_names)
+
+
+def unregister_endpoint(name: str):
+    """
+    移除具名端點（預設端點只會清空資料名稱）
+    
+    Args:
+        name: 端點名稱
+    """
+    with _endpoints_lock:
+        if name:
+            _endpoints.pop(name, None)
+        else:
+            _endpoints[""] = []
+
+
+def get_endpoints() -> Dict[str, List[str]]:
+    """取得所有端點及其資料名稱"""
+    with _endpoints_lock:
+        return {name: list(data_names) for name, data_names in _endpoints.items()}
+
+
+def _endpoint_data_names() -> Optional[List[str]]:
+    """目前請求所屬端點允許檢索的資料名稱（端點不存在時回傳 None）"""
+    endpoint = _current_endpoint.get()
+    with _endpoints_lock:
+        data_names = _endpoints.get(endpoint)
+    if data_names == [] and endpoint == "" and _snapshot_reader is not None:
+        # 預設端點未指定資料名稱：服務目前快照中的所有資料名稱
+        try:
+            return list(_snapshot_reader.current()[0]['data_names'])
+        except RuntimeError:
+            return []
+    return list(data_names) if data_names is not None else None
+
+
+def _get_query_encoder():
+    """取得查詢編碼器，第一次呼叫時才載入嵌入模型"""
+    global _query_encoder
+    if _query_encoder is None:
+        with _components_lock:
+            if _query_encoder is None:
+                from query_encoder import QueryEncoder
+                _query_encoder = QueryEncoder()
+    return _query_encoder
+
+
+def _current_database() -> Tuple[Optional[int], "VectorDatabase"]:
+    """
+    取得目前服務的資料庫與快照版本（不是從快照服務時版本為 None）
+
+    從快照服務時兩者一起取得，切換版本期間的搜尋不會混用新舊版本。
+    """
+    if _snapshot_reader is not None:
+        manifest, vector_db = _snapshot_reader.current()
+        return manifest['version'], vector_db
+    return None, _get_vector_db()
+
+
+def _get_vector_db():
+    """取得向量資料庫，第一次呼叫時才開啟（唯讀：資料由 GUI 或匯入程序寫入）"""
+    global _vector_db
+    if _snapshot_reader is not None:
+        return _snapshot_reader.current()[1]
+    if _vector_db is None:
+        with _components_lock:
+            if _vector_db is None:
+                from vector_db import VectorDatabase
+                _vector_db = VectorDatabase(read_only=True)
+    return _vector_db
+
+
+def _get_reranker():
+    """取得重新排序器（config.RERANK_ENABLED 關閉時回傳 None），第一次呼叫時才載入模型"""
+    global _reranker
+    if not config.RERANK_ENABLED:
+        return None
+    if _reranker is None:
+        with _components_lock:
+            if _reranker is None:
+                from reranker import Reranker
+                _reranker = Reranker()
+    return _reranker
+
+
+def _warm_up():
+    """背景預熱：開啟資料庫、載入模型並執行一次嵌入"""
+    try:
+        _get_vector_db()
+        _get_query_encoder().embedding_backend.encode(["warm up"])
+        _get_reranker()
+        print("模型與資料庫已載入", file=sys.stderr)
+    except Exception as e:
+        # 預熱失敗不影響 Server，第一次搜尋時會再嘗試並回報錯誤
+        print(f"預熱失敗: {e}", file=sys.stderr)
+
+
+class ServerBusyError(Exception):
+    """執行中與排隊中的搜尋已達上限"""
+
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    """取得搜尋用的執行緒池（最多 config.MCP_SEARCH_CONCURRENCY 個搜尋同時執行）"""
+    global _search_executor
+    if _search_executor is None:
+        with _components_lock:
+            if _search_executor is None:
+                _search_executor = ThreadPoolExecutor(
+                    max_workers=config.MCP_SEARCH_CONCURRENCY,
+                    thread_name_prefix="mcp-search"
+                )
+    return _search_executor
+
+
+@contextlib.contextmanager
+def _search_admission(count: int = 1):
+    """
+    搜尋的准入控制：執行中與排隊中的查詢超過
+    config.MCP_SEARCH_CONCURRENCY + config.MCP_SEARCH_QUEUE_SIZE 時立即拒絕，
+    避免無限制累積延遲
+    
+    Args:
+        count: 本次請求的查詢數量
+    
+    Raises:
+        ServerBusyError: 執行中與排隊中的搜尋已達上限
+    """
+    global _pending_searches
+    with _pending_lock:
+        if _pending_searches + count > config.MCP_SEARCH_CONCURRENCY + config.MCP_SEARCH_QUEUE_SIZE:
+            raise ServerBusyError("Server 忙碌中，請稍後再試")
+        _pending_searches += count
+    try:
+        yield
+    finally:
+        with _pending_lock:
+            _pending_searches -= count
+
+
+async def _run_search_job(func, *args):
+    """在搜尋執行緒池中執行同步工作（超過並行上限時在執行緒池中排隊）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_search_executor(), functools.partial(func, *args))
+
+
+def _search_many(requests: List[Tuple[str, int, List[str]]]) -> List[List[Dict]]:
+    """
+    同步批次搜尋：未命中結果快取的查詢以一次模型前向運算向量化，
+    相同資料範圍與結果數量的查詢再以一次批次請求搜尋；
+    啟用重新排序時每個查詢先取回 config.RERANK_CANDIDATES 個候選，
+    再由 Cross-Encoder 排序後取前 limit 個
+    
+    Args:
+        requests: (查詢文字, 結果數量, 資料名稱列表) 的列表
+    
+    Returns:
+        與 requests 順序相同的搜尋結果列表
+    """
+    from embedding_cache import normalize_text
+    snapshot_version, vector_db = _current_database()
+    query_encoder = _get_query_encoder()
+    reranker = _get_reranker()
+    version = (snapshot_version, vector_db.version)
+    
+    # 相同查詢（忽略空白差異）且資料未變動時直接使用快取結果
+    keys = [
+        (normalize_text(query), limit, tuple(sorted(data_names)), version)
+        for query, limit, data_names in requests
+    ]
+    results = {key: _search_result_cache.get(key) for key in keys}
+    missing = [key for key, result in results.items() if result is None]
+    if missing:
+        # 生成查詢向量（整批一次）
+        start = time.perf_counter()
+        vectors = query_encoder.encode_many([key[0] for key in missing])
+        encode_ms = (time.perf_counter() - start) * 1000
+        
+        # 依資料範圍與結果數量分組，每組一次批次搜尋
+        start = time.perf_counter()
+        groups: Dict[Tuple, List[int]] = {}
+        for position, key in enumerate(missing):
+            groups.setdefault(key[1:3], []).append(position)
+        hits_list: List[Optional[List[Dict]]] = [None] * len(missing)
+        for (limit, data_names), positions in groups.items():
+            batch_results = vector_db.search_batch(
+                [vectors[position] for position in positions],
+                data_names=list(data_names),
+                limit=max(limit, config.RERANK_CANDIDATES) if reranker else limit,
+                query_texts=[missing[position][0] for position in positions]
+            )
+            for position, hits in zip(positions, batch_results):
+                hits_list[position] = hits
+        search_ms = (time.perf_counter() - start) * 1000
+        
+        timing = f"編碼 {encode_ms:.1f} ms，搜尋 {search_ms:.1f} ms"
+        reranked = len(missing)
+        if reranker:
+            # 所有查詢的候選合併推論；超過延遲預算時其餘查詢保留向量排序（不寫入快取）
+            start = time.perf_counter()
+            hits_list, reranked = reranker.rerank_many(
+                [key[0] for key in missing],
+                hits_list,
+                max(config.RERANK_CANDIDATES, max(key[1] for key in missing))
+            )
+            hits_list = [hits[:key[1]] for key, hits in zip(missing, hits_list)]
+            timing += f"，重新排序 {(time.perf_counter() - start) * 1000:.1f} ms"
+        print(f"搜尋批次: {len(requests)} 個查詢，{len(missing)} 個需要搜尋（{timing}）",
+              file=sys.stderr)
+        
+        for position, key in enumerate(missing):
+            results[key] = hits_list[position]
+            if position < reranked:
+                _search_result_cache.put(key, hits_list[position])
+    return [results[key] for key in keys]
+
+
+async def _search_batch_job(requests: List[Tuple[str, int, List[str]]]) -> List[List[Dict]]:
+    """合併器的批次處理函式：在搜尋執行緒池中執行一整批搜尋"""
+    return await _run_search_job(_search_many, requests)
+
+
+def _get_search_coalescer():
+    """取得查詢合併器（同時到達的 search_documents 請求合併為一批）"""
+    global _search_coalescer
+    if _search_coalescer is None:
+        from query_batcher import RequestCoalescer
+        _search_coalescer = RequestCoalescer(
+            _search_batch_job,
+            window_ms=config.QUERY_BATCH_WINDOW_MS,
+            max_batch_size=config.QUERY_BATCH_MAX_SIZE
+        )
+    return _search_coalescer
+
+
+# search_documents_batch 每次最多的查詢數
+MAX_BATCH_QUERIES = 20
+
+
+def _resolve_data_names(data_names: Optional[List[str]]) -> Tuple[List[str], Optional[str]]:
+    """
+    依目前端點的允許清單決定要搜尋的資料名稱
+    
+    預設端點未指定資料名稱時不限制，搜尋資料庫中的所有資料名稱（與先前版本相同）；
+    具名端點只能搜尋註冊時指定的資料名稱。
+    
+    Args:
+        data_names: 呼叫端指定的資料名稱（None 表示端點允許的全部）
+    
+    Returns:
+        (要搜尋的資料名稱, 錯誤訊息)；錯誤訊息為 None 表示通過驗證，
+        資料名稱為空列表表示搜尋全部
+    """
+    allowed = _endpoint_data_names()
+    if not allowed and _current_endpoint.get() == "":
+        return list(dict.fromkeys(data_names or [])), None
+    if not allowed:
+        return [], "錯誤: 目前沒有可用的資料來源"
+    if data_names:
+        denied = [name for name in data_names if name not in allowed]
+        if denied:
+            return [], (f"錯誤: 無法存取資料來源 {', '.join(denied)}"
+                        f"（可用: {', '.join(allowed)}）")
+        return list(dict.fromkeys(data_names)), None
+    return allowed, None
+
+
+def _format_results(query: str, results: List[Dict], level: int = 1, omitted: int = 0) -> str:
+    """
+    將搜尋結果格式化為 Markdown
+    
+    Args:
+        query: 查詢文字
+        results: 搜尋結果列表
+        level: 最上層標題的層級（批次搜尋時每個查詢為第 2 層）
+        omitted: 因與前面查詢重複而省略的結果數
+    
+    Returns:
+        Markdown 文字
+    """
+    heading = "#" * level
+    if not results:
+        markdown = f"{heading} 搜尋結果\n\n未找到與「{query}」相關的文件。\n"
+        if omitted:
+            markdown += f"\n（{omitted} 個結果已出現在前面的查詢中）\n"
+        return markdown
+    
+    markdown = f"{heading} 搜尋結果：{query}\n\n"
+    markdown += f"找到 {len(results)} 個相關結果\n\n"
+    if omitted:
+        markdown += f"（另有 {omitted} 個結果已出現在前面的查詢中）\n\n"
+    markdown += "---\n\n"
+    
+    for idx, result in enumerate(results, 1):
+        markdown += f"{heading}# {idx}. {result['file_name']}\n\n"
+        markdown += f"**資料來源**: {result['data_name']}\n\n"
+        markdown += f"**相關度分數**: {result['score']:.4f}\n\n"
+        markdown += f"{heading}## 內容摘要\n\n"
+        markdown += f"{result['text']}\n\n"
+        markdown += "---\n\n"
+    
+    return markdown
 
 
 @mcp.tool()
-async def search_documents(query: str, limit: int = 5) -> str:
+async def search_documents(query: str, limit: int = 5,
+                           data_names: Optional[List[str]] = None) -> str:
     """
     在選定的文件資料中進行語義搜尋
     
     Args:
         query: 要搜尋的查詢文字
         limit: 返回結果數量（預設5，最大20）
+        data_names: 只搜尋這些資料來源（可選，必須是 list_data_sources 列出的名稱；預設搜尋全部）
     
     Returns:
         Markdown 格式的搜尋結果
@@ -74,43 +451,89 @@ async def search_documents(query: str, limit: int = 5) -> str:
     if not query:
         return "錯誤: 查詢文字不能為空"
     
-    print(f"搜尋查詢: {query}\n\n")
+    selected, error = _resolve_data_names(data_names)
+    if error:
+        return error
+    
+    # stdio 模式下 stdout 是協議通道，日誌一律寫到 stderr
+    print(f"搜尋查詢: {query}", file=sys.stderr)
     
     # 驗證 limit
     limit = max(1, min(20, limit))
-    print(f"搜尋 limit: {limit}\n\n")
+    print(f"搜尋 limit: {limit}", file=sys.stderr)
     
     try:
-        # 生成查詢向量
-        query_embedding = _processor.embed_text([query])[0]
-        print(f"搜尋 query_embedding 維度: {len(query_embedding)}\n\n")
+        # 與同時到達的其他查詢合併，在執行緒池中批次向量化與搜尋，不阻塞事件迴圈
+        with _search_admission():
+            results = await _get_search_coalescer().submit((query, limit, selected))
+        print(f"搜尋 result 數量: {len(results)}", file=sys.stderr)
         
-        # 在選定的資料名稱中搜尋
-        results = _vector_db.search(
-            query_vector=query_embedding,
-            data_names=_selected_data_names if _selected_data_names else None,
-            limit=limit
-        )
-        print(f"搜尋 result 數量: {len(results)}\n\n")
         # 格式化為 Markdown
-        if not results:
-            markdown = f"# 搜尋結果\n\n未找到與「{query}」相關的文件。\n"
-        else:
-            markdown = f"# 搜尋結果：{query}\n\n"
-            markdown += f"找到 {len(results)} 個相關結果\n\n"
-            markdown += "---\n\n"
-            
-            for idx, result in enumerate(results, 1):
-                markdown += f"## {idx}. {result['file_name']}\n\n"
-                markdown += f"**資料來源**: {result['data_name']}\n\n"
-                markdown += f"**相關度分數**: {result['score']:.4f}\n\n"
-                markdown += f"### 內容摘要\n\n"
-                markdown += f"{result['text']}\n\n"
-                markdown += "---\n\n"
+        return _format_results(query, results)
+        
+    except ServerBusyError as e:
+        return f"錯誤: {str(e)}"
+    except Exception as e:
+        return f"搜尋錯誤: {str(e)}"
+
+
+@mcp.tool()
+async def search_documents_batch(queries: List[str], limit: int = 5,
+                                 data_names: Optional[List[str]] = None,
+                                 dedupe: bool = False) -> str:
+    """
+    一次執行多個相關查詢的語義搜尋，結果依查詢分組
+    
+    Args:
+        queries: 查詢文字列表（最多20個）
+        limit: 每個查詢返回的結果數量（預設5，最大20）
+        data_names: 只搜尋這些資料來源（可選，必須是 list_data_sources 列出的名稱；預設搜尋全部）
+        dedupe: 是否省略已出現在前面查詢中的結果（預設否）
+    
+    Returns:
+        Markdown 格式的分組搜尋結果
+    """
+    queries = [query for query in queries if query and query.strip()]
+    if not queries:
+        return "錯誤: 查詢文字不能為空"
+    if len(queries) > MAX_BATCH_QUERIES:
+        return f"錯誤: 一次最多 {MAX_BATCH_QUERIES} 個查詢"
+    
+    selected, error = _resolve_data_names(data_names)
+    if error:
+        return error
+    
+    limit = max(1, min(20, limit))
+    print(f"批次搜尋: {len(queries)} 個查詢，limit: {limit}", file=sys.stderr)
+    
+    try:
+        # 整批一次向量化，並以 Qdrant 批次搜尋 API 查詢
+        with _search_admission(len(queries)):
+            batch_results = await _run_search_job(
+                _search_many, [(query, limit, selected) for query in queries]
+            )
+        
+        markdown = f"# 批次搜尋結果\n\n共 {len(queries)} 個查詢\n\n"
+        seen = set()
+        for query, results in zip(queries, batch_results):
+            omitted = 0
+            if dedupe:
+                unique = []
+                for result in results:
+                    key = (result['data_name'], result['file_name'], result['chunk_index'])
+                    if key in seen:
+                        omitted += 1
+                    else:
+                        seen.add(key)
+                        unique.append(result)
+                results = unique
+            markdown += _format_results(query, results, level=2, omitted=omitted)
+            markdown += "\n"
         
-        print(markdown)
         return markdown
         
+    except ServerBusyError as e:
+        return f"錯誤: {str(e)}"
     except Exception as e:
         return f"搜尋錯誤: {str(e)}"
 
@@ -124,21 +547,34 @@ async def list_data_sources() -> str:
         Markdown 格式的資料來源列表
     """
     markdown = "# 可檢索的資料來源\n\n"
+    data_names = _endpoint_data_names()
     
-    if not _selected_data_names:
+    if _snapshot_reader is not None:
+        try:
+            manifest = _snapshot_reader.current()[0]
+            markdown += f"資料版本: {manifest['name']}（發佈於 {manifest['published_at']}）\n\n"
+        except RuntimeError as e:
+            markdown += f"資料版本: 無（{e}）\n\n"
+    
+    if not data_names and _current_endpoint.get() == "":
+        markdown += "未限定資料來源，搜尋時包含資料庫中的所有資料。\n"
+    elif not data_names:
         markdown += "目前沒有可用的資料來源。\n"
     else:
-        markdown += f"本 MCP Server 提供以下 {len(_selected_data_names)} 個資料來源:\n\n"
-        for name in _selected_data_names:
+        markdown += f"本 MCP Server 提供以下 {len(data_names)} 個資料來源:\n\n"
+        for name in data_names:
             markdown += f"- **{name}**\n"
     
     return markdown
 
 
-def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlette:
+def create_starlette_app(mcp_server: "Server", *, debug: bool = False) -> "Starlette":
     """
     建立 Starlette 應用程式，支援 SSE 和 StreamableHTTP
     
+    預設端點位於 /mcp 與 /sse，具名端點位於 /<端點>/mcp 與 /<端點>/sse。
+    路由會將端點名稱設定到請求的 context，工具依此決定可檢索的資料名稱。
+    
     Args:
         mcp_server: MCP Server 實例
         debug: 除錯模式
@@ -146,6 +582,15 @@ def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlett
     Returns:
         Starlette 應用程式
     """
+    from collections.abc import AsyncIterator
+    from mcp.server.sse import SseServerTransport
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import PlainTextResponse, Response
+    from starlette.routing import Mount, Route
+    from starlette.types import Receive, Scope, Send
+    
     sse = SseServerTransport("/messages/")
     session_manager = StreamableHTTPSessionManager(
         app=mcp_server,
@@ -154,31 +599,56 @@ def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlett
         stateless=True,
     )
 
-    async def handle_sse(request: Request) -> None:
-        """處理 SSE 連接"""
-        async with sse.connect_sse(
-            request.scope,
-            request.receive,
-            request._send,
-        ) as (read_stream, write_stream):
-            await mcp_server.run(
-                read_stream,
-                write_stream,
-                mcp_server.create_initialization_options(),
-            )
+    def endpoint_exists(name: str) -> bool:
+        with _endpoints_lock:
+            return name in _endpoints
+
+    async def handle_sse(request: Request) -> Response:
+        """處理 SSE 連接（整個連線期間都屬於同一個端點）"""
+        name = request.path_params.get("endpoint", "")
+        if not endpoint_exists(name):
+            return PlainTextResponse(f"端點不存在: {name}", status_code=404)
+        
+        token = _current_endpoint.set(name)
+        try:
+            async with sse.connect_sse(
+                request.scope,
+                request.receive,
+                request._send,
+            ) as (read_stream, write_stream):
+                await mcp_server.run(
+                    read_stream,
+                    write_stream,
+                    mcp_server.create_initialization_options(),
+                )
+        finally:
+            _current_endpoint.reset(token)
+        return Response()
 
     async def handle_streamable_http(
         scope: Scope, receive: Receive, send: Send
     ) -> None:
         """處理 StreamableHTTP 請求"""
-        await session_manager.handle_request(scope, receive, send)
+        name = scope.get("path_params", {}).get("endpoint", "")
+        if not endpoint_exists(name):
+            response = PlainTextResponse(f"端點不存在: {name}", status_code=404)
+            await response(scope, receive, send)
+            return
+        
+        token = _current_endpoint.set(name)
+        try:
+            await session_manager.handle_request(scope, receive, send)
+        finally:
+            _current_endpoint.reset(token)
 
     @contextlib.asynccontextmanager
     async def lifespan(app: Starlette) -> AsyncIterator[None]:
         """應用程式生命週期管理"""
         async with session_manager.run():
             print("Local RAG MCP Server 已啟動 (HTTP/SSE 模式)!", file=sys.stderr)
-            print(f"資料來源: {', '.join(_selected_data_names)}", file=sys.stderr)
+            for name, data_names in get_endpoints().items():
+                if data_names:
+                    print(f"端點 {'/' + name if name else ''}{config.MCP_SERVER_PATH}: {', '.join(data_names)}", file=sys.stderr)
             try:
                 yield
             finally:
@@ -188,13 +658,49 @@ def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlett
         debug=debug,
         routes=[
             Route("/sse", endpoint=handle_sse),
-            Mount("/mcp", app=handle_streamable_http),
+            Mount(config.MCP_SERVER_PATH, app=handle_streamable_http),
             Mount("/messages/", app=sse.handle_post_message),
+            Route("/{endpoint}/sse", endpoint=handle_sse),
+            Mount("/{endpoint}" + config.MCP_SERVER_PATH, app=handle_streamable_http),
         ],
         lifespan=lifespan,
     )
 
 
+def create_http_server(host: str = None, port: int = None, debug: bool = False) -> "uvicorn.Server":
+    """
+    建立 HTTP/SSE 模式的 uvicorn Server（可在背景執行緒呼叫 run()，設定 should_exit 停止）
+    
+    Args:
+        host: 主機位址（預設 config.MCP_SERVER_HOST）
+        port: 埠號（預設 config.MCP_SERVER_PORT）
+        debug: 除錯模式
+    
+    Returns:
+        uvicorn Server 實例
+    """
+    import uvicorn
+    
+    starlette_app = create_starlette_app(mcp._mcp_server, debug=debug)
+    return uvicorn.Server(uvicorn.Config(
+        starlette_app,
+        host=host or config.MCP_SERVER_HOST,
+        port=port or config.MCP_SERVER_PORT,
+        log_level="warning",
+    ))
+
+
+def _parse_endpoint(value: str):
+    """解析 --endpoint 參數（名稱=資料1,資料2）"""
+    name, sep, names = value.partition("=")
+    data_names = [item.strip() for item in names.split(",") if item.strip()]
+    if not sep or not data_names:
+        raise argparse.ArgumentTypeError(f"格式應為 名稱=資料1,資料2: {value}")
+    if not _ENDPOINT_NAME_RE.fullmatch(name) or name in _RESERVED_ENDPOINT_NAMES:
+        raise argparse.ArgumentTypeError(f"無效的端點名稱: {name}")
+    return name, data_names
+
+
 def main():
     """主程式入口"""
     parser = argparse.ArgumentParser(
@@ -203,8 +709,8 @@ def main():
     
     parser.add_argument(
         "data_names",
-        nargs="+",
-        help="要提供檢索服務的資料名稱（至少一個）"
+        nargs="*",
+        help="預設端點提供檢索服務的資料名稱（stdio 模式至少一個；--snapshot 時可省略）"
     )
     
     parser.add_argument(
@@ -213,44 +719,67 @@ def main():
         help="使用 HTTP/SSE 模式（預設: stdio 模式）"
     )
     
+    parser.add_argument(
+        "--endpoint",
+        action="append",
+        type=_parse_endpoint,
+        default=[],
+        metavar="名稱=資料1,資料2",
+        help="HTTP 模式的具名端點（可重複），位於 /<名稱>/mcp 與 /<名稱>/sse"
+    )
+    
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="從最新的唯讀快照服務（未指定資料名稱時服務快照中的所有資料名稱）"
+    )
+    
     parser.add_argument(
         "--host",
-        default="127.0.0.1",
-        help="HTTP 模式的主機位址（預設: 127.0.0.1）"
+        default=config.MCP_SERVER_HOST,
+        help=f"HTTP 模式的主機位址（預設: {config.MCP_SERVER_HOST}）"
     )
     
     parser.add_argument(
         "--port",
         type=int,
-        default=3001,
-        help="HTTP 模式的埠號（預設: 3001）"
+        default=config.MCP_SERVER_PORT,
+        help=f"HTTP 模式的埠號（預設: {config.MCP_SERVER_PORT}）"
     )
     
     args = parser.parse_args()
     
+    if args.endpoint and not args.http:
+        parser.error("--endpoint 只能用於 HTTP 模式")
+    if args.snapshot:
+        config.MCP_SERVE_SNAPSHOTS = True
+    if not args.data_names and not args.endpoint and not config.MCP_SERVE_SNAPSHOTS:
+        parser.error("請指定至少一個資料名稱或端點")
+    
     # 初始化 server 資料
     initialize_server(args.data_names)
-    
-    # 取得 MCP server 實例
-    mcp_server = mcp._mcp_server
+    sources = ', '.join(args.data_names) or "快照中的所有資料名稱"
+    if config.MCP_SERVE_SNAPSHOTS:
+        print(f"從唯讀快照服務: {config.SNAPSHOT_DIR}", file=sys.stderr)
+    for name, data_names in args.endpoint:
+        register_endpoint(name, data_names)
     
     if args.http:
         # HTTP/SSE 模式
+        base_url = f"http://{args.host}:{args.port}"
         print(f"啟動 Local RAG MCP Server (HTTP/SSE 模式)", file=sys.stderr)
-        print(f"URL: http://{args.host}:{args.port}/mcp", file=sys.stderr)
-        print(f"SSE: http://{args.host}:{args.port}/sse", file=sys.stderr)
-        print(f"資料來源: {', '.join(args.data_names)}", file=sys.stderr)
+        if args.data_names or config.MCP_SERVE_SNAPSHOTS:
+            print(f"URL: {base_url}{config.MCP_SERVER_PATH}", file=sys.stderr)
+            print(f"SSE: {base_url}/sse", file=sys.stderr)
+            print(f"資料來源: {sources}", file=sys.stderr)
+        for name, data_names in args.endpoint:
+            print(f"端點 {name}: {base_url}/{name}{config.MCP_SERVER_PATH} ({', '.join(data_names)})", file=sys.stderr)
         
-        starlette_app = create_starlette_app(mcp_server, debug=True)
-        uvicorn.run(
-            starlette_app,
-            host=args.host,
-            port=args.port,
-        )
+        create_http_server(args.host, args.port, debug=True).run()
     else:
         # stdio 模式（預設）
         print(f"啟動 Local RAG MCP Server (stdio 模式)", file=sys.stderr)
-        print(f"資料來源: {', '.join(args.data_names)}", file=sys.stderr)
+        print(f"資料來源: {sources}", file=sys.stderr)
         print("等待 MCP 客戶端連接...", file=sys.stderr)
         
         mcp.run()
@@ -0,0 +1,88 @@
+"""
+Collection 遷移工具 - 將既有 collection 套用 config.py 中的儲存與索引設定，
+或在切換向量儲存（config.VECTOR_STORE）後從原本的儲存複製資料
+
+使用方式:
+    python migrate_collection.py
+    python migrate_collection.py --batch-size 1000
+    python migrate_collection.py --from qdrant
+"""
+import argparse
+import sys
+
+import config
+from vector_db import VectorDatabase
+from vector_stores import VECTOR_STORES, create_vector_store
+
+
+def main():
+    """主程式入口"""
+    parser = argparse.ArgumentParser(description="Local RAG collection 遷移")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=config.MIGRATION_BATCH_SIZE,
+        help=f"每批複製的點數（預設 {config.MIGRATION_BATCH_SIZE}）"
+    )
+    parser.add_argument(
+        "--from",
+        dest="source",
+        choices=sorted(VECTOR_STORES),
+        help=f"從此向量儲存複製所有點到目前設定的儲存（{config.VECTOR_STORE}）"
+    )
+    args = parser.parse_args()
+
+    if args.source:
+        copy_store(args.source, args.batch_size)
+        return
+
+    print(f"Collection: {config.COLLECTION_NAME}")
+    print(f"量化: {config.VECTOR_QUANTIZATION or '無'}，向量存放於磁碟: {config.VECTORS_ON_DISK}，"
+          f"payload 存放於磁碟: {config.PAYLOAD_ON_DISK}")
+    print(f"HNSW: m={config.HNSW_M}, ef_construct={config.HNSW_EF_CONSTRUCT}，"
+          f"詞彙索引: {config.LEXICAL_INDEX_ENABLED}")
+
+    vector_db = VectorDatabase()
+    try:
+        result = vector_db.migrate_collection(
+            batch_size=args.batch_size,
+            progress_callback=lambda copied: print(f"\r已複製 {copied} 個點", end="", flush=True)
+        )
+    except Exception as e:
+        print(f"\n✗ 遷移失敗: {e}（重新執行會從中斷的階段繼續）")
+        sys.exit(1)
+
+    messages = {
+        'updated': "✓ 已更新 collection 設定",
+        'rebuilt': "✓ 已以新設定重建 collection",
+        'unchanged': "✓ collection 無需遷移",
+    }
+    print(f"\n{messages[result]}")
+
+
+def copy_store(source_name: str, batch_size: int):
+    """將來源向量儲存的所有點複製到 config.VECTOR_STORE"""
+    if source_name == config.VECTOR_STORE:
+        print(f"✗ 來源與目前設定的向量儲存相同: {source_name}")
+        sys.exit(1)
+
+    print(f"複製向量儲存: {source_name} → {config.VECTOR_STORE}")
+    source = create_vector_store(source_name, read_only=True)
+    vector_db = VectorDatabase()
+    try:
+        copied = vector_db.copy_from(
+            source,
+            batch_size=batch_size,
+            progress_callback=lambda copied: print(f"\r已複製 {copied} 個點", end="", flush=True)
+        )
+    except Exception as e:
+        print(f"\n✗ 複製失敗: {e}（點 ID 固定，重新執行會覆寫已複製的點）")
+        sys.exit(1)
+    finally:
+        vector_db.close()
+        source.close()
+    print(f"\n✓ 已複製 {copied} 個點")
+
+
+if __name__ == "__main__":
+    main()
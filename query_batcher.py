@@ -0,0 +1,84 @@
+"""
+查詢合併模組 - 將短時間內同時到達的請求合併為一次批次處理
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+
+class RequestCoalescer:
+    """
+    請求合併器
+
+    第一個請求到達後等待 window_ms（或累積到 max_batch_size 個請求），
+    將期間到達的請求以一次 batch_func(items) 處理，再把結果分送給各呼叫端。
+    低負載時每批只有一個請求，只多出 window_ms 的等待；
+    高負載時一次模型前向運算與一次資料庫批次搜尋可服務整批請求。
+    """
+
+    def __init__(self, batch_func: Callable[[List[Any]], Awaitable[List[Any]]],
+                 window_ms: float, max_batch_size: int):
+        """
+        Args:
+            batch_func: 批次處理函式，回傳與輸入順序相同的結果列表
+                （個別結果可為 Exception，只會傳給對應的呼叫端）
+            window_ms: 合併等待時間（毫秒，0 表示只合併同一輪事件迴圈內到達的請求）
+            max_batch_size: 每批最多請求數
+        """
+        self.batch_func = batch_func
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, max_batch_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Handle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """
+        加入一個請求並等待其結果
+
+        Args:
+            item: 請求內容（傳給 batch_func 的項目）
+
+        Returns:
+            該請求的結果
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 事件迴圈更換（例如測試中多次 asyncio.run）時捨棄舊狀態
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        """送出目前累積的請求"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """執行批次處理並分送結果"""
+        try:
+            results = await self.batch_func([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():  # 呼叫端已取消
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
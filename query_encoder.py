@@ -0,0 +1,75 @@
+"""
+查詢編碼模組 - 只載入嵌入模型的輕量查詢向量化（供 MCP Server 使用）
+"""
+from typing import List
+
+import numpy as np
+
+import config
+from embedding_backends import EmbeddingBackend, create_embedding_backend, normalize_embeddings
+from embedding_cache import normalize_text
+from query_cache import LRUCache
+
+
+class QueryEncoder:
+    """
+    查詢編碼器
+
+    只持有嵌入模型後端與查詢向量的 LRU 快取，不載入 MarkItDown、分塊器
+    或持久化嵌入快取，讓每個 Server 程序的常駐記憶體只包含模型本身。
+    """
+
+    def __init__(self, embedding_backend: EmbeddingBackend = None, cache_size: int = None):
+        """
+        Args:
+            embedding_backend: 嵌入模型後端（預設依 config.EMBEDDING_BACKEND 建立，
+                可傳入 DocumentProcessor.embedding_backend 共用同一個模型）
+            cache_size: 查詢向量快取數量（預設 config.QUERY_EMBEDDING_CACHE_SIZE）
+        """
+        self.embedding_backend = embedding_backend or create_embedding_backend()
+        self.cache = LRUCache(
+            config.QUERY_EMBEDDING_CACHE_SIZE if cache_size is None else cache_size
+        )
+
+    def encode(self, query: str) -> np.ndarray:
+        """
+        將查詢文字轉換為嵌入向量（空白差異不影響快取命中）
+        
+        Args:
+            query: 查詢文字
+        
+        Returns:
+            float32 嵌入向量
+        """
+        return self.encode_many([query])[0]
+    
+    def encode_many(self, queries: List[str]) -> np.ndarray:
+        """
+        批次轉換查詢文字，只將快取未命中的查詢送入模型
+        
+        Args:
+            queries: 查詢文字列表
+        
+        Returns:
+            形狀為 (查詢數, 向量維度) 的 float32 陣列
+        """
+        normalized = [normalize_text(query) for query in queries]
+        vectors = [self.cache.get(query) for query in normalized]
+        missing = list(dict.fromkeys(
+            query for query, vector in zip(normalized, vectors) if vector is None
+        ))
+        if missing:
+            computed = normalize_embeddings(self.embedding_backend.encode(missing))
+            computed_rows = {query: row for row, query in enumerate(missing)}
+            for query, row in computed_rows.items():
+                # 複製單列，避免快取中的向量持有整個批次陣列
+                self.cache.put(query, computed[row].copy())
+            vectors = [
+                vector if vector is not None else computed[computed_rows[query]]
+                for query, vector in zip(normalized, vectors)
+            ]
+        return np.stack(vectors) if vectors else np.zeros((0, config.VECTOR_SIZE), dtype=np.float32)
+    
+    def clear_cache(self):
+        """清空查詢向量快取"""
+        self.cache.clear()
@@ -0,0 +1,106 @@
+"""
+重新排序模組 - 以本地 Cross-Encoder 對向量檢索的候選結果重新排序
+"""
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import config
+
+
+class Reranker:
+    """
+    Cross-Encoder 重新排序器
+
+    對每個 (查詢, 分塊) 組合直接計算相關度，比向量相似度精確但較慢，
+    因此只用於向量檢索取回的少量候選。所有查詢的組合合併後分批在 CPU 上推論，
+    超過延遲預算時尚未完成的查詢保留原本的向量排序。
+    """
+
+    def __init__(self, model_name: str = None, batch_size: int = None, budget_ms: float = None):
+        """
+        Args:
+            model_name: Cross-Encoder 模型名稱（預設 config.RERANK_MODEL）
+            batch_size: 每次推論的組合數量（預設 config.RERANK_BATCH_SIZE）
+            budget_ms: 重新排序的延遲預算（毫秒，預設 config.RERANK_BUDGET_MS，0 表示不限制）
+        """
+        from sentence_transformers import CrossEncoder
+        self.model_name = model_name or config.RERANK_MODEL
+        self.model = CrossEncoder(self.model_name, max_length=config.RERANK_MAX_LENGTH, device="cpu")
+        self.batch_size = batch_size or config.RERANK_BATCH_SIZE
+        self.budget_ms = config.RERANK_BUDGET_MS if budget_ms is None else budget_ms
+
+    def rerank(self, query: str, candidates: List[Dict], limit: int) -> List[Dict]:
+        """
+        重新排序單一查詢的候選結果
+
+        Args:
+            query: 查詢文字
+            candidates: 向量檢索的候選結果（依相關度排序）
+            limit: 返回結果數量
+
+        Returns:
+            重新排序後的前 limit 個結果
+        """
+        return self.rerank_many([query], [candidates], limit)[0][0]
+
+    def rerank_many(self, queries: List[str], candidate_lists: List[List[Dict]],
+                    limit: int) -> Tuple[List[List[Dict]], int]:
+        """
+        批次重新排序多個查詢的候選結果
+
+        依查詢順序推論，每批推論後檢查延遲預算；超過預算時停止推論，
+        已完成的查詢使用 Cross-Encoder 排序，其餘查詢保留原本的向量排序。
+
+        Args:
+            queries: 查詢文字列表
+            candidate_lists: 與查詢對應的候選結果列表
+            limit: 每個查詢返回的結果數量
+
+        Returns:
+            (重新排序後的結果列表, 完成重新排序的查詢數量)
+        """
+        pairs = [
+            (query, candidate['text'])
+            for query, candidates in zip(queries, candidate_lists)
+            for candidate in candidates
+        ]
+        # 每個查詢最後一個組合的位置（推論到此處即可排序該查詢）
+        ends = []
+        for candidates in candidate_lists:
+            ends.append((ends[-1] if ends else 0) + len(candidates))
+
+        start = time.perf_counter()
+        scores: List[float] = []
+        while len(scores) < len(pairs):
+            if self.budget_ms and (time.perf_counter() - start) * 1000 > self.budget_ms:
+                break
+            batch = pairs[len(scores):len(scores) + self.batch_size]
+            scores.extend(float(score) for score in self.model.predict(
+                batch,
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            ))
+
+        results = []
+        completed = 0
+        for candidates, end in zip(candidate_lists, ends):
+            if end > len(scores):
+                results.append(candidates[:limit])
+                continue
+            completed += 1
+            reranked = []
+            for candidate, score in zip(candidates, scores[end - len(candidates):end]):
+                result = dict(candidate)
+                result['retrieval_score'] = candidate['score']
+                result['score'] = score
+                reranked.append(result)
+            reranked.sort(key=lambda result: result['score'], reverse=True)
+            results.append(reranked[:limit])
+
+        if completed < len(queries):
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"重新排序超過延遲預算 ({elapsed_ms:.0f} ms > {self.budget_ms} ms)，"
+                  f"{len(queries) - completed} 個查詢使用向量排序", file=sys.stderr)
+        return results, completed
@@ -0,0 +1,247 @@
+"""
+快照模組 - 將選定的資料名稱發佈為不可變的版本化快照，MCP Server 從最新版本唯讀服務
+
+snapshots/
+├── CURRENT            # 目前版本名稱（以 os.replace 原子替換）
+└── v000003/           # 發佈後不再修改
+    ├── manifest.json  # 版本、發佈時間、資料名稱與點數
+    ├── vectors/       # NumPy 記憶體映射向量儲存
+    └── catalog.db     # 資料目錄
+
+快照一律使用 NumPy 儲存：檔案發佈後不再變動，多個 MCP Server 程序可同時映射同一個版本
+並共用作業系統的頁面快取，不需要任何鎖，也不會受匯入影響。
+"""
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+
+_CURRENT_FILE = "CURRENT"
+_MANIFEST_FILE = "manifest.json"
+_TEMP_PREFIX = ".publishing-"
+
+
+def _version_name(version: int) -> str:
+    return f"v{version:06d}"
+
+
+def _snapshot_path(version: int, root: str = None) -> str:
+    return os.path.join(root or config.SNAPSHOT_DIR, _version_name(version))
+
+
+def list_versions(root: str = None) -> List[int]:
+    """
+    列出已發佈的快照版本
+
+    Returns:
+        版本號列表（由舊到新）
+    """
+    root = root or config.SNAPSHOT_DIR
+    if not os.path.isdir(root):
+        return []
+    versions = []
+    for name in os.listdir(root):
+        if name.startswith("v") and name[1:].isdigit():
+            versions.append(int(name[1:]))
+    return sorted(versions)
+
+
+def current_version(root: str = None) -> Optional[int]:
+    """目前的快照版本（尚未發佈時為 None）"""
+    try:
+        with open(os.path.join(root or config.SNAPSHOT_DIR, _CURRENT_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return int(name[1:]) if name.startswith("v") and name[1:].isdigit() else None
+
+
+def read_manifest(version: int, root: str = None) -> Dict:
+    """讀取快照的 manifest（版本、發佈時間、資料名稱與點數）"""
+    with open(os.path.join(_snapshot_path(version, root), _MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _set_current(version: int, root: str):
+    """原子更新 CURRENT 指標（不會退回較舊的版本）"""
+    current = current_version(root)
+    if current is not None and current > version:
+        return
+    temp_path = os.path.join(root, f"{_CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(_version_name(version))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, os.path.join(root, _CURRENT_FILE))
+
+
+def publish_snapshot(data_names: List[str], vector_db=None, root: str = None,
+                     batch_size: int = None,
+                     progress_callback: Optional[Callable[[int], None]] = None) -> Dict:
+    """
+    將資料名稱的所有點複製為新的快照版本，並將 CURRENT 指向新版本
+
+    快照在暫存目錄中建立，完成後才以目錄改名取得版本號，
+    服務中的 MCP Server 只會看到完整的版本。
+
+    Args:
+        data_names: 要發佈的資料名稱
+        vector_db: 來源向量資料庫（可選，預設開啟 config 設定的資料庫）
+        root: 快照目錄（預設 config.SNAPSHOT_DIR）
+        batch_size: 每批複製的點數（預設 config.MIGRATION_BATCH_SIZE）
+        progress_callback: 進度回調函數，參數為已複製的點數
+
+    Returns:
+        新版本的 manifest
+    """
+    from vector_db import VectorDatabase
+    from vector_stores import NumpyStore
+
+    if not data_names:
+        raise ValueError("請指定至少一個要發佈的資料名稱")
+    root = root or config.SNAPSHOT_DIR
+    os.makedirs(root, exist_ok=True)
+    if vector_db is None:
+        vector_db = VectorDatabase()
+
+    # 清除先前中斷的發佈
+    for name in os.listdir(root):
+        if name.startswith(_TEMP_PREFIX):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    temp_path = os.path.join(root, f"{_TEMP_PREFIX}{uuid.uuid4().hex}")
+    os.makedirs(temp_path)
+    try:
+        snapshot_db = VectorDatabase(
+            store=NumpyStore(path=os.path.join(temp_path, "vectors")),
+            catalog_path=os.path.join(temp_path, "catalog.db")
+        )
+        try:
+            points = snapshot_db.copy_from(vector_db.store, batch_size=batch_size,
+                                           progress_callback=progress_callback,
+                                           data_names=list(data_names))
+            stats = snapshot_db.get_data_name_stats()
+        finally:
+            snapshot_db.close()
+        # 唯讀程序不需要寫入鎖
+        os.remove(os.path.join(temp_path, "vectors", "writer.lock"))
+
+        # 以目錄改名取得版本號（同時發佈時改用下一個版本號）
+        version = (list_versions(root) or [0])[-1] + 1
+        while True:
+            try:
+                os.rename(temp_path, _snapshot_path(version, root))
+                break
+            except OSError:
+                if not os.path.exists(_snapshot_path(version, root)):
+                    raise
+                version += 1
+    except BaseException:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+
+    manifest = {
+        'version': version,
+        'name': _version_name(version),
+        'published_at': datetime.now().isoformat(timespec="seconds"),
+        'data_names': sorted(data_names),
+        'points': points,
+        'data_name_stats': stats,
+    }
+    with open(os.path.join(_snapshot_path(version, root), _MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    _set_current(version, root)
+    prune_snapshots(root)
+    print(f"發佈快照 {manifest['name']}: {', '.join(manifest['data_names'])} ({points} 個點)",
+          file=sys.stderr)
+    return manifest
+
+
+def prune_snapshots(root: str = None, keep: int = None):
+    """
+    刪除舊的快照版本（保留最新的 keep 個與 CURRENT 指向的版本）
+
+    Args:
+        root: 快照目錄（預設 config.SNAPSHOT_DIR）
+        keep: 保留的版本數（預設 config.SNAPSHOT_KEEP）
+    """
+    root = root or config.SNAPSHOT_DIR
+    keep = max(1, keep or config.SNAPSHOT_KEEP)
+    current = current_version(root)
+    for version in list_versions(root)[:-keep]:
+        if version != current:
+            # 仍映射舊版本的程序不受影響（Windows 上無法刪除時留待下次）
+            shutil.rmtree(_snapshot_path(version, root), ignore_errors=True)
+
+
+class SnapshotReader:
+    """
+    追蹤 CURRENT 指標並以唯讀模式開啟目前的快照版本
+
+    每 poll_seconds 秒檢查一次是否有新版本；有新版本時開啟新的資料庫並替換參照，
+    進行中的搜尋繼續使用舊版本完成，不會被中斷或阻塞。
+    """
+
+    def __init__(self, root: str = None, poll_seconds: float = None):
+        """
+        Args:
+            root: 快照目錄（預設 config.SNAPSHOT_DIR）
+            poll_seconds: 檢查新版本的間隔秒數（預設 config.SNAPSHOT_POLL_SECONDS）
+        """
+        self.root = root or config.SNAPSHOT_DIR
+        self.poll_seconds = config.SNAPSHOT_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self._lock = threading.Lock()
+        self._current: Optional[Tuple[Dict, object]] = None
+        self._checked = 0.0
+
+    def _open(self, version: int) -> Tuple[Dict, object]:
+        """以唯讀模式開啟快照版本"""
+        from vector_db import VectorDatabase
+        from vector_stores import NumpyStore
+
+        path = _snapshot_path(version, self.root)
+        manifest = read_manifest(version, self.root)
+        vector_db = VectorDatabase(
+            store=NumpyStore(read_only=True, path=os.path.join(path, "vectors")),
+            read_only=True,
+            catalog_path=os.path.join(path, "catalog.db")
+        )
+        return manifest, vector_db
+
+    def current(self) -> Tuple[Dict, object]:
+        """
+        取得目前的快照（必要時切換到新版本）
+
+        Returns:
+            (manifest, 唯讀的 VectorDatabase)
+
+        Raises:
+            RuntimeError: 尚未發佈任何快照
+        """
+        current = self._current
+        if current is not None and time.monotonic() - self._checked < self.poll_seconds:
+            return current
+
+        with self._lock:
+            if self._current is None or time.monotonic() - self._checked >= self.poll_seconds:
+                self._checked = time.monotonic()
+                version = current_version(self.root)
+                if version is not None and (self._current is None or self._current[0]['version'] != version):
+                    try:
+                        self._current = self._open(version)
+                        print(f"切換到快照 {self._current[0]['name']}", file=sys.stderr)
+                    except Exception as e:
+                        if self._current is None:
+                            raise
+                        # 新版本無法開啟時繼續服務目前的版本
+                        print(f"無法開啟快照 {_version_name(version)}: {e}", file=sys.stderr)
+            if self._current is None:
+                raise RuntimeError("尚未發佈快照，請先在 GUI 或以 ingestion.py --publish 發佈")
+            return self._current
@@ -5,6 +5,55 @@ import os
 import sys
 
 
+# MCP Server 程序（查詢編碼器 + 模型）的常駐記憶體上限
+SERVER_MEMORY_BUDGET_MB = 600
+
+# 在獨立程序中載入查詢編碼器並回報常駐記憶體，避免受其他測試載入的模組影響
+_MEMORY_PROBE = """
+import json, sys
+import mcp_server
+encoder = mcp_server._get_query_encoder()
+encoder.encode("記憶體測試查詢")
+try:
+    import psutil
+    rss_mb = psutil.Process().memory_info().rss / 1024 / 1024
+except ImportError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+print(json.dumps({"rss_mb": rss_mb, "markitdown": "markitdown" in sys.modules}))
+"""
+
+
+class _TextProcessor:
+    """匯入測試用的處理器：直接讀取文字檔、每行一個分塊（不載入嵌入模型）"""
+    
+    def __init__(self, fail_after: int = None):
+        """
+        Args:
+            fail_after: 第幾次之後的 embed_text 拋出例外（模擬中斷的匯入）
+        """
+        # 每次呼叫 embed_text 的分塊數量
+        self.embed_sizes = []
+        self.fail_after = fail_after
+    
+    def convert_to_markdown(self, file_path):
+        with open(file_path, encoding="utf-8") as f:
+            return f.read()
+    
+    def iter_chunks(self, text):
+        return iter(text.splitlines())
+    
+    def embed_text(self, texts):
+        import numpy as np
+        import config
+        if self.fail_after is not None and len(self.embed_sizes) >= self.fail_after:
+            raise RuntimeError("模擬匯入中斷")
+        self.embed_sizes.append(len(texts))
+        return np.random.default_rng(len(texts)).standard_normal(
+            (len(texts), config.VECTOR_SIZE)).astype(np.float32)
+
+
 def test_imports():
     """測試所有模組是否可以正常導入"""
     print("測試模組導入...")
@@ -58,6 +107,219 @@ def test_document_processor():
         return False
 
 
+def test_chunking():
+    """測試 Markdown 與 Token 分塊的長度上限、結構邊界、重疊參數驗證與進度保證"""
+    print("\n測試分塊策略...")
+    
+    try:
+        import time
+        from chunking import CharacterChunker, MarkdownChunker, TokenChunker
+        
+        class WordTokenizer:
+            """以空白分詞的 tokenizer（每個詞一個 Token）"""
+            
+            def __call__(self, texts, add_special_tokens=False):
+                return {'input_ids': [text.split() for text in texts]}
+        
+        sentence = "這是一個很長的句子，用來測試分塊。"
+        text = "\n\n".join([
+            "# 第一章",
+            sentence * 12,
+            "| 欄位 A | 欄位 B |\n|---|---|\n" + "\n".join(f"| 值 {i} | 說明 {i} |" for i in range(12)),
+            "## 第二節",
+            "```python\n" + "\n".join(f"print({i})" for i in range(20)) + "\n```",
+            "word " * 80,
+        ])
+        
+        chunks = MarkdownChunker(100, 20).chunk(text)
+        if max(len(chunk) for chunk in chunks) > 100:
+            print(f"✗ Markdown 分塊超過上限: {max(len(chunk) for chunk in chunks)}")
+            return False
+        for heading in ("# 第一章", "## 第二節"):
+            if not any(chunk.startswith(heading) for chunk in chunks):
+                print(f"✗ 標題沒有開始新的分塊: {heading}")
+                return False
+        table_lines = [line for chunk in chunks for line in chunk.splitlines() if line.startswith("|")]
+        if any(not line.endswith("|") for line in table_lines):
+            print("✗ 表格在列中間被切開")
+            return False
+        if any(not any(f"| 值 {i} |" in chunk for chunk in chunks) for i in range(12)):
+            print("✗ 表格列遺失")
+            return False
+        print(f"✓ Markdown 分塊: {len(chunks)} 個分塊，標題開始新分塊，表格只在列之間切割")
+        
+        chunks = TokenChunker(16, 4, WordTokenizer()).chunk(" ".join(f"w{i}" for i in range(100)))
+        token_lists = [chunk.split() for chunk in chunks]
+        if max(len(tokens) for tokens in token_lists) > 16 or token_lists[-1][-1] != "w99":
+            print(f"✗ Token 分塊超過上限或遺失結尾: {chunks}")
+            return False
+        overlaps = [len(set(a) & set(b)) for a, b in zip(token_lists, token_lists[1:])]
+        if max(overlaps) > 4 or min(overlaps) == 0:
+            print(f"✗ Token 分塊的重疊錯誤: {overlaps}")
+            return False
+        print(f"✓ Token 分塊: 每塊最多 16 個 Token，相鄰分塊重疊 {min(overlaps)}–{max(overlaps)} 個")
+        
+        for chunk_size, overlap in ((100, 100), (100, 150), (100, -1), (0, 0)):
+            try:
+                MarkdownChunker(chunk_size, overlap)
+                print(f"✗ 沒有拒絕 chunk_size={chunk_size}, overlap={overlap}")
+                return False
+            except ValueError:
+                pass
+        print("✓ 拒絕不小於 chunk_size 或為負數的 overlap")
+        
+        # 沒有任何邊界的長字串、重疊接近上限：每次仍至少前進一個單位
+        long_word = "x" * 5000
+        for chunker in (MarkdownChunker(10, 9), CharacterChunker(10, 9),
+                        TokenChunker(3, 2, WordTokenizer())):
+            start = time.perf_counter()
+            sample = long_word if not isinstance(chunker, TokenChunker) else "a " * 2000
+            chunks = chunker.chunk(sample)
+            if time.perf_counter() - start > 10 or len(chunks) > len(sample) \
+                    or not sample.rstrip().endswith(chunks[-1]):
+                print(f"✗ {type(chunker).__name__} 沒有持續前進")
+                return False
+        print("✓ 無邊界的長文字與大重疊時每次都有進度")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 分塊策略測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_embedding_cache():
+    """測試持久化嵌入快取的命中、LRU 淘汰與重新開啟後沿用"""
+    print("\n測試嵌入快取...")
+    
+    try:
+        import tempfile
+        import numpy as np
+        from embedding_cache import EmbeddingCache
+        
+        vectors = np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = EmbeddingCache(cache_dir=temp_dir, dimension=8, max_entries=2, model_name="m")
+            cache.put_many(["甲", "乙"], vectors[:2])
+            hits = cache.get_many(["甲", " 乙 ", "丙"])
+            if not np.array_equal(hits[0], vectors[0]) or not np.array_equal(hits[1], vectors[1]) \
+                    or hits[2] is not None:
+                print("✗ 快取查詢結果錯誤")
+                return False
+            print("✓ 命中快取（忽略空白差異），未命中為 None")
+            
+            # 「甲」最近使用過，寫入「丙」時淘汰最久未使用的「乙」
+            cache.get_many(["甲"])
+            cache.put_many(["丙"], vectors[2:])
+            cache.close()
+            
+            cache = EmbeddingCache(cache_dir=temp_dir, dimension=8, max_entries=2, model_name="m")
+            hits = cache.get_many(["甲", "乙", "丙"])
+            if hits[1] is not None or not np.array_equal(hits[0], vectors[0]) \
+                    or not np.array_equal(hits[2], vectors[2]) or len(cache) != 2:
+                print("✗ LRU 淘汰或重新開啟後的快取錯誤")
+                return False
+            print("✓ 淘汰最久未使用的向量，重新開啟後沿用")
+            cache.close()
+            
+            other = EmbeddingCache(cache_dir=temp_dir, dimension=8, max_entries=2, model_name="other")
+            if other.get_many(["甲"]) != [None]:
+                print("✗ 不同模型共用了快取向量")
+                return False
+            print("✓ 不同模型的向量不會互相命中")
+            other.close()
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 嵌入快取測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_embedding_backend_parity():
+    """測試 ONNX 後端與 PyTorch 後端的向量一致性"""
+    print("\n測試嵌入後端一致性...")
+    
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("○ 未安裝 onnxruntime，略過")
+        return True
+    
+    try:
+        import numpy as np
+        from embedding_backends import OnnxBackend, SentenceTransformerBackend
+        
+        texts = [
+            "這是一個測試文字。",
+            "Local RAG stores document vectors in Qdrant.",
+            "錯誤代碼 E-1042 表示連線逾時",
+            "short",
+        ]
+        reference = SentenceTransformerBackend().encode(texts)
+        reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+        
+        for quantize, threshold in ((False, 0.999), (True, 0.95)):
+            vectors = OnnxBackend(quantize=quantize).encode(texts)
+            cosine = float(np.min(np.sum(vectors * reference, axis=1)))
+            label = "int8" if quantize else "float32"
+            if cosine < threshold:
+                print(f"✗ ONNX ({label}) 最小餘弦相似度 {cosine:.4f} < {threshold}")
+                return False
+            print(f"✓ ONNX ({label}) 最小餘弦相似度 {cosine:.4f}")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 嵌入後端一致性測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_query_encoder_memory():
+    """測試 MCP Server 的查詢編碼器不載入 MarkItDown，且常駐記憶體在預算內"""
+    print("\n測試查詢編碼器記憶體用量...")
+    
+    try:
+        import json
+        import subprocess
+        
+        output = subprocess.run(
+            [sys.executable, "-c", _MEMORY_PROBE],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        
+        if probe["markitdown"]:
+            print("✗ 查詢編碼器載入了 MarkItDown")
+            return False
+        print("✓ 未載入 MarkItDown")
+        
+        if probe["rss_mb"] > SERVER_MEMORY_BUDGET_MB:
+            print(f"✗ 常駐記憶體 {probe['rss_mb']:.0f} MB 超過預算 {SERVER_MEMORY_BUDGET_MB} MB")
+            return False
+        print(f"✓ 常駐記憶體 {probe['rss_mb']:.0f} MB（預算 {SERVER_MEMORY_BUDGET_MB} MB）")
+        
+        return True
+        
+    except subprocess.CalledProcessError as e:
+        print(f"✗ 查詢編碼器記憶體測試失敗: {e.stderr}")
+        return False
+    except Exception as e:
+        print(f"✗ 查詢編碼器記憶體測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def test_vector_db():
     """測試向量資料庫連接"""
     print("\n測試向量資料庫...")
@@ -85,6 +347,794 @@ def test_vector_db():
         return False
 
 
+def test_lexical():
+    """測試詞彙索引的斷詞與 RRF 合併"""
+    print("\n測試詞彙索引...")
+    
+    try:
+        import lexical
+        
+        tokens = lexical.tokenize("錯誤代碼 E-1042 表示磁碟空間不足")
+        for expected in ("e-1042", "1042", "錯誤", "磁碟"):
+            if expected not in tokens:
+                print(f"✗ 斷詞結果缺少 {expected}: {tokens}")
+                return False
+        print(f"✓ 斷詞: {tokens}")
+        
+        dense = [{'data_name': 'kb', 'file_name': 'a.txt', 'chunk_index': i, 'score': 1.0} for i in (0, 1)]
+        sparse = [{'data_name': 'kb', 'file_name': 'a.txt', 'chunk_index': i, 'score': 1.0} for i in (1, 2)]
+        fused = lexical.reciprocal_rank_fusion([dense, sparse], limit=3)
+        if [result['chunk_index'] for result in fused][0] != 1 or len(fused) != 3:
+            print(f"✗ RRF 合併結果錯誤: {fused}")
+            return False
+        print("✓ RRF 合併")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 詞彙索引測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_search_cache():
+    """測試 MCP Server 的查詢向量快取、搜尋結果快取與資料變動後的失效"""
+    print("\n測試搜尋快取...")
+    
+    try:
+        import tempfile
+        import numpy as np
+        import config
+        import mcp_server
+        from query_encoder import QueryEncoder
+        from vector_db import VectorDatabase
+        from vector_stores import NumpyStore
+        
+        class CountingBackend:
+            """以字元雜湊產生向量並記錄送入模型的查詢（不載入嵌入模型）"""
+            
+            def __init__(self):
+                self.encoded = []
+            
+            def encode(self, texts, batch_size=None):
+                self.encoded.extend(texts)
+                vectors = np.full((len(texts), config.VECTOR_SIZE), 1e-3, dtype=np.float32)
+                for row, text in enumerate(texts):
+                    for char in text:
+                        vectors[row, ord(char) % config.VECTOR_SIZE] += 1
+                return vectors
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            vector_db = VectorDatabase(store=NumpyStore(path=os.path.join(temp_dir, "vectors")),
+                                       catalog_path=os.path.join(temp_dir, "catalog.db"))
+            backend = CountingBackend()
+            vector_db.insert_documents(["蘋果", "香蕉"], backend.encode(["蘋果", "香蕉"]), 'a.txt', 'kb')
+            backend.encoded.clear()
+            mcp_server.initialize_server([], vector_db=vector_db, warm_up=False,
+                                         query_encoder=QueryEncoder(backend))
+            hits = mcp_server._search_result_cache.hits
+            
+            first = mcp_server._search_many([("蘋果", 1, [])])[0]
+            second = mcp_server._search_many([("  蘋果 ", 1, [])])[0]
+            if first[0]['text'] != "蘋果" or second != first or backend.encoded != ["蘋果"] \
+                    or mcp_server._search_result_cache.hits != hits + 1:
+                print(f"✗ 重複查詢沒有使用結果快取: {backend.encoded}")
+                return False
+            print("✓ 重複查詢（忽略空白差異）直接使用結果快取")
+            
+            # 資料變動後結果快取失效，查詢向量仍由快取提供
+            vector_db.insert_documents(["蘋果派"], backend.encode(["蘋果"]), 'b.txt', 'kb')
+            backend.encoded.clear()
+            third = mcp_server._search_many([("蘋果", 2, [])])[0]
+            fourth = mcp_server._search_many([("蘋果", 1, ['kb'])])[0]
+            if backend.encoded or len(third) != 2 or "蘋果派" not in [hit['text'] for hit in third] \
+                    or fourth[0]['text'] != "蘋果":
+                print(f"✗ 資料變動後的搜尋結果錯誤: {third}")
+                return False
+            print("✓ 資料變動後結果快取失效，查詢向量沿用快取")
+            
+            # 預設端點未指定資料名稱時搜尋全部；具名端點只能搜尋註冊的資料名稱
+            token = mcp_server._current_endpoint.set("team")
+            try:
+                mcp_server.register_endpoint("team", [])
+                _, error = mcp_server._resolve_data_names(None)
+            finally:
+                mcp_server._current_endpoint.reset(token)
+                mcp_server.unregister_endpoint("team")
+            if mcp_server._resolve_data_names(None) != ([], None) or error is None:
+                print("✗ 端點資料名稱的預設值錯誤")
+                return False
+            print("✓ 預設端點未指定資料名稱時搜尋全部")
+            
+            mcp_server.initialize_server([], warm_up=False)
+            vector_db.close()
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 搜尋快取測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_reranker():
+    """測試 Cross-Encoder 重新排序與延遲預算"""
+    print("\n測試重新排序...")
+    
+    try:
+        from reranker import Reranker
+        
+        def candidate(text, score, index):
+            return {'text': text, 'score': score, 'file_name': 'a.txt', 'data_name': 'kb',
+                    'chunk_index': index}
+        
+        query = "What does error E-1042 mean?"
+        candidates = [
+            candidate("The weather is sunny today.", 0.9, 0),
+            candidate("Error E-1042 means the connection to the server timed out.", 0.5, 1),
+        ]
+        reranker = Reranker(budget_ms=0)
+        results = reranker.rerank(query, candidates, limit=2)
+        if results[0]['chunk_index'] != 1 or results[0]['retrieval_score'] != 0.5:
+            print(f"✗ 重新排序結果錯誤: {results}")
+            return False
+        print("✓ 相關的分塊排到最前面，並保留向量分數")
+        
+        # 超過延遲預算時尚未推論的查詢保留向量排序
+        reranker.batch_size = 1
+        reranker.budget_ms = 1e-6
+        results, completed = reranker.rerank_many([query, query], [candidates, candidates], limit=2)
+        if completed == 2 or results[1] != candidates:
+            print(f"✗ 超過延遲預算時沒有保留向量排序: {completed}")
+            return False
+        print(f"✓ 超過延遲預算時 {2 - completed} 個查詢保留向量排序")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 重新排序測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_numpy_store():
+    """測試 NumPy 向量儲存的搜尋、唯讀重新載入、更新與刪除"""
+    print("\n測試 NumPy 向量儲存...")
+    
+    try:
+        import tempfile
+        import numpy as np
+        import config
+        from vector_db import make_point_id
+        from vector_stores import NumpyStore
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = NumpyStore(path=temp_dir)
+            vectors = np.random.default_rng(0).standard_normal((50, config.VECTOR_SIZE)).astype(np.float32)
+            file_names = ['a.txt' if i < 30 else 'b.txt' for i in range(50)]
+            writer.upsert([
+                (make_point_id('kb', file_names[i], str(i)), vectors[i], {
+                    'text': f"分塊 {i}", 'file_name': file_names[i], 'data_name': 'kb',
+                    'chunk_index': i, 'chunk_hash': f"{i:064x}"
+                })
+                for i in range(50)
+            ])
+            writer.set_file_payload('kb', 'a.txt', {'file_hash': 'h'})
+            writer.set_file_payload('kb', 'b.txt', {'file_hash': 'h'})
+            writer.flush()
+            
+            reader = NumpyStore(read_only=True, path=temp_dir)
+            results = reader.search(vectors[7:8], None, ['kb'], 3)[0]
+            if results[0]['text'] != "分塊 7" or reader.search(vectors[7:8], None, ['other'], 3)[0]:
+                print(f"✗ 搜尋結果錯誤: {results}")
+                return False
+            print("✓ 精確搜尋與資料名稱過濾")
+            
+            # 刪除 40% 的點觸發壓縮：舊世代的檔案在新的欄位檔發佈後才刪除，
+            # 進行中的走訪繼續讀取開始時的點
+            batches = writer.iter_points(10)
+            points = next(batches)
+            writer.delete_where(['kb'], 'b.txt')
+            writer.flush()
+            points += [point for batch in batches for point in batch]
+            if [payload['text'] for _, _, payload in points] != [f"分塊 {i}" for i in range(50)] or \
+                    not np.allclose(points[42][1], vectors[42] / np.linalg.norm(vectors[42]), atol=1e-6):
+                print("✗ 走訪期間壓縮後讀取錯誤")
+                return False
+            if sorted(name for name in os.listdir(temp_dir) if name.endswith(".f32")) != ["vectors-1.f32"]:
+                print(f"✗ 壓縮後的檔案錯誤: {os.listdir(temp_dir)}")
+                return False
+            results = reader.search(vectors[7:8], None, ['kb'], 3)[0]
+            if reader.count() != 30 or reader.revision != 1 or results[0]['text'] != "分塊 7":
+                print(f"✗ 唯讀程序在壓縮後讀取錯誤: {results}")
+                return False
+            print("✓ 唯讀程序在壓縮後重新載入")
+            
+            # 更新既有的點時附加新列，唯讀程序正在使用的列在儲存前後都不會被覆寫
+            point_id = make_point_id('kb', 'a.txt', '7')
+            writer.upsert([(point_id, vectors[8], {
+                'text': "分塊 7（更新）", 'file_name': 'a.txt', 'data_name': 'kb',
+                'chunk_index': 7, 'chunk_hash': f"{7:064x}"
+            })])
+            results = reader.search(vectors[7:8], None, ['kb'], 1)[0]
+            if results[0]['text'] != "分塊 7" or abs(results[0]['score'] - 1.0) > 1e-5:
+                print(f"✗ 唯讀程序讀到寫入中的向量: {results}")
+                return False
+            writer.flush()
+            results = reader.search(vectors[8:9], None, ['kb'], 2)[0]
+            if reader.count() != 30 or reader.revision != 2 or \
+                    sorted(result['text'] for result in results) != ["分塊 7（更新）", "分塊 8"]:
+                print(f"✗ 儲存後讀取更新的點錯誤: {results}")
+                return False
+            print("✓ 更新既有的點不覆寫唯讀程序映射的列")
+            
+            writer.delete_where(['kb'], 'a.txt')
+            writer.flush()
+            if reader.count() != 0 or reader.revision != 3:
+                print("✗ 唯讀程序沒有重新載入")
+                return False
+            print("✓ 唯讀程序重新載入")
+            
+            reader.close()
+            writer.close()
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ NumPy 向量儲存測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_qdrant_client_retry():
+    """測試 Qdrant 客戶端的暫時性錯誤重試（以記憶體模式代替 Qdrant Server）"""
+    print("\n測試 Qdrant 客戶端重試...")
+    
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+        import httpx
+        import numpy as np
+        import config
+        from qdrant_client.http.exceptions import ResponseHandlingException
+        from vector_db import make_point_id
+        from vector_stores import QdrantStore, RetryingQdrantClient, create_qdrant_client
+        
+        original_mode = config.QDRANT_MODE
+        config.QDRANT_MODE = "memory"
+        try:
+            client = RetryingQdrantClient(create_qdrant_client(), retries=2, backoff=0)
+        finally:
+            config.QDRANT_MODE = original_mode
+        store = QdrantStore(client=client, collection_name="test_retry")
+        
+        # 前兩次寫入因連線錯誤失敗，第三次成功
+        failures = [2]
+        upsert = client.client.upsert
+        def flaky_upsert(*args, **kwargs):
+            if failures[0]:
+                failures[0] -= 1
+                raise ResponseHandlingException(httpx.ConnectError("connection refused"))
+            return upsert(*args, **kwargs)
+        client.client.upsert = flaky_upsert
+        
+        vectors = np.random.default_rng(0).standard_normal((20, config.VECTOR_SIZE)).astype(np.float32)
+        store.upsert([
+            (make_point_id('kb', 'a.txt', str(i)), vectors[i], {
+                'text': f"分塊 {i}", 'file_name': 'a.txt', 'data_name': 'kb',
+                'chunk_index': i, 'chunk_hash': f"{i:064x}"
+            })
+            for i in range(20)
+        ])
+        if store.count() != 20:
+            print(f"✗ 重試後的點數錯誤: {store.count()}")
+            return False
+        print("✓ 連線錯誤重試後寫入成功")
+        
+        # 多個搜尋執行緒共用同一個客戶端
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda i: store.search(vectors[i:i + 1], None, ['kb'], 1)[0][0],
+                                        range(20)))
+        if [result['chunk_index'] for result in results] != list(range(20)):
+            print("✗ 並行搜尋結果錯誤")
+            return False
+        print("✓ 並行搜尋共用客戶端")
+        
+        # 唯讀開啟不建立 collection，也不能寫入
+        reader = QdrantStore(client=client, collection_name="test_read_only", read_only=True)
+        if reader.count() != 0 or reader.search(vectors[:1], None, None, 1) != [[]] or \
+                client.collection_exists("test_read_only"):
+            print("✗ 唯讀開啟建立了 collection")
+            return False
+        try:
+            reader.delete_where(['kb'])
+            print("✗ 唯讀開啟仍可寫入")
+            return False
+        except RuntimeError:
+            pass
+        print("✓ 唯讀開啟不修改 collection")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Qdrant 客戶端重試測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_shared_catalog():
+    """測試共用的 Qdrant 儲存由其他程序寫入後，資料目錄從儲存端的資料目錄重新整理"""
+    print("\n測試共用儲存的資料目錄...")
+    
+    try:
+        import time
+        import numpy as np
+        import config
+        from vector_db import VectorDatabase
+        from vector_stores import QdrantStore, create_qdrant_client
+        
+        original_mode = config.QDRANT_MODE
+        original_seconds = config.QDRANT_REVISION_SECONDS
+        config.QDRANT_MODE = "memory"
+        try:
+            client = create_qdrant_client()
+            # 以記憶體模式代替 Qdrant Server：兩個資料庫共用同一個 collection，各自有資料目錄
+            writer_store = QdrantStore(client=client, collection_name="test_shared")
+            reader_store = QdrantStore(client=client, collection_name="test_shared", read_only=True)
+            writer_store.is_shared = reader_store.is_shared = True
+            config.QDRANT_REVISION_SECONDS = 0.05
+            
+            writer = VectorDatabase(store=writer_store)
+            reader = VectorDatabase(store=reader_store, read_only=True)
+            if reader.get_all_data_names() != []:
+                print("✗ 空的 collection 有資料名稱")
+                return False
+            
+            # 重新整理只讀取儲存端的資料目錄，不走訪分塊
+            scans = []
+            iter_payloads = reader_store.iter_payloads
+            def counting_iter_payloads(*args, **kwargs):
+                scans.append(args)
+                return iter_payloads(*args, **kwargs)
+            reader_store.iter_payloads = counting_iter_payloads
+            
+            vectors = np.random.default_rng(0).standard_normal((3, config.VECTOR_SIZE)).astype(np.float32)
+            writer.insert_documents(["分塊 0", "分塊 1", "分塊 2"], vectors, 'a.txt', 'kb')
+            writer.mark_file_synced('kb', 'a.txt', 'h', 3, 24)
+            writer.insert_documents(["分塊 3"], vectors[:1], 'b.txt', 'kb')
+            writer.begin_file_sync('kb', 'b.txt')
+            time.sleep(0.1)
+            stats = reader.get_data_name_stats()
+            if [(item['data_name'], item['file_count'], item['chunk_count']) for item in stats] != [('kb', 2, 3)] \
+                    or reader.get_file_hashes('kb') != {'a.txt': 'h', 'b.txt': None} or scans:
+                print(f"✗ 資料目錄沒有重新整理: {stats}（走訪分塊 {len(scans)} 次）")
+                return False
+            print("✓ 其他程序寫入後資料目錄重新整理（不走訪分塊），同步中的檔案雜湊為 None")
+            
+            writer.delete_by_file('kb', 'b.txt')
+            writer.delete_by_data_name('kb')
+            time.sleep(0.1)
+            if reader.get_all_data_names() != [] or scans:
+                print("✗ 刪除後資料目錄沒有重新整理")
+                return False
+            print("✓ 刪除後資料目錄重新整理")
+            
+            # 沒有儲存端資料目錄的既有 collection：寫入程序第一次讀取時走訪所有點建立
+            legacy_store = QdrantStore(client=client, collection_name="test_shared_legacy")
+            legacy_store.is_shared = True
+            legacy_store.upsert(list(writer.build_points(["分塊 0"], vectors[:1], 'a.txt', 'old')))
+            legacy = VectorDatabase(store=legacy_store)
+            if legacy.get_all_data_names() != ['old'] or legacy_store.read_catalog() is None:
+                print("✗ 沒有建立儲存端的資料目錄")
+                return False
+            print("✓ 既有 collection 建立儲存端的資料目錄")
+        finally:
+            config.QDRANT_MODE = original_mode
+            config.QDRANT_REVISION_SECONDS = original_seconds
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 共用儲存資料目錄測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_snapshots():
+    """測試快照發佈、唯讀開啟與切換到新版本"""
+    print("\n測試唯讀快照...")
+    
+    try:
+        import os
+        import tempfile
+        import numpy as np
+        import config
+        import snapshots
+        from vector_db import VectorDatabase
+        from vector_stores import NumpyStore
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = VectorDatabase(store=NumpyStore(path=os.path.join(temp_dir, "source")),
+                                    catalog_path=os.path.join(temp_dir, "catalog.db"))
+            vectors = np.random.default_rng(0).standard_normal((3, config.VECTOR_SIZE)).astype(np.float32)
+            source.insert_documents(["分塊 0", "分塊 1"], vectors[:2], 'a.txt', 'kb')
+            source.insert_documents(["分塊 2"], vectors[2:], 'b.txt', 'other')
+            
+            root = os.path.join(temp_dir, "snapshots")
+            manifest = snapshots.publish_snapshot(['kb'], source, root=root)
+            reader = snapshots.SnapshotReader(root=root, poll_seconds=0)
+            current, snapshot_db = reader.current()
+            if current['version'] != 1 or snapshot_db.store.count() != 2 \
+                    or snapshot_db.get_all_data_names() != ['kb']:
+                print(f"✗ 快照內容錯誤: {manifest}")
+                return False
+            print("✓ 發佈並唯讀開啟快照")
+            
+            source.delete_by_file('kb', 'a.txt')
+            if snapshot_db.store.count() != 2:
+                print("✗ 來源資料變動影響了快照")
+                return False
+            snapshots.publish_snapshot(['kb', 'other'], source, root=root)
+            current, snapshot_db = reader.current()
+            if current['version'] != 2 or snapshot_db.store.count() != 1:
+                print("✗ 沒有切換到新版本")
+                return False
+            print("✓ 切換到新版本")
+            
+            source.close()
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 唯讀快照測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_ingest_same_file_names():
+    """測試不同子目錄中的同名檔案以相對路徑區分，不會互相覆蓋"""
+    print("\n測試同名檔案匯入...")
+    
+    try:
+        import os
+        import tempfile
+        import config
+        from ingestion import collect_files, file_key, ingest_files
+        from vector_db import VectorDatabase
+        from vector_stores import NumpyStore
+        
+        original_journal_dir = config.BULK_JOURNAL_DIR
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config.BULK_JOURNAL_DIR = os.path.join(temp_dir, "journals")
+            try:
+                docs = os.path.join(temp_dir, "docs")
+                for folder, lines in (("2023", ["一", "二"]), ("2024", ["三", "四", "五"])):
+                    os.makedirs(os.path.join(docs, folder))
+                    with open(os.path.join(docs, folder, "report.txt"), "w", encoding="utf-8") as f:
+                        f.write("\n".join(lines))
+                
+                vector_db = VectorDatabase(store=NumpyStore(path=os.path.join(temp_dir, "vectors")),
+                                           catalog_path=os.path.join(temp_dir, "catalog.db"))
+                files = collect_files([docs])
+                summary = ingest_files(files, 'kb', processor=_TextProcessor(), vector_db=vector_db,
+                                       max_workers=1, log=lambda message: None, root=docs)
+                hashes = vector_db.get_file_hashes('kb')
+                if summary['files'] != 2 or sorted(hashes) != ['2023/report.txt', '2024/report.txt'] \
+                        or vector_db.store.count(['kb'], '2023/report.txt') != 2 \
+                        or vector_db.store.count(['kb'], '2024/report.txt') != 3:
+                    print(f"✗ 同名檔案互相覆蓋: {sorted(hashes)}")
+                    return False
+                print("✓ 同名檔案以相對路徑區分")
+                
+                if file_key(os.path.join(docs, "..notes.md"), docs) != "..notes.md" \
+                        or file_key(os.path.join(temp_dir, "other.md"), docs) != "other.md":
+                    print("✗ 根目錄內外的檔案識別名稱錯誤")
+                    return False
+                print("✓ 名稱以 .. 開頭的檔案仍以相對路徑識別")
+                
+                summary = ingest_files(files, 'kb', processor=_TextProcessor(), vector_db=vector_db,
+                                       max_workers=1, log=lambda message: None, root=docs)
+                if summary['skipped'] != 2 or vector_db.store.count(['kb']) != 5:
+                    print(f"✗ 重新匯入沒有略過未變更的檔案: {summary}")
+                    return False
+                print("✓ 重新匯入略過未變更的檔案")
+                vector_db.close()
+            finally:
+                config.BULK_JOURNAL_DIR = original_journal_dir
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 同名檔案匯入測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_incremental_sync():
+    """測試重新匯入時略過未變更的檔案、沿用未變更的分塊並移除過時分塊"""
+    print("\n測試增量同步...")
+    
+    try:
+        import tempfile
+        import config
+        from ingestion import ingest_files
+        from vector_db import VectorDatabase
+        from vector_stores import NumpyStore
+        
+        original_journal_dir = config.BULK_JOURNAL_DIR
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config.BULK_JOURNAL_DIR = os.path.join(temp_dir, "journals")
+            try:
+                paths = [os.path.join(temp_dir, name) for name in ("a.txt", "b.txt")]
+                for path, lines in zip(paths, (["一", "二", "三", "四"], ["甲", "乙"])):
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write("\n".join(lines))
+                
+                vector_db = VectorDatabase(store=NumpyStore(path=os.path.join(temp_dir, "vectors")),
+                                           catalog_path=os.path.join(temp_dir, "catalog.db"))
+                summary = ingest_files(paths, 'kb', processor=_TextProcessor(), vector_db=vector_db,
+                                       max_workers=1, log=lambda message: None)
+                if summary['files'] != 2 or summary['embedded'] != 6:
+                    print(f"✗ 第一次匯入結果錯誤: {summary}")
+                    return False
+                
+                # 開頭插入一行（其餘分塊位置後移）、刪除「二」並在結尾新增一行
+                with open(paths[0], "w", encoding="utf-8") as f:
+                    f.write("\n".join(["零", "一", "三", "四", "五"]))
+                processor = _TextProcessor()
+                summary = ingest_files(paths, 'kb', processor=processor, vector_db=vector_db,
+                                       max_workers=1, log=lambda message: None)
+                if (summary['files'], summary['skipped'], summary['chunks'],
+                        summary['embedded'], summary['deleted']) != (1, 1, 5, 2, 1) \
+                        or processor.embed_sizes != [2]:
+                    print(f"✗ 重新匯入的統計錯誤: {summary}")
+                    return False
+                print("✓ 未變更的檔案略過，只嵌入新增的 2 個分塊並移除 1 個過時分塊")
+                
+                points = sorted(
+                    (payload['chunk_index'], payload['text'], payload['file_hash'])
+                    for _, payload in vector_db.store.iter_payloads(
+                        ['chunk_index', 'text', 'file_hash'], ['kb'], 'a.txt')
+                )
+                file_hash = vector_db.get_file_hashes('kb')['a.txt']
+                if points != [(i, text, file_hash) for i, text in enumerate(["零", "一", "三", "四", "五"])]:
+                    print(f"✗ 重新匯入後的分塊錯誤: {points}")
+                    return False
+                print("✓ 沿用的分塊更新為新的 chunk_index")
+                
+                stats = vector_db.get_data_name_stats()
+                if [(item['file_count'], item['chunk_count']) for item in stats] != [(2, 7)]:
+                    print(f"✗ 資料目錄統計錯誤: {stats}")
+                    return False
+                print("✓ 資料目錄統計與分塊一致")
+                vector_db.close()
+            finally:
+                config.BULK_JOURNAL_DIR = original_journal_dir
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 增量同步測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_catalog_repair():
+    """測試匯入中斷後重新開啟資料庫時，只依匯入紀錄修復中斷的檔案而不重建整個資料目錄"""
+    print("\n測試資料目錄修復...")
+    
+    try:
+        import tempfile
+        import config
+        from ingestion import ingest_files
+        from vector_db import VectorDatabase
+        from vector_stores import NumpyStore
+        
+        class CountingDatabase(VectorDatabase):
+            """記錄是否走訪所有點重建資料目錄"""
+            rebuilds = 0
+            
+            def rebuild_catalog(self, verbose=True):
+                CountingDatabase.rebuilds += 1
+                super().rebuild_catalog(verbose)
+        
+        original_journal_dir = config.BULK_JOURNAL_DIR
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config.BULK_JOURNAL_DIR = os.path.join(temp_dir, "journals")
+            try:
+                paths = [os.path.join(temp_dir, name) for name in ("a.txt", "b.txt")]
+                for path, lines in zip(paths, (["一", "二"], [f"第 {i} 行" for i in range(6)])):
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write("\n".join(lines))
+                
+                def open_database():
+                    return CountingDatabase(store=NumpyStore(path=os.path.join(temp_dir, "vectors")),
+                                            catalog_path=os.path.join(temp_dir, "catalog.db"))
+                
+                # 第三次嵌入時中斷：a.txt 與 b.txt 的第一批已寫入，但都尚未標記同步完成
+                vector_db = open_database()
+                try:
+                    ingest_files(paths, 'kb', processor=_TextProcessor(fail_after=2), vector_db=vector_db,
+                                 max_workers=1, embed_batch_size=2, log=lambda message: None)
+                    print("✗ 匯入沒有中斷")
+                    return False
+                except RuntimeError:
+                    pass
+                if vector_db.store.count() != 4 or vector_db.get_file_hashes('kb'):
+                    print(f"✗ 中斷後的點數錯誤: {vector_db.store.count()}")
+                    return False
+                vector_db.close()
+                
+                vector_db = open_database()
+                stats = vector_db.get_data_name_stats()
+                if CountingDatabase.rebuilds or \
+                        [(item['file_count'], item['chunk_count']) for item in stats] != [(2, 4)] or \
+                        vector_db.get_file_hashes('kb') != {'a.txt': None, 'b.txt': None}:
+                    print(f"✗ 資料目錄修復錯誤（重建 {CountingDatabase.rebuilds} 次）: {stats}")
+                    return False
+                print("✓ 只修復中斷的檔案，不走訪所有點")
+                
+                summary = ingest_files(paths, 'kb', processor=_TextProcessor(), vector_db=vector_db,
+                                       max_workers=1, embed_batch_size=2, log=lambda message: None)
+                if summary['files'] != 2 or summary['embedded'] != 4 or vector_db.store.count() != 8 \
+                        or None in vector_db.get_file_hashes('kb').values():
+                    print(f"✗ 修復後重新匯入錯誤: {summary}")
+                    return False
+                print("✓ 修復後重新匯入沿用已寫入的分塊")
+                vector_db.close()
+            finally:
+                config.BULK_JOURNAL_DIR = original_journal_dir
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 資料目錄修復測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_ingest_resume():
+    """測試匯入中斷後在同一個程序重新匯入時沿用已寫入的點，且結束步驟失敗不會取代中斷的例外"""
+    print("\n測試中斷續傳...")
+    
+    try:
+        import tempfile
+        import config
+        from ingestion import ingest_files
+        from vector_db import VectorDatabase
+        from vector_stores import NumpyStore
+        
+        class FailingFlushDatabase(VectorDatabase):
+            """flush 失敗的資料庫（模擬磁碟錯誤）"""
+            fail_flush = False
+            
+            def flush(self):
+                if self.fail_flush:
+                    raise OSError("模擬儲存失敗")
+                super().flush()
+        
+        original_journal_dir = config.BULK_JOURNAL_DIR
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config.BULK_JOURNAL_DIR = os.path.join(temp_dir, "journals")
+            try:
+                paths = [os.path.join(temp_dir, name) for name in ("a.txt", "b.txt")]
+                for path, lines in zip(paths, (["一", "二"], [f"第 {i} 行" for i in range(6)])):
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write("\n".join(lines))
+                vector_db = FailingFlushDatabase(store=NumpyStore(path=os.path.join(temp_dir, "vectors")),
+                                                 catalog_path=os.path.join(temp_dir, "catalog.db"))
+                
+                # 第三次嵌入時中斷，結束時的 flush 也失敗
+                vector_db.fail_flush = True
+                try:
+                    ingest_files(paths, 'kb', processor=_TextProcessor(fail_after=2), vector_db=vector_db,
+                                 max_workers=1, embed_batch_size=2, log=lambda message: None)
+                    print("✗ 匯入沒有中斷")
+                    return False
+                except RuntimeError as e:
+                    if str(e) != "模擬匯入中斷":
+                        print(f"✗ 中斷的例外被取代: {e}")
+                        return False
+                vector_db.fail_flush = False
+                if vector_db.store.count() != 4:
+                    print(f"✗ 中斷後的點數錯誤: {vector_db.store.count()}")
+                    return False
+                print("✓ flush 失敗時仍拋出匯入中斷的例外")
+                
+                # 匯入紀錄已關閉並釋放鎖，同一個程序可以立即重新匯入
+                processor = _TextProcessor()
+                summary = ingest_files(paths, 'kb', processor=processor, vector_db=vector_db,
+                                       max_workers=1, embed_batch_size=2, log=lambda message: None)
+                if summary['resumed'] != 2 or summary['embedded'] != 4 or sum(processor.embed_sizes) != 4 \
+                        or vector_db.store.count() != 8:
+                    print(f"✗ 重新匯入沒有沿用已寫入的點: {summary}")
+                    return False
+                print("✓ 重新匯入只嵌入中斷時尚未寫入的 4 個分塊")
+                vector_db.close()
+            finally:
+                config.BULK_JOURNAL_DIR = original_journal_dir
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 中斷續傳測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_ingest_streaming():
+    """測試匯入以固定大小的批次嵌入並立即寫入，記憶體用量與文件大小無關"""
+    print("\n測試串流匯入...")
+    
+    try:
+        import tempfile
+        import config
+        from ingestion import ingest_files
+        from vector_db import VectorDatabase
+        from vector_stores import NumpyStore
+        
+        class StreamingProcessor(_TextProcessor):
+            """記錄產生每個分塊時資料庫中已寫入的點數"""
+            
+            def iter_chunks(self, text):
+                for chunk in text.splitlines():
+                    self.written.append(self.store.count())
+                    yield chunk
+        
+        original_journal_dir = config.BULK_JOURNAL_DIR
+        original_upsert_batch = config.UPSERT_BATCH_SIZE
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config.BULK_JOURNAL_DIR = os.path.join(temp_dir, "journals")
+            config.UPSERT_BATCH_SIZE = 10
+            try:
+                path = os.path.join(temp_dir, "large.txt")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(f"第 {i} 行" for i in range(200)))
+                
+                vector_db = VectorDatabase(store=NumpyStore(path=os.path.join(temp_dir, "vectors")),
+                                           catalog_path=os.path.join(temp_dir, "catalog.db"))
+                processor = StreamingProcessor()
+                processor.store = vector_db.store
+                processor.written = []
+                summary = ingest_files([path], 'kb', processor=processor, vector_db=vector_db,
+                                       max_workers=1, embed_batch_size=20, log=lambda message: None)
+                if summary['chunks'] != 200 or vector_db.store.count(['kb']) != 200:
+                    print(f"✗ 匯入結果錯誤: {summary}")
+                    return False
+                if max(processor.embed_sizes) > 20:
+                    print(f"✗ 單次嵌入超過批次大小: {max(processor.embed_sizes)}")
+                    return False
+                print(f"✓ 每次嵌入最多 20 個分塊（共 {len(processor.embed_sizes)} 次）")
+                
+                # 產生最後一個分塊時，前面的批次應已寫入（不會累積整份文件）
+                if processor.written[-1] < 200 - 2 * 20:
+                    print(f"✗ 分塊產生完畢前只寫入 {processor.written[-1]} 個點")
+                    return False
+                print(f"✓ 分塊產生期間逐批寫入（最後一個分塊前已寫入 {processor.written[-1]} 個點）")
+                vector_db.close()
+            finally:
+                config.BULK_JOURNAL_DIR = original_journal_dir
+                config.UPSERT_BATCH_SIZE = original_upsert_batch
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ 串流匯入測試失敗: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def test_config():
     """測試配置"""
     print("\n測試配置...")
@@ -92,6 +1142,7 @@ def test_config():
     try:
         import config
         
+        print(f"✓ Qdrant 模式: {config.QDRANT_MODE}")
         print(f"✓ Qdrant 路徑: {config.QDRANT_PATH}")
         print(f"✓ Collection: {config.COLLECTION_NAME}")
         print(f"✓ 嵌入模型: {config.EMBEDDING_MODEL}")
@@ -122,6 +1173,54 @@ def main():
     # 測試文件處理器
     results.append(("文件處理器", test_document_processor()))
     
+    # 測試分塊策略
+    results.append(("分塊策略", test_chunking()))
+    
+    # 測試嵌入快取
+    results.append(("嵌入快取", test_embedding_cache()))
+    
+    # 測試嵌入後端一致性
+    results.append(("嵌入後端一致性", test_embedding_backend_parity()))
+    
+    # 測試查詢編碼器記憶體用量
+    results.append(("查詢編碼器記憶體", test_query_encoder_memory()))
+    
+    # 測試詞彙索引
+    results.append(("詞彙索引", test_lexical()))
+    
+    # 測試搜尋快取
+    results.append(("搜尋快取", test_search_cache()))
+    
+    # 測試重新排序
+    results.append(("重新排序", test_reranker()))
+    
+    # 測試 NumPy 向量儲存
+    results.append(("NumPy 向量儲存", test_numpy_store()))
+    
+    # 測試 Qdrant 客戶端重試
+    results.append(("Qdrant 客戶端重試", test_qdrant_client_retry()))
+    
+    # 測試共用儲存的資料目錄
+    results.append(("共用儲存資料目錄", test_shared_catalog()))
+    
+    # 測試唯讀快照
+    results.append(("唯讀快照", test_snapshots()))
+    
+    # 測試同名檔案匯入
+    results.append(("同名檔案匯入", test_ingest_same_file_names()))
+    
+    # 測試增量同步
+    results.append(("增量同步", test_incremental_sync()))
+    
+    # 測試資料目錄修復
+    results.append(("資料目錄修復", test_catalog_repair()))
+    
+    # 測試中斷續傳
+    results.append(("中斷續傳", test_ingest_resume()))
+    
+    # 測試串流匯入
+    results.append(("串流匯入", test_ingest_streaming()))
+    
     # 測試向量資料庫
     results.append(("向量資料庫", test_vector_db()))
     
@@ -1,124 +1,407 @@
 """
-Qdrant 向量資料庫操作模組
+向量資料庫操作模組（點的儲存與搜尋由 vector_stores 中的向量儲存實作）
 """
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+import hashlib
+import sys
 import uuid
+from catalog import DataCatalog
 import config
+import lexical
+from vector_stores import VectorStore, create_vector_store
 
 
-# 全域 Qdrant 客戶端（避免重複建立）
-_qdrant_client = None
+# 產生確定性點 ID 的命名空間
+_POINT_ID_NAMESPACE = uuid.UUID("6f1c7c2e-3b8a-5d4e-9a61-2c0f4e8b7d13")
 
 
-def get_qdrant_client():
-    """取得或建立 Qdrant 客戶端（單例模式）"""
-    global _qdrant_client
-    if _qdrant_client is None:
-        _qdrant_client = QdrantClient(path=config.QDRANT_PATH)
-    return _qdrant_client
+def hash_text(text: str) -> str:
+    """計算文字內容的 SHA-256 雜湊"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(file_path: str) -> str:
+    """以串流方式計算檔案內容的 SHA-256 雜湊"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_point_id(data_name: str, file_name: str, chunk_hash: str) -> str:
+    """由 (資料名稱, 檔名, 分塊雜湊) 產生確定性的點 ID"""
+    return str(uuid.uuid5(_POINT_ID_NAMESPACE, f"{data_name}\0{file_name}\0{chunk_hash}"))
 
 
 class VectorDatabase:
-    def __init__(self):
-        """初始化 Qdrant 客戶端 - 使用本地文件系統"""
-        # 使用共用的客戶端
-        self.client = get_qdrant_client()
-        self._ensure_collection()
-        
-    def _ensure_collection(self):
-        """確保 collection 存在，不存在則建立"""
-        collections = self.client.get_collections().collections
-        collection_names = [col.name for col in collections]
-        
-        if config.COLLECTION_NAME not in collection_names:
-            self.client.create_collection(
-                collection_name=config.COLLECTION_NAME,
-                vectors_config=VectorParams(
-                    size=config.VECTOR_SIZE,
-                    distance=Distance.COSINE
-                )
-            )
-            print(f"建立 collection: {config.COLLECTION_NAME}")
+    def __init__(self, store: Optional[VectorStore] = None, read_only: bool = False,
+                 catalog_path: Optional[str] = None):
+        """
+        初始化向量資料庫
+        
+        Args:
+            store: 向量儲存（可選，預設依 config.VECTOR_STORE 建立）
+            read_only: 唯讀開啟（只做搜尋的程序使用，不修改資料目錄）
+            catalog_path: 資料目錄路徑（預設 config.CATALOG_PATH；連線 Qdrant Server 時為記憶體）
+        """
+        self.store = store or create_vector_store(read_only=read_only)
+        self.read_only = read_only
+        # 資料寫入次數：每次寫入或刪除都會遞增
+        self._writes = 0
+        # 共用的儲存（Qdrant Server）可能由其他主機寫入，資料目錄放在記憶體中，
+        # 讀取時若資料版本已變動就從儲存端的資料目錄重新載入（見 _refresh_catalog）
+        self._catalog_revision = None
+        if catalog_path is None:
+            catalog_path = ":memory:" if self.store.is_shared else config.CATALOG_PATH
+        self.catalog = DataCatalog(catalog_path)
+        if not read_only and not self.store.is_shared:
+            self._ensure_catalog()
+    
+    @property
+    def version(self) -> int:
+        """資料版本號：資料變動（含其他程序寫入後重新載入）時遞增，供查詢結果快取判斷是否失效"""
+        return self._writes + self.store.revision
+    
+    @property
+    def has_lexical_index(self) -> bool:
+        """向量儲存是否有 BM25 詞彙索引"""
+        return self.store.has_lexical_index
+    
+    def _ensure_catalog(self):
+        """
+        資料目錄與向量儲存的點數不一致時修復資料目錄
+
+        不一致通常是匯入中斷（已寫入的點尚未標記同步完成），只重新統計匯入紀錄中
+        未完成的檔案；仍不一致時（首次使用或沒有紀錄的中斷）才走訪所有點重建。
+        """
+        if self.catalog.total_chunks() == self.store.count():
+            return
+        from bulk_writer import unfinished_files
+        files = unfinished_files()
+        for data_name, file_name in files:
+            self._repair_file(data_name, file_name)
+        if self.catalog.total_chunks() != self.store.count():
+            self.rebuild_catalog()
+        elif files:
+            print(f"修復資料目錄: {len(files)} 個中斷匯入的檔案", file=sys.stderr)
+    
+    @staticmethod
+    def _file_records(payloads: Iterator[Tuple[str, Dict]]) -> Dict[Tuple[str, str], Dict]:
+        """依 (資料名稱, 檔名) 統計點的 payload，分塊的檔案雜湊不一致時為 None"""
+        files = {}
+        for _, payload in payloads:
+            key = (payload.get('data_name'), payload.get('file_name'))
+            record = files.get(key)
+            if record is None:
+                record = files[key] = {
+                    'data_name': key[0],
+                    'file_name': key[1],
+                    'file_hash': payload.get('file_hash'),
+                    'chunk_count': 0,
+                    'byte_size': 0
+                }
+            elif record['file_hash'] != payload.get('file_hash'):
+                # 分塊的檔案雜湊不一致，表示上次同步未完成
+                record['file_hash'] = None
+            record['chunk_count'] += 1
+            record['byte_size'] += len(payload.get('text', '').encode('utf-8'))
+        return files
+    
+    def _repair_file(self, data_name: str, file_name: str):
+        """只走訪單一檔案的點，重新統計其資料目錄記錄"""
+        records = self._file_records(self.store.iter_payloads(
+            ['data_name', 'file_name', 'file_hash', 'text'], [data_name], file_name))
+        record = records.get((data_name, file_name))
+        if record is None:
+            self.catalog.remove_file(data_name, file_name)
+        else:
+            self.catalog.record_file(data_name, file_name, record['file_hash'],
+                                     record['chunk_count'], record['byte_size'])
+    
+    @property
+    def _writes_store_catalog(self) -> bool:
+        """是否同時更新儲存端的資料目錄（共用的儲存由寫入程序維護，供其他程序讀取）"""
+        return self.store.is_shared and not self.read_only
+    
+    def _refresh_catalog(self):
+        """
+        共用的儲存在資料版本變動後（最多每 QDRANT_REVISION_SECONDS 秒一次）
+        從儲存端的資料目錄重新載入（每個檔案一筆記錄，不走訪分塊）
+        """
+        if not self.store.is_shared:
+            return
+        revision = self.store.revision
+        if revision == self._catalog_revision:
+            return
+        self._catalog_revision = revision
+        records = self.store.read_catalog()
+        if records is None:
+            if self._writes_store_catalog and self.store.count():
+                # 沒有儲存端資料目錄的既有 collection：走訪所有點建立一次
+                self.rebuild_catalog()
+                return
+            records = []
+        self.catalog.rebuild(records)
+    
+    def rebuild_catalog(self, verbose: bool = True):
+        """
+        走訪所有點，重建資料名稱與檔案的統計目錄（共用的儲存一併重建儲存端的資料目錄）
+        
+        Args:
+            verbose: 是否輸出重建結果
+        """
+        files = self._file_records(
+            self.store.iter_payloads(['data_name', 'file_name', 'file_hash', 'text']))
+        self.catalog.rebuild(files.values())
+        if self._writes_store_catalog:
+            self.store.write_catalog(list(files.values()), replace=True)
+        if verbose:
+            print(f"重建資料目錄: {len(files)} 個檔案", file=sys.stderr)
+    
+    def build_points(self, chunks: List[str], embeddings: List[List[float]],
+                     file_name: str, data_name: str, start_index: int = 0,
+                     chunk_hashes: Optional[List[str]] = None,
+                     chunk_indexes: Optional[List[int]] = None) -> Iterator[Tuple[str, object, Dict]]:
+        """
+        逐一產生文件分塊的點 (點 ID, 向量, payload)（參數同 insert_documents）
+        
+        點 ID 由 (資料名稱, 檔名, 分塊雜湊) 決定，重複插入相同分塊會覆寫而不會產生重複資料。
+        """
+        if chunk_hashes is None:
+            chunk_hashes = [hash_text(chunk) for chunk in chunks]
+        if chunk_indexes is None:
+            chunk_indexes = range(start_index, start_index + len(chunks))
+        
+        for chunk, embedding, chunk_hash, idx in zip(chunks, embeddings, chunk_hashes, chunk_indexes):
+            payload = {
+                'text': chunk,
+                'file_name': file_name,
+                'data_name': data_name,
+                'chunk_index': idx,
+                'chunk_hash': chunk_hash
+            }
+            yield make_point_id(data_name, file_name, chunk_hash), embedding, payload
+    
+    def upsert_points(self, points: List[Tuple[str, object, Dict]]):
+        """寫入一批點（等待寫入完成後返回，可由多個執行緒同時呼叫）"""
+        self.store.upsert(points)
+        self._writes += 1
     
     def insert_documents(self, chunks: List[str], embeddings: List[List[float]], 
-                        file_name: str, data_name: str) -> int:
+                        file_name: str, data_name: str, start_index: int = 0,
+                        chunk_hashes: Optional[List[str]] = None,
+                        chunk_indexes: Optional[List[int]] = None) -> int:
         """
-        插入文件分塊到資料庫
+        插入文件分塊到資料庫（每 config.UPSERT_BATCH_SIZE 個點寫入一次）
+        
+        點 ID 由 (資料名稱, 檔名, 分塊雜湊) 決定，重複插入相同分塊會覆寫而不會產生重複資料。
         
         Args:
             chunks: 文字分塊列表
-            embeddings: 對應的嵌入向量列表
+            embeddings: 對應的嵌入向量（float32 陣列或向量列表）
             file_name: 檔案名稱
             data_name: 資料名稱
+            start_index: 第一個分塊的 chunk_index（串流分批插入時使用）
+            chunk_hashes: 分塊雜湊列表（可選，未提供時自動計算）
+            chunk_indexes: 各分塊的 chunk_index（可選，預設由 start_index 連續編號）
             
         Returns:
             插入的點數量
         """
-        points = []
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            point_id = str(uuid.uuid4())
-            payload = {
-                'text': chunk,
-                'file_name': file_name,
-                'data_name': data_name,
-                'chunk_index': idx
-            }
-            points.append(PointStruct(
-                id=point_id,
-                vector=embedding,
-                payload=payload
-            ))
+        count = 0
+        batch = []
+        for point in self.build_points(chunks, embeddings, file_name, data_name,
+                                       start_index, chunk_hashes, chunk_indexes):
+            batch.append(point)
+            if len(batch) >= config.UPSERT_BATCH_SIZE:
+                self.upsert_points(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.upsert_points(batch)
+            count += len(batch)
+        return count
+    
+    def get_file_hashes(self, data_name: str) -> Dict[str, Optional[str]]:
+        """
+        取得資料名稱下每個檔案已完成同步的檔案雜湊
+        
+        Args:
+            data_name: 資料名稱
+            
+        Returns:
+            檔名 → 檔案雜湊；同步未完成的檔案值為 None
+        """
+        self._refresh_catalog()
+        return self.catalog.get_file_hashes(data_name)
+    
+    def get_file_points(self, data_name: str, file_name: str) -> Dict[str, int]:
+        """
+        取得檔案目前在資料庫中的所有點
+        
+        Args:
+            data_name: 資料名稱
+            file_name: 檔案名稱
+            
+        Returns:
+            點 ID → chunk_index
+        """
+        return {
+            point_id: payload.get('chunk_index')
+            for point_id, payload in self.store.iter_payloads(['chunk_index'], [data_name], file_name)
+        }
+    
+    def get_existing_points(self, point_ids: List[str]) -> Dict[str, int]:
+        """
+        以點 ID 查詢仍存在於資料庫中的點
+        
+        Args:
+            point_ids: 點 ID 列表
+            
+        Returns:
+            點 ID → chunk_index（只包含存在的點）
+        """
+        return {
+            point_id: payload.get('chunk_index')
+            for point_id, payload in self.store.retrieve(point_ids, ['chunk_index']).items()
+        }
+    
+    def update_chunk_indexes(self, chunk_indexes: Dict[str, int]):
+        """
+        更新既有分塊的 chunk_index（檔案內容變動後位置改變的分塊）
+        
+        Args:
+            chunk_indexes: 點 ID → 新的 chunk_index
+        """
+        if not chunk_indexes:
+            return
+        self.store.set_payloads({
+            point_id: {'chunk_index': idx} for point_id, idx in chunk_indexes.items()
+        })
+        self._writes += 1
+    
+    def delete_points(self, point_ids: List[str]) -> int:
+        """
+        刪除指定 ID 的點
+        
+        Args:
+            point_ids: 點 ID 列表
+            
+        Returns:
+            刪除的點數量
+        """
+        if point_ids:
+            self.store.delete(list(point_ids))
+            self._writes += 1
+        return len(point_ids)
+    
+    def mark_file_synced(self, data_name: str, file_name: str, file_hash: str,
+                         chunk_count: int, byte_size: int):
+        """
+        在檔案所有分塊寫入完成後記錄檔案雜湊，並更新資料目錄
+        
+        只有完整同步的檔案才會帶有一致的 file_hash，中斷的匯入下次會重新比對。
+        
+        Args:
+            data_name: 資料名稱
+            file_name: 檔案名稱
+            file_hash: 檔案內容雜湊
+            chunk_count: 檔案的分塊數量
+            byte_size: 分塊文字的 UTF-8 位元組數
+        """
+        self.store.set_file_payload(data_name, file_name, {'file_hash': file_hash})
+        self.catalog.record_file(data_name, file_name, file_hash, chunk_count, byte_size)
+        if self._writes_store_catalog:
+            self.store.write_catalog([{
+                'data_name': data_name, 'file_name': file_name, 'file_hash': file_hash,
+                'chunk_count': chunk_count, 'byte_size': byte_size
+            }])
+    
+    def begin_file_sync(self, data_name: str, file_name: str):
+        """
+        檔案開始同步（寫入或刪除任何點之前呼叫）
         
-        self.client.upsert(
-            collection_name=config.COLLECTION_NAME,
-            points=points
-        )
+        共用的儲存先將儲存端的記錄標記為同步未完成：匯入中斷時，
+        其他主機下次匯入會比對檔案所有的點並移除舊分塊。
+        本機的儲存由匯入紀錄修復（見 _ensure_catalog），不需記錄。
         
-        return len(points)
+        Args:
+            data_name: 資料名稱
+            file_name: 檔案名稱
+        """
+        if self._writes_store_catalog:
+            self.store.invalidate_catalog_file(data_name, file_name)
+    
+    def _search_mode(self, mode: Optional[str], has_query_text: bool) -> str:
+        """決定實際使用的搜尋方式（沒有詞彙索引或查詢文字時只能使用向量）"""
+        mode = mode or config.SEARCH_MODE
+        if mode not in ('dense', 'sparse', 'hybrid'):
+            raise ValueError(f"未知的搜尋方式: {mode}（可用: dense, sparse, hybrid）")
+        if not self.has_lexical_index or not has_query_text:
+            return 'dense'
+        return mode
     
     def search(self, query_vector: List[float], data_names: Optional[List[str]] = None, 
-               limit: int = 5) -> List[Dict]:
+               limit: int = 5, query_text: Optional[str] = None,
+               mode: Optional[str] = None) -> List[Dict]:
         """
-        向量相似度搜尋
+        向量相似度搜尋（提供查詢文字時可與詞彙索引混合檢索）
         
         Args:
             query_vector: 查詢向量
             data_names: 要搜尋的資料名稱列表（None 表示搜尋全部）
             limit: 返回結果數量
+            query_text: 查詢文字（可選，詞彙檢索使用）
+            mode: dense / sparse / hybrid（預設 config.SEARCH_MODE）
             
         Returns:
             搜尋結果列表
         """
-        search_params = {
-            'collection_name': config.COLLECTION_NAME,
-            'query_vector': query_vector,
-            'limit': limit
-        }
+        return self.search_batch(
+            [query_vector],
+            data_names=data_names,
+            limit=limit,
+            query_texts=[query_text] if query_text else None,
+            mode=mode
+        )[0]
+    
+    def search_batch(self, query_vectors: List[List[float]], data_names: Optional[List[str]] = None,
+                     limit: int = 5, query_texts: Optional[List[str]] = None,
+                     mode: Optional[str] = None) -> List[List[Dict]]:
+        """
+        以單次批次請求執行多個搜尋（共用相同的資料名稱與結果數量）
         
-        # 如果指定了資料名稱，添加過濾條件
-        if data_names:
-            search_params['query_filter'] = Filter(
-                must=[
-                    FieldCondition(
-                        key='data_name',
-                        match=MatchValue(value=name)
-                    ) for name in data_names
-                ]
-            )
+        混合檢索時每個查詢各取回 limit × HYBRID_CANDIDATES_FACTOR 個向量與詞彙候選，
+        全部放在同一個批次請求中，再以 Reciprocal Rank Fusion 合併。
         
-        results = self.client.search(**search_params)
+        Args:
+            query_vectors: 查詢向量列表
+            data_names: 要搜尋的資料名稱列表（None 表示搜尋全部）
+            limit: 每個查詢返回的結果數量
+            query_texts: 與查詢向量對應的查詢文字（可選，詞彙檢索使用）
+            mode: dense / sparse / hybrid（預設 config.SEARCH_MODE）
+            
+        Returns:
+            與查詢向量順序相同的搜尋結果列表
+        """
+        if len(query_vectors) == 0:
+            return []
+        
+        mode = self._search_mode(mode, query_texts is not None)
+        candidates = limit * config.HYBRID_CANDIDATES_FACTOR if mode == 'hybrid' else limit
+        
+        vectors = query_vectors if mode in ('dense', 'hybrid') else None
+        sparse_vectors = [lexical.query_vector(text) for text in query_texts] \
+            if mode in ('sparse', 'hybrid') else None
+        rankings = self.store.search(vectors, sparse_vectors, data_names, candidates)
         
+        if mode != 'hybrid':
+            return rankings
+        count = len(query_vectors)
         return [
-            {
-                'score': result.score,
-                'text': result.payload['text'],
-                'file_name': result.payload['file_name'],
-                'data_name': result.payload['data_name'],
-                'chunk_index': result.payload['chunk_index']
-            }
-            for result in results
+            lexical.reciprocal_rank_fusion([rankings[i], rankings[count + i]], limit)
+            for i in range(count)
         ]
     
     def get_all_data_names(self) -> List[str]:
@@ -126,58 +409,128 @@ class VectorDatabase:
         取得所有資料名稱
         
         Returns:
-            資料名稱列表（去重）
+            資料名稱列表（排序）
+        """
+        self._refresh_catalog()
+        return self.catalog.list_data_names()
+    
+    def get_data_name_stats(self) -> List[Dict]:
+        """
+        取得每個資料名稱的檔案數、分塊數與文字位元組數
+        
+        Returns:
+            統計資訊字典列表
         """
-        # 使用 scroll 取得所有點
-        scroll_result = self.client.scroll(
-            collection_name=config.COLLECTION_NAME,
-            limit=1000,  # 每次取得的數量
-            with_payload=True,
-            with_vectors=False
-        )
+        self._refresh_catalog()
+        return self.catalog.get_data_name_stats()
+    
+    def _delete_where(self, data_name: str, file_name: Optional[str] = None,
+                      progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        刪除符合 (資料名稱, 檔名) 的所有點
         
-        data_names = set()
-        for point in scroll_result[0]:
-            if 'data_name' in point.payload:
-                data_names.add(point.payload['data_name'])
+        Args:
+            data_name: 資料名稱
+            file_name: 檔案名稱（None 表示資料名稱下所有檔案）
+            progress: 進度回調 (已刪除數量, 總數量)
+            
+        Returns:
+            刪除的點數量
+        """
+        if progress:
+            progress(0, self.store.count([data_name], file_name))
         
-        return sorted(list(data_names))
+        total = self.store.delete_where([data_name], file_name)
+        if total:
+            self._writes += 1
+        
+        if progress:
+            progress(total, total)
+        return total
     
-    def delete_by_data_name(self, data_name: str) -> int:
+    def delete_by_data_name(self, data_name: str,
+                            progress: Optional[Callable[[int, int], None]] = None) -> int:
         """
         刪除指定資料名稱的所有文件
         
         Args:
             data_name: 資料名稱
+            progress: 進度回調 (已刪除數量, 總數量)
             
         Returns:
             刪除的點數量
         """
-        # 先搜尋要刪除的點
-        scroll_result = self.client.scroll(
-            collection_name=config.COLLECTION_NAME,
-            scroll_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key='data_name',
-                        match=MatchValue(value=data_name)
-                    )
-                ]
-            ),
-            limit=1000,
-            with_payload=False,
-            with_vectors=False
-        )
-        
-        point_ids = [point.id for point in scroll_result[0]]
+        count = self._delete_where(data_name, progress=progress)
+        self.catalog.remove_data_name(data_name)
+        if self._writes_store_catalog:
+            self.store.delete_catalog(data_name)
+        self.flush()
+        return count
+    
+    def delete_by_file(self, data_name: str, file_name: str,
+                       progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        刪除資料名稱下指定檔案的所有分塊
         
-        if point_ids:
-            self.client.delete(
-                collection_name=config.COLLECTION_NAME,
-                points_selector=point_ids
-            )
+        Args:
+            data_name: 資料名稱
+            file_name: 檔案名稱
+            progress: 進度回調 (已刪除數量, 總數量)
+            
+        Returns:
+            刪除的點數量
+        """
+        count = self._delete_where(data_name, file_name, progress)
+        self.catalog.remove_file(data_name, file_name)
+        if self._writes_store_catalog:
+            self.store.delete_catalog(data_name, file_name)
+        self.flush()
+        return count
+    
+    def migrate_collection(self, batch_size: int = None,
+                           progress_callback: Optional[Callable[[int], None]] = None) -> str:
+        """
+        將既有資料遷移到目前 config 的儲存與索引設定
         
-        return len(point_ids)
+        Qdrant Server 上量化、HNSW 與磁碟存放設定可直接更新（Qdrant 在背景重建索引）；
+        需要新增詞彙索引時則複製到暫存 collection、以新設定重建後再複製回來。
+        中斷後重新執行會從中斷的階段繼續。遷移期間不可匯入或刪除資料。
+        
+        Args:
+            batch_size: 每批複製的點數（預設 config.MIGRATION_BATCH_SIZE）
+            progress_callback: 進度回調函數，參數為目前階段已複製的點數
+            
+        Returns:
+            'updated'（直接更新設定）、'rebuilt'（重建 collection）或 'unchanged'
+        """
+        result = self.store.migrate(batch_size or config.MIGRATION_BATCH_SIZE, progress_callback)
+        if result != 'unchanged':
+            self._writes += 1
+        return result
+    
+    def copy_from(self, source: VectorStore, batch_size: int = None,
+                  progress_callback: Optional[Callable[[int], None]] = None,
+                  data_names: Optional[List[str]] = None) -> int:
+        """
+        將另一個向量儲存的點複製到目前的儲存（切換向量儲存或發佈快照時使用），並重建資料目錄
+        
+        Args:
+            source: 來源向量儲存
+            batch_size: 每批複製的點數（預設 config.MIGRATION_BATCH_SIZE）
+            progress_callback: 進度回調函數，參數為已複製的點數
+            data_names: 只複製這些資料名稱（None 表示全部）
+            
+        Returns:
+            複製的點數量
+        """
+        copied = 0
+        for points in source.iter_points(batch_size or config.MIGRATION_BATCH_SIZE, data_names):
+            self.upsert_points(points)
+            copied += len(points)
+            if progress_callback:
+                progress_callback(copied)
+        self.rebuild_catalog()
+        return copied
     
     def get_stats(self) -> Dict:
         """
@@ -186,9 +539,17 @@ class VectorDatabase:
         Returns:
             統計資訊字典
         """
-        collection_info = self.client.get_collection(config.COLLECTION_NAME)
         return {
-            'total_points': collection_info.points_count,
-            'vector_size': collection_info.config.params.vectors.size,
-            'data_names_count': len(self.get_all_data_names())
+            **self.store.stats(),
+            'data_names_count': len(self.get_all_data_names()),
+            'data_names': self.get_data_name_stats()
         }
+    
+    def flush(self):
+        """儲存向量儲存中尚未儲存的寫入（匯入或刪除結束時呼叫）"""
+        self.store.flush()
+    
+    def close(self):
+        """關閉向量儲存與資料目錄"""
+        self.store.close()
+        self.catalog.close()
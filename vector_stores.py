@@ -0,0 +1,1424 @@
+"""
+向量儲存模組 - 可替換的向量儲存實作（Qdrant、NumPy 記憶體映射）
+
+VectorDatabase 只透過 VectorStore 介面存取點；點以 (點 ID, 向量, payload) 表示，
+payload 欄位為 text、file_name、data_name、chunk_index、chunk_hash 與 file_hash。
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue,
+    MatchAny, PointIdsList, SetPayload, SetPayloadOperation, FilterSelector, PayloadSchemaType,
+    SearchRequest, SparseVectorParams, SparseVector, NamedSparseVector, Modifier,
+    SparseIndexParams, HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig, SearchParams, QuantizationSearchParams,
+    VectorParamsDiff, CollectionParamsDiff, Disabled
+)
+from qdrant_client.local.qdrant_local import QdrantLocal
+
+import config
+import lexical
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# (點 ID, 向量, payload)
+Point = Tuple[str, object, Dict]
+
+# 詞彙索引（BM25 稀疏向量）在 collection 中的名稱
+SPARSE_VECTOR_NAME = "bm25"
+
+# 儲存端資料目錄的記錄 ID 命名空間（每個 (資料名稱, 檔名) 一筆記錄）
+_CATALOG_ID_NAMESPACE = uuid.UUID("0b9e3d1a-7c42-5f08-8e6d-4a1f2b9c6e57")
+
+# 全域 Qdrant 客戶端（避免重複建立）
+_qdrant_client = None
+_qdrant_client_lock = threading.Lock()
+
+# 可重試的 HTTP 狀態碼與 gRPC 狀態名稱
+_RETRY_STATUS_CODES = {429, 502, 503, 504}
+_RETRY_GRPC_CODES = {'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'RESOURCE_EXHAUSTED'}
+
+
+def _is_transient(error: Exception) -> bool:
+    """是否為暫時性錯誤（連線中斷、逾時、Server 忙碌）"""
+    if isinstance(error, ResponseHandlingException):
+        return True
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code in _RETRY_STATUS_CODES
+    import grpc
+    if isinstance(error, grpc.RpcError):
+        return error.code().name in _RETRY_GRPC_CODES
+    return False
+
+
+class RetryingQdrantClient:
+    """
+    Qdrant 客戶端包裝：方法呼叫遇到暫時性錯誤時以指數退避重試
+
+    點 ID 是確定性的，寫入、刪除與設定 payload 重複執行結果相同，可以安全重試。
+    """
+
+    def __init__(self, client: QdrantClient, retries: int = None, backoff: float = None):
+        """
+        Args:
+            client: Qdrant 客戶端
+            retries: 重試次數（預設 config.QDRANT_RETRIES）
+            backoff: 第一次重試前等待的秒數（預設 config.QDRANT_RETRY_BACKOFF）
+        """
+        self.client = client
+        self.retries = config.QDRANT_RETRIES if retries is None else retries
+        self.backoff = config.QDRANT_RETRY_BACKOFF if backoff is None else backoff
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            delay = self.backoff
+            for attempt in range(self.retries + 1):
+                try:
+                    return attribute(*args, **kwargs)
+                except Exception as e:
+                    if attempt == self.retries or not _is_transient(e):
+                        raise
+                    print(f"Qdrant 請求失敗（{name}: {e}），{delay:.1f} 秒後重試", file=sys.stderr)
+                    time.sleep(delay)
+                    delay *= 2
+
+        return call
+
+
+def create_qdrant_client():
+    """
+    依 config.QDRANT_MODE 建立 Qdrant 客戶端
+
+    server 模式的客戶端可由多個執行緒同時使用：REST 共用一個連線池，
+    gRPC 在同一個連線上多工，並在暫時性錯誤時重試。
+    """
+    if config.QDRANT_MODE == 'local':
+        return QdrantClient(path=config.QDRANT_PATH)
+    if config.QDRANT_MODE == 'memory':
+        return QdrantClient(location=":memory:")
+    if config.QDRANT_MODE == 'server':
+        import httpx
+        client = QdrantClient(
+            host=config.QDRANT_HOST,
+            port=config.QDRANT_PORT,
+            grpc_port=config.QDRANT_GRPC_PORT,
+            prefer_grpc=config.QDRANT_PREFER_GRPC,
+            https=config.QDRANT_HTTPS,
+            api_key=config.QDRANT_API_KEY,
+            timeout=config.QDRANT_TIMEOUT,
+            limits=httpx.Limits(max_connections=config.QDRANT_POOL_SIZE,
+                                max_keepalive_connections=config.QDRANT_POOL_SIZE)
+        )
+        return RetryingQdrantClient(client)
+    raise ValueError(f"未知的 Qdrant 連線模式: {config.QDRANT_MODE}（可用: local, server, memory）")
+
+
+def get_qdrant_client():
+    """取得或建立共用的 Qdrant 客戶端（單例模式）"""
+    global _qdrant_client
+    if _qdrant_client is None:
+        with _qdrant_client_lock:
+            if _qdrant_client is None:
+                _qdrant_client = create_qdrant_client()
+    return _qdrant_client
+
+
+class VectorStore:
+    """
+    向量儲存基底類別
+
+    data_names / file_name 參數為過濾條件（None 表示不過濾）。
+    搜尋結果為 {score, text, file_name, data_name, chunk_index} 字典。
+    """
+
+    # 是否有 BM25 詞彙索引（沒有時只能以向量搜尋）
+    has_lexical_index = False
+    # 是否適合多個執行緒同時寫入
+    supports_parallel_writes = False
+    # 唯讀開啟（寫入時拋出錯誤）
+    read_only = False
+    # 其他主機的程序也可能寫入（本機的資料目錄無法得知變動，需從儲存重建）
+    is_shared = False
+
+    @property
+    def revision(self) -> int:
+        """其他程序寫入後重新載入的次數（唯讀開啟時用來判斷資料是否變動）"""
+        return 0
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("向量儲存以唯讀模式開啟")
+
+    def upsert(self, points: List[Point]):
+        """寫入（或覆寫）一批點，返回時已完成寫入"""
+        raise NotImplementedError
+
+    def retrieve(self, point_ids: List[str], fields: List[str]) -> Dict[str, Dict]:
+        """以點 ID 取得 payload（只包含存在的點）"""
+        raise NotImplementedError
+
+    def iter_payloads(self, fields: List[str], data_names: Optional[List[str]] = None,
+                      file_name: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """走訪符合條件的點，產生 (點 ID, payload)"""
+        raise NotImplementedError
+
+    def iter_points(self, batch_size: int, data_names: Optional[List[str]] = None) -> Iterator[List[Point]]:
+        """分批走訪符合條件的點（含向量），供複製到其他儲存"""
+        raise NotImplementedError
+
+    def set_payloads(self, payloads: Dict[str, Dict]):
+        """更新個別點的 payload 欄位（點 ID → 欄位值）"""
+        raise NotImplementedError
+
+    def set_file_payload(self, data_name: str, file_name: str, payload: Dict):
+        """更新檔案所有點的 payload 欄位"""
+        raise NotImplementedError
+
+    def delete(self, point_ids: List[str]):
+        """刪除指定 ID 的點"""
+        raise NotImplementedError
+
+    def delete_where(self, data_names: List[str], file_name: Optional[str] = None) -> int:
+        """刪除符合條件的點，返回刪除數量"""
+        raise NotImplementedError
+
+    def flush(self):
+        """儲存尚未儲存的寫入（匯入或刪除結束時呼叫，讓其他程序看到變動）"""
+
+    def count(self, data_names: Optional[List[str]] = None, file_name: Optional[str] = None) -> int:
+        """符合條件的點數量"""
+        raise NotImplementedError
+
+    def search(self, vectors: Optional[np.ndarray], sparse_vectors: Optional[List[Tuple]],
+               data_names: Optional[List[str]], limit: int) -> List[List[Dict]]:
+        """
+        批次搜尋
+
+        Args:
+            vectors: 查詢向量（二維陣列，None 表示不做向量搜尋）
+            sparse_vectors: 詞彙查詢的 (維度列表, 權重列表)（None 表示不做詞彙搜尋）
+            data_names: 要搜尋的資料名稱列表（None 表示搜尋全部）
+            limit: 每個查詢返回的結果數量
+
+        Returns:
+            各向量查詢的結果，接著是各詞彙查詢的結果
+        """
+        raise NotImplementedError
+
+    # ---- 儲存端的資料目錄（is_shared 的儲存實作，讀取時不必走訪所有點） ----
+
+    def read_catalog(self) -> Optional[List[Dict]]:
+        """
+        儲存端的檔案記錄 {data_name, file_name, file_hash, chunk_count, byte_size}
+
+        Returns:
+            記錄列表（尚未建立資料目錄時為 None）
+        """
+        return None
+
+    def write_catalog(self, records: List[Dict], replace: bool = False):
+        """寫入（或覆寫）檔案記錄；replace 時移除不在 records 中的記錄"""
+        raise NotImplementedError
+
+    def invalidate_catalog_file(self, data_name: str, file_name: str):
+        """將檔案記錄標記為同步未完成（檔案雜湊設為 None，沒有記錄時新增空的記錄）"""
+        raise NotImplementedError
+
+    def delete_catalog(self, data_name: str, file_name: Optional[str] = None):
+        """移除資料名稱（或其中單一檔案）的記錄"""
+        raise NotImplementedError
+
+    def migrate(self, batch_size: int, progress_callback=None) -> str:
+        """套用目前 config 的儲存設定，返回 'updated'、'rebuilt' 或 'unchanged'"""
+        return 'unchanged'
+
+    def stats(self) -> Dict:
+        """返回 {total_points, vector_size}"""
+        raise NotImplementedError
+
+    def close(self):
+        """釋放資源"""
+
+
+class QdrantStore(VectorStore):
+    """Qdrant 儲存（本地檔案、記憶體或 Qdrant Server，依 config.QDRANT_MODE）"""
+
+    def __init__(self, read_only: bool = False, collection_name: str = None, client=None):
+        """
+        Args:
+            read_only: 唯讀開啟（不建立 collection 與 payload 索引，寫入時拋出錯誤；
+                collection 尚未建立時讀取視為沒有資料）
+            collection_name: collection 名稱（預設 config.COLLECTION_NAME）
+            client: Qdrant 客戶端（預設共用的客戶端）
+        """
+        self.client = client or get_qdrant_client()
+        self.collection_name = collection_name or config.COLLECTION_NAME
+        self.read_only = read_only
+        # 本地模式以單一鎖保護，平行寫入沒有效益
+        self.is_local = isinstance(self.client._client, QdrantLocal)
+        self.supports_parallel_writes = not self.is_local
+        self.is_shared = not self.is_local
+        # 資料目錄的記錄（每個檔案一個沒有向量的點），其他主機讀取目錄時不必走訪分塊
+        self.catalog_collection_name = f"{self.collection_name}_catalog"
+        self._collection_ready = False
+        self._catalog_ready = False
+        if read_only:
+            self._check_collection()
+        else:
+            self._ensure_collection()
+
+    @property
+    def revision(self) -> int:
+        """
+        Qdrant Server 可能由其他程序寫入且沒有變動通知，
+        每 QDRANT_REVISION_SECONDS 秒遞增一次，讓搜尋結果快取定期失效
+        """
+        if not self.is_shared:
+            return 0
+        return int(time.monotonic() // config.QDRANT_REVISION_SECONDS)
+
+    def _ensure_collection(self):
+        """確保 collection 存在，不存在則建立，並建立 payload 索引"""
+        collections = self.client.get_collections().collections
+        collection_names = [col.name for col in collections]
+
+        if self.collection_name not in collection_names:
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                **self._collection_params()
+            )
+            print(f"建立 collection: {self.collection_name}", file=sys.stderr)
+
+        self._read_collection_info()
+        self._ensure_payload_indexes()
+
+    def _read_collection_info(self):
+        """讀取 collection 是否有詞彙索引"""
+        sparse_vectors = self.client.get_collection(self.collection_name).config.params.sparse_vectors
+        self.has_lexical_index = SPARSE_VECTOR_NAME in (sparse_vectors or {})
+        if config.LEXICAL_INDEX_ENABLED and not self.has_lexical_index:
+            print("collection 沒有詞彙索引，搜尋只使用向量（執行 migrate_collection.py 後才會啟用混合檢索）",
+                  file=sys.stderr)
+        self._collection_ready = True
+
+    def _check_collection(self) -> bool:
+        """
+        唯讀開啟時確認 collection 是否已由寫入程序建立（不存在時不建立）
+
+        Returns:
+            collection 是否存在
+        """
+        if not self._collection_ready and self.client.collection_exists(self.collection_name):
+            self._read_collection_info()
+        return self._collection_ready
+
+    @staticmethod
+    def _quantization_config():
+        """依 config.VECTOR_QUANTIZATION 建立量化設定（未啟用時回傳 None）"""
+        if config.VECTOR_QUANTIZATION is None:
+            return None
+        if config.VECTOR_QUANTIZATION == 'scalar':
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                quantile=0.99,
+                always_ram=config.QUANTIZATION_ALWAYS_RAM
+            ))
+        if config.VECTOR_QUANTIZATION == 'binary':
+            return BinaryQuantization(binary=BinaryQuantizationConfig(
+                always_ram=config.QUANTIZATION_ALWAYS_RAM
+            ))
+        raise ValueError(f"未知的量化方式: {config.VECTOR_QUANTIZATION}（可用: scalar, binary）")
+
+    @classmethod
+    def _collection_params(cls) -> Dict:
+        """建立 collection 的參數（向量、稀疏向量、HNSW、量化與磁碟存放設定）"""
+        return {
+            'vectors_config': VectorParams(
+                size=config.VECTOR_SIZE,
+                distance=Distance.COSINE,
+                on_disk=config.VECTORS_ON_DISK
+            ),
+            # BM25 稀疏向量：文件端存詞頻權重，IDF 由 Qdrant 依 collection 統計計算
+            'sparse_vectors_config': {
+                SPARSE_VECTOR_NAME: SparseVectorParams(
+                    modifier=Modifier.IDF,
+                    index=SparseIndexParams(on_disk=config.VECTORS_ON_DISK)
+                )
+            } if config.LEXICAL_INDEX_ENABLED else None,
+            'hnsw_config': HnswConfigDiff(
+                m=config.HNSW_M,
+                ef_construct=config.HNSW_EF_CONSTRUCT,
+                on_disk=config.HNSW_ON_DISK
+            ),
+            'quantization_config': cls._quantization_config(),
+            'on_disk_payload': config.PAYLOAD_ON_DISK,
+        }
+
+    @staticmethod
+    def _search_params() -> Optional[SearchParams]:
+        """向量搜尋參數（HNSW ef 與量化搜尋的重新計分、過採樣）"""
+        if config.HNSW_EF is None and config.VECTOR_QUANTIZATION is None:
+            return None
+        return SearchParams(
+            hnsw_ef=config.HNSW_EF,
+            quantization=QuantizationSearchParams(
+                rescore=config.QUANTIZATION_RESCORE,
+                oversampling=config.QUANTIZATION_OVERSAMPLING
+            ) if config.VECTOR_QUANTIZATION else None
+        )
+
+    def _ensure_payload_indexes(self):
+        """為過濾用的 payload 欄位建立索引（已存在的索引會略過）"""
+        if self.is_local:
+            # 本地模式不支援 payload 索引，過濾一律為全掃描
+            return
+
+        payload_schema = self.client.get_collection(self.collection_name).payload_schema
+        for field_name, schema in config.PAYLOAD_INDEX_FIELDS.items():
+            if field_name not in payload_schema:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=PayloadSchemaType(schema)
+                )
+                print(f"建立 payload 索引: {field_name} ({schema})", file=sys.stderr)
+
+    @staticmethod
+    def _filter(data_names: Optional[List[str]] = None,
+                file_name: Optional[str] = None) -> Optional[Filter]:
+        """建立 (資料名稱, 檔名) 的過濾條件"""
+        conditions = []
+        if data_names:
+            conditions.append(FieldCondition(key='data_name', match=MatchAny(any=list(data_names))))
+        if file_name is not None:
+            conditions.append(FieldCondition(key='file_name', match=MatchValue(value=file_name)))
+        return Filter(must=conditions) if conditions else None
+
+    @staticmethod
+    def _point_vector(embedding, chunk: str, with_lexical: bool, sparse: SparseVector = None):
+        """
+        點的向量：稠密向量，有詞彙索引時加上 BM25 稀疏向量
+
+        Args:
+            embedding: 稠密向量
+            chunk: 分塊文字（計算稀疏向量用）
+            with_lexical: collection 是否有詞彙索引
+            sparse: 已有的稀疏向量（可選，遷移時沿用）
+        """
+        if hasattr(embedding, 'tolist'):
+            # float32 陣列只在送出給 Qdrant 客戶端時才轉為 Python 列表
+            embedding = embedding.tolist()
+        if not with_lexical:
+            return embedding
+        if sparse is None:
+            indices, values = lexical.document_vector(chunk)
+            sparse = SparseVector(indices=indices, values=values)
+        return {'': embedding, SPARSE_VECTOR_NAME: sparse}
+
+    def upsert(self, points: List[Point]):
+        self._check_writable()
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                PointStruct(
+                    id=point_id,
+                    vector=self._point_vector(vector, payload['text'], self.has_lexical_index),
+                    payload=payload
+                )
+                for point_id, vector, payload in points
+            ],
+            wait=True
+        )
+
+    def retrieve(self, point_ids: List[str], fields: List[str]) -> Dict[str, Dict]:
+        payloads = {}
+        if not self._check_collection():
+            return payloads
+        for start in range(0, len(point_ids), 1000):
+            for point in self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=point_ids[start:start + 1000],
+                with_payload=fields,
+                with_vectors=False
+            ):
+                payloads[str(point.id)] = point.payload
+        return payloads
+
+    def _scroll(self, scroll_filter: Optional[Filter], batch_size: int,
+                with_payload, with_vectors: bool, collection_name: str = None):
+        """分頁走訪所有符合條件的點（每次產生一頁）"""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name or self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=with_vectors
+            )
+            if points:
+                yield points
+            if offset is None:
+                break
+
+    def iter_payloads(self, fields: List[str], data_names: Optional[List[str]] = None,
+                      file_name: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        if not self._check_collection():
+            return
+        for points in self._scroll(self._filter(data_names, file_name), 1000, fields, False):
+            for point in points:
+                yield str(point.id), point.payload
+
+    @staticmethod
+    def _split_vector(vector):
+        """將 Qdrant 回傳的向量拆成 (稠密向量, 稀疏向量)"""
+        if isinstance(vector, dict):
+            return vector[''], vector.get(SPARSE_VECTOR_NAME)
+        return vector, None
+
+    def iter_points(self, batch_size: int, data_names: Optional[List[str]] = None) -> Iterator[List[Point]]:
+        if not self._check_collection():
+            return
+        for points in self._scroll(self._filter(data_names), batch_size, True, True):
+            yield [
+                (str(point.id), np.asarray(self._split_vector(point.vector)[0], dtype=np.float32),
+                 point.payload)
+                for point in points
+            ]
+
+    def set_payloads(self, payloads: Dict[str, Dict]):
+        self._check_writable()
+        self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=[
+                SetPayloadOperation(set_payload=SetPayload(payload=payload, points=[point_id]))
+                for point_id, payload in payloads.items()
+            ]
+        )
+
+    def set_file_payload(self, data_name: str, file_name: str, payload: Dict):
+        self._check_writable()
+        self.client.set_payload(
+            collection_name=self.collection_name,
+            payload=payload,
+            points=self._filter([data_name], file_name)
+        )
+
+    def delete(self, point_ids: List[str]):
+        self._check_writable()
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=PointIdsList(points=list(point_ids))
+        )
+
+    def delete_where(self, data_names: List[str], file_name: Optional[str] = None) -> int:
+        self._check_writable()
+        # 以伺服器端過濾條件刪除（不需先取回點 ID）
+        delete_filter = self._filter(data_names, file_name)
+        total = self.count(data_names, file_name)
+        if total:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=FilterSelector(filter=delete_filter),
+                wait=True
+            )
+        return total
+
+    def count(self, data_names: Optional[List[str]] = None, file_name: Optional[str] = None) -> int:
+        if not self._check_collection():
+            return 0
+        return self.client.count(
+            collection_name=self.collection_name,
+            count_filter=self._filter(data_names, file_name),
+            exact=True
+        ).count
+
+    # ---- 儲存端的資料目錄 ----
+
+    @staticmethod
+    def _catalog_id(data_name: str, file_name: str) -> str:
+        return str(uuid.uuid5(_CATALOG_ID_NAMESPACE, f"{data_name}\0{file_name}"))
+
+    def _ensure_catalog_collection(self):
+        """確保資料目錄的 collection 存在（只有 payload，不存向量）"""
+        if self._catalog_ready:
+            return
+        if not self.client.collection_exists(self.catalog_collection_name):
+            self.client.create_collection(collection_name=self.catalog_collection_name,
+                                          vectors_config={})
+            if not self.is_local:
+                self.client.create_payload_index(
+                    collection_name=self.catalog_collection_name,
+                    field_name='data_name',
+                    field_schema=PayloadSchemaType.KEYWORD
+                )
+            print(f"建立 collection: {self.catalog_collection_name}", file=sys.stderr)
+        self._catalog_ready = True
+
+    def read_catalog(self) -> Optional[List[Dict]]:
+        if not self._catalog_ready and not self.client.collection_exists(self.catalog_collection_name):
+            return None
+        return [
+            point.payload
+            for points in self._scroll(None, 1000, True, False, self.catalog_collection_name)
+            for point in points
+        ]
+
+    def write_catalog(self, records: List[Dict], replace: bool = False):
+        self._check_writable()
+        self._ensure_catalog_collection()
+        points = [
+            PointStruct(id=self._catalog_id(record['data_name'], record['file_name']),
+                        vector={}, payload=dict(record))
+            for record in records
+        ]
+        for start in range(0, len(points), 1000):
+            self.client.upsert(collection_name=self.catalog_collection_name,
+                               points=points[start:start + 1000], wait=True)
+        if replace:
+            # 先寫入新記錄再移除多餘的記錄，讀取的程序不會看到空的目錄
+            keep = {point.id for point in points}
+            stale = [str(point.id)
+                     for batch in self._scroll(None, 1000, False, False, self.catalog_collection_name)
+                     for point in batch if str(point.id) not in keep]
+            if stale:
+                self.client.delete(collection_name=self.catalog_collection_name,
+                                   points_selector=PointIdsList(points=stale), wait=True)
+
+    def invalidate_catalog_file(self, data_name: str, file_name: str):
+        self._check_writable()
+        self._ensure_catalog_collection()
+        point_id = self._catalog_id(data_name, file_name)
+        if self.client.retrieve(collection_name=self.catalog_collection_name, ids=[point_id],
+                                with_payload=False, with_vectors=False):
+            self.client.set_payload(collection_name=self.catalog_collection_name,
+                                    payload={'file_hash': None}, points=[point_id], wait=True)
+        else:
+            self.write_catalog([{'data_name': data_name, 'file_name': file_name, 'file_hash': None,
+                                 'chunk_count': 0, 'byte_size': 0}])
+
+    def delete_catalog(self, data_name: str, file_name: Optional[str] = None):
+        self._check_writable()
+        self._ensure_catalog_collection()
+        if file_name is not None:
+            selector = PointIdsList(points=[self._catalog_id(data_name, file_name)])
+        else:
+            selector = FilterSelector(filter=self._filter([data_name]))
+        self.client.delete(collection_name=self.catalog_collection_name,
+                           points_selector=selector, wait=True)
+
+    @staticmethod
+    def _format_hit(result) -> Dict:
+        """將 Qdrant 搜尋結果轉換為字典"""
+        return {
+            'score': result.score,
+            'text': result.payload['text'],
+            'file_name': result.payload['file_name'],
+            'data_name': result.payload['data_name'],
+            'chunk_index': result.payload['chunk_index']
+        }
+
+    def search(self, vectors: Optional[np.ndarray], sparse_vectors: Optional[List[Tuple]],
+               data_names: Optional[List[str]], limit: int) -> List[List[Dict]]:
+        if not self._check_collection():
+            return [[] for _ in range(len(vectors if vectors is not None else []) + len(sparse_vectors or []))]
+        query_filter = self._filter(data_names)
+        search_params = self._search_params()
+
+        # 向量與詞彙查詢放在同一個批次請求中
+        requests = []
+        if vectors is not None:
+            requests.extend(
+                SearchRequest(
+                    vector=vector.tolist() if hasattr(vector, 'tolist') else vector,
+                    filter=query_filter,
+                    limit=limit,
+                    params=search_params,
+                    with_payload=True
+                )
+                for vector in vectors
+            )
+        if sparse_vectors is not None:
+            requests.extend(
+                SearchRequest(
+                    vector=NamedSparseVector(
+                        name=SPARSE_VECTOR_NAME,
+                        vector=SparseVector(indices=indices, values=values)
+                    ),
+                    filter=query_filter,
+                    limit=limit,
+                    with_payload=True
+                )
+                for indices, values in sparse_vectors
+            )
+
+        batch_results = self.client.search_batch(
+            collection_name=self.collection_name,
+            requests=requests
+        )
+        return [[self._format_hit(result) for result in results] for results in batch_results]
+
+    def _copy_points(self, source: str, target: str, with_lexical: bool, batch_size: int,
+                     progress_callback=None) -> int:
+        """分批複製所有點（含向量與 payload），目標需要而來源沒有稀疏向量時由分塊文字計算"""
+        copied = 0
+        for points in self._scroll(None, batch_size, True, True, collection_name=source):
+            batch = []
+            for point in points:
+                embedding, sparse = self._split_vector(point.vector)
+                batch.append(PointStruct(
+                    id=point.id,
+                    vector=self._point_vector(embedding, point.payload.get('text', ''),
+                                              with_lexical, sparse),
+                    payload=point.payload
+                ))
+            self.client.upsert(collection_name=target, points=batch)
+            copied += len(batch)
+            if progress_callback:
+                progress_callback(copied)
+        return copied
+
+    def migrate(self, batch_size: int, progress_callback=None) -> str:
+        """
+        Qdrant Server 上量化、HNSW 與磁碟存放設定可直接更新（Qdrant 在背景重建索引）；
+        需要新增詞彙索引時則複製到暫存 collection、以新設定重建後再複製回來。
+        中斷後重新執行會從中斷的階段繼續。
+        """
+        self._check_writable()
+        temp_name = f"{self.collection_name}_migration"
+        with_lexical = config.LEXICAL_INDEX_ENABLED
+
+        resuming = self.client.collection_exists(temp_name)
+        if not resuming and (self.has_lexical_index or not with_lexical):
+            if self.is_local:
+                # 本地模式為暴力搜尋，量化、HNSW 與磁碟設定不影響儲存與搜尋
+                print("本地模式不使用量化與 HNSW 設定，collection 無需遷移", file=sys.stderr)
+                return 'unchanged'
+            self.client.update_collection(
+                collection_name=self.collection_name,
+                vectors_config={'': VectorParamsDiff(on_disk=config.VECTORS_ON_DISK)},
+                hnsw_config=HnswConfigDiff(
+                    m=config.HNSW_M,
+                    ef_construct=config.HNSW_EF_CONSTRUCT,
+                    on_disk=config.HNSW_ON_DISK
+                ),
+                quantization_config=self._quantization_config() or Disabled.DISABLED,
+                collection_params=CollectionParamsDiff(on_disk_payload=config.PAYLOAD_ON_DISK)
+            )
+            print("已更新 collection 設定，Qdrant 會在背景重建索引", file=sys.stderr)
+            return 'updated'
+
+        params = self._collection_params()
+        # 暫存 collection 的點數不少於原 collection 表示第一階段已完成
+        # （第二階段中斷時原 collection 只有部分點）
+        first_stage_done = resuming and (
+            self.client.count(temp_name, exact=True).count
+            >= self.client.count(self.collection_name, exact=True).count
+        )
+        if not first_stage_done:
+            # 第一階段：複製到暫存 collection
+            if resuming:
+                self.client.delete_collection(temp_name)
+            self.client.create_collection(collection_name=temp_name, **params)
+            copied = self._copy_points(self.collection_name, temp_name, with_lexical,
+                                       batch_size, progress_callback)
+            print(f"已複製 {copied} 個點到暫存 collection", file=sys.stderr)
+
+        # 第二階段：以新設定重建原 collection 並複製回來
+        self.client.delete_collection(self.collection_name)
+        self.client.create_collection(collection_name=self.collection_name, **params)
+        copied = self._copy_points(temp_name, self.collection_name, with_lexical,
+                                   batch_size, progress_callback)
+        self.client.delete_collection(temp_name)
+        print(f"已重建 collection: {copied} 個點", file=sys.stderr)
+
+        self._ensure_collection()
+        return 'rebuilt'
+
+    def stats(self) -> Dict:
+        if not self._check_collection():
+            return {'total_points': 0, 'vector_size': config.VECTOR_SIZE}
+        collection_info = self.client.get_collection(self.collection_name)
+        return {
+            'total_points': collection_info.points_count,
+            'vector_size': collection_info.config.params.vectors.size,
+        }
+
+
+class NumpyStore(VectorStore):
+    """
+    NumPy 記憶體映射儲存（小型部署用，啟動時不需載入整個資料庫）
+
+    - vectors-<世代>.f32: (容量, 維度) 的 float32 記憶體映射矩陣，每列一個 L2 正規化向量
+    - text-<世代>.bin: 分塊文字（UTF-8，只附加）
+    - columns.npz: 欄位式 payload（點 ID、資料名稱/檔名/檔案雜湊代碼、chunk_index、
+      分塊雜湊、文字位置、刪除標記與 IVF 分群），每次儲存以整檔替換
+    精確搜尋以分塊矩陣乘法計算；設定 NUMPY_IVF_LISTS 且點數達 NUMPY_IVF_MIN_POINTS 時，
+    每個查詢只計算最接近的 NUMPY_IVF_PROBES 個群。
+
+    同一時間只能有一個寫入程序；唯讀程序（例如多個 MCP Server）以唯讀模式映射同一個檔案，
+    共用作業系統的頁面快取，並在 columns.npz 更新後自動重新載入。
+    向量檔只附加不覆寫（更新既有的點時寫入新列、舊列標記為刪除），
+    唯讀程序讀取的列在寫入期間不會改變。
+    寫入每 NUMPY_STORE_FLUSH_SECONDS 秒才儲存一次，匯入或刪除結束時再呼叫 flush() 儲存，
+    中斷時未儲存的點會在下次匯入時重新寫入。
+    """
+
+    _STRING_FIELDS = ('data_name', 'file_name', 'file_hash')
+
+    def __init__(self, read_only: bool = False, path: str = None):
+        """
+        Args:
+            read_only: 唯讀開啟（不取得寫入鎖，資料更新時自動重新載入）
+            path: 儲存目錄（預設 config.NUMPY_STORE_PATH）
+        """
+        self.path = path or config.NUMPY_STORE_PATH
+        self.read_only = read_only
+        self.dimension = config.VECTOR_SIZE
+        self._lock = threading.RLock()
+        self._columns_path = os.path.join(self.path, "columns.npz")
+        self._columns_stamp = None
+        self._lock_file = None
+        self._text_file = None
+        self._dirty = False
+        self._last_flush = time.time()
+        self._revision = 0
+        # 壓縮後被取代的舊世代檔案（新的 columns.npz 發佈後才刪除）
+        self._stale_paths: List[str] = []
+
+        if not read_only:
+            os.makedirs(self.path, exist_ok=True)
+            self._acquire_writer_lock()
+        self._load()
+        if not read_only:
+            atexit.register(self.close)
+
+    # ---- 檔案配置 ----
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors-{generation}.f32")
+
+    def _text_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"text-{generation}.bin")
+
+    def _acquire_writer_lock(self):
+        """取得寫入鎖（同一時間只能有一個寫入程序）"""
+        self._lock_file = open(os.path.join(self.path, "writer.lock"), "a")
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise RuntimeError(f"向量儲存已由其他程序以寫入模式開啟: {self.path}（其他程序請使用唯讀模式）")
+
+    def _empty_columns(self, capacity: int) -> Dict[str, np.ndarray]:
+        return {
+            'id': np.zeros((capacity, 16), dtype=np.uint8),
+            'data_name': np.zeros(capacity, dtype=np.int32),
+            'file_name': np.zeros(capacity, dtype=np.int32),
+            'file_hash': np.full(capacity, -1, dtype=np.int32),
+            'chunk_index': np.zeros(capacity, dtype=np.int32),
+            'chunk_hash': np.zeros((capacity, 32), dtype=np.uint8),
+            'text_offset': np.zeros(capacity, dtype=np.int64),
+            'text_length': np.zeros(capacity, dtype=np.int32),
+            'alive': np.zeros(capacity, dtype=bool),
+            'ivf_list': np.full(capacity, -1, dtype=np.int32),
+        }
+
+    def _load(self):
+        """載入欄位並映射向量檔（唯讀程序在資料更新時重新呼叫）"""
+        with self._lock:
+            for _ in range(10):
+                try:
+                    return self._load_columns()
+                except FileNotFoundError:
+                    # 讀取舊的 columns.npz 後寫入程序完成壓縮並刪除了舊世代的檔案，重新讀取
+                    if not self.read_only:
+                        raise
+                    time.sleep(0.05)
+            return self._load_columns()
+
+    def _load_columns(self):
+        with self._lock:
+            # 先取得檔案狀態再讀取：讀取期間檔案被替換時，下次存取會再重新載入
+            stamp = self._stat_columns()
+            if stamp is not None:
+                with np.load(self._columns_path) as data:
+                    meta = json.loads(str(data['meta']))
+                    count = meta['count']
+                    columns = {name: data[name] for name in self._empty_columns(0)}
+                    centroids = data['ivf_centroids'] if 'ivf_centroids' in data else None
+            else:
+                meta = {'count': 0, 'generation': 0, 'dimension': self.dimension,
+                        'strings': {name: [] for name in self._STRING_FIELDS}, 'ivf_trained': 0}
+                count = 0
+                columns = self._empty_columns(0)
+                centroids = None
+
+            if meta['dimension'] != self.dimension:
+                raise ValueError(f"向量儲存的維度 {meta['dimension']} 與設定 {self.dimension} 不符")
+
+            self._columns_stamp = stamp
+            self._generation = meta['generation']
+            self._count = count
+            self._strings = meta['strings']
+            self._codes = {name: {value: code for code, value in enumerate(values)}
+                           for name, values in self._strings.items()}
+            self._ivf_centroids = centroids
+            self._ivf_trained = meta['ivf_trained']
+            self._ivf_order = None
+            self._row_of = None
+
+            vectors_path = self._vectors_path(self._generation)
+            text_path = self._text_path(self._generation)
+            if self.read_only:
+                if count:
+                    # 先開啟檔案：已被刪除時（FileNotFoundError）由 _load 重新讀取欄位
+                    text_file = open(text_path, "rb")
+                    try:
+                        rows = os.path.getsize(vectors_path) // (self.dimension * 4)
+                        vectors = np.memmap(vectors_path, dtype=np.float32, mode='r',
+                                            shape=(rows, self.dimension))
+                    except OSError:
+                        text_file.close()
+                        raise
+                else:
+                    text_file = None
+                    vectors = np.zeros((0, self.dimension), dtype=np.float32)
+                self._columns = columns
+                self._capacity = count
+                self._vectors = vectors
+                if self._text_file is not None:
+                    self._text_file.close()
+                self._text_file = text_file
+                return
+
+            # 寫入程序：移除上次壓縮後未刪除的舊世代檔案
+            current = {os.path.basename(vectors_path), os.path.basename(text_path)}
+            for name in os.listdir(self.path):
+                if name.startswith(("vectors-", "text-")) and name not in current:
+                    self._stale_paths.append(os.path.join(self.path, name))
+            self._remove_stale_files()
+
+            # 寫入程序：欄位保留成長空間
+            capacity = max(count, 1024)
+            self._columns = self._empty_columns(capacity)
+            for name, values in columns.items():
+                self._columns[name][:count] = values
+            self._capacity = capacity
+            self._open_vectors(vectors_path, capacity)
+            self._text_file = open(text_path, "a+b")
+            self._text_file.seek(0, os.SEEK_END)
+            self._text_size = self._text_file.tell()
+
+    def _open_vectors(self, vectors_path: str, capacity: int):
+        """以讀寫模式映射向量檔（檔案不足容量時擴大）"""
+        needed = capacity * self.dimension * 4
+        with open(vectors_path, "a+b") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < needed:
+                f.truncate(needed)
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode='r+',
+                                  shape=(capacity, self.dimension))
+
+    def _stat_columns(self):
+        try:
+            st = os.stat(self._columns_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _refresh(self):
+        """唯讀程序：columns.npz 更新後重新載入"""
+        if self.read_only and self._stat_columns() != self._columns_stamp:
+            self._load()
+            self._revision += 1
+
+    @property
+    def revision(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._revision
+
+    def _reserve(self, needed: int):
+        """確保欄位與向量檔至少有 needed 列"""
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2)
+        columns = self._empty_columns(capacity)
+        for name, values in self._columns.items():
+            columns[name][:self._count] = values[:self._count]
+        self._columns = columns
+        self._vectors.flush()
+        self._open_vectors(self._vectors_path(self._generation), capacity)
+        self._capacity = capacity
+
+    # ---- 代碼與 payload ----
+
+    def _code(self, field: str, value: Optional[str]) -> int:
+        """字串欄位的代碼（新值會加入字典）"""
+        if value is None:
+            return -1
+        code = self._codes[field].get(value)
+        if code is None:
+            code = len(self._strings[field])
+            self._strings[field].append(value)
+            self._codes[field][value] = code
+        return code
+
+    def _rows(self) -> Dict[str, int]:
+        """點 ID → 列（第一次使用時建立）"""
+        if self._row_of is None:
+            ids = self._columns['id'][:self._count]
+            alive = self._columns['alive'][:self._count]
+            self._row_of = {
+                str(uuid.UUID(bytes=ids[row].tobytes())): int(row)
+                for row in np.flatnonzero(alive)
+            }
+        return self._row_of
+
+    def _read_text(self, row: int, columns: Dict[str, np.ndarray] = None, text_file=None) -> str:
+        columns = self._columns if columns is None else columns
+        offset = int(columns['text_offset'][row])
+        length = int(columns['text_length'][row])
+        with self._lock:
+            text_file = text_file or self._text_file
+            text_file.seek(offset)
+            data = text_file.read(length)
+        return data.decode("utf-8")
+
+    def _payload(self, row: int, fields: Optional[List[str]] = None,
+                 columns: Dict[str, np.ndarray] = None, text_file=None) -> Dict:
+        """列的 payload（columns / text_file 為 iter_points 取得的快照，預設使用目前的欄位與文字檔）"""
+        columns = self._columns if columns is None else columns
+        payload = {}
+        for field in fields or ('text', 'file_name', 'data_name', 'chunk_index', 'chunk_hash', 'file_hash'):
+            if field == 'text':
+                payload['text'] = self._read_text(row, columns, text_file)
+            elif field == 'chunk_index':
+                payload['chunk_index'] = int(columns['chunk_index'][row])
+            elif field == 'chunk_hash':
+                payload['chunk_hash'] = columns['chunk_hash'][row].tobytes().hex()
+            elif field in self._STRING_FIELDS:
+                code = int(columns[field][row])
+                payload[field] = self._strings[field][code] if code >= 0 else None
+        return payload
+
+    def _mask(self, data_names: Optional[List[str]] = None,
+              file_name: Optional[str] = None) -> np.ndarray:
+        """符合條件且未刪除的列"""
+        columns = self._columns
+        mask = columns['alive'][:self._count].copy()
+        if data_names:
+            codes = [self._codes['data_name'][name] for name in data_names
+                     if name in self._codes['data_name']]
+            mask &= np.isin(columns['data_name'][:self._count], codes)
+        if file_name is not None:
+            mask &= columns['file_name'][:self._count] == self._codes['file_name'].get(file_name, -2)
+        return mask
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    # ---- 寫入 ----
+
+    def upsert(self, points: List[Point]):
+        self._check_writable()
+        if not points:
+            return
+        vectors = self._normalize([vector for _, vector, _ in points])
+        with self._lock:
+            rows = self._rows()
+            columns = self._columns
+            for i, (point_id, _, payload) in enumerate(points):
+                # 既有的點不在原列覆寫（唯讀程序可能正在讀取該列），
+                # 改為附加新列並將舊列標記為刪除，由壓縮回收
+                old_row = rows.get(point_id)
+                if old_row is not None:
+                    columns['alive'][old_row] = False
+                row = self._count
+                self._reserve(row + 1)
+                columns = self._columns
+                self._count += 1
+                rows[point_id] = row
+                columns['id'][row] = np.frombuffer(uuid.UUID(point_id).bytes, dtype=np.uint8)
+                self._vectors[row] = vectors[i]
+
+                text = payload['text'].encode("utf-8")
+                self._text_file.write(text)
+                columns['text_offset'][row] = self._text_size
+                columns['text_length'][row] = len(text)
+                self._text_size += len(text)
+
+                columns['data_name'][row] = self._code('data_name', payload['data_name'])
+                columns['file_name'][row] = self._code('file_name', payload['file_name'])
+                columns['file_hash'][row] = self._code('file_hash', payload.get('file_hash'))
+                columns['chunk_index'][row] = payload['chunk_index']
+                columns['chunk_hash'][row] = np.frombuffer(bytes.fromhex(payload['chunk_hash']), dtype=np.uint8)
+                columns['alive'][row] = True
+                if self._ivf_centroids is not None:
+                    columns['ivf_list'][row] = int(np.argmax(self._ivf_centroids @ vectors[i]))
+
+            self._ivf_order = None
+            self._mark_dirty()
+
+    def set_payloads(self, payloads: Dict[str, Dict]):
+        self._check_writable()
+        with self._lock:
+            rows = self._rows()
+            for point_id, payload in payloads.items():
+                row = rows.get(point_id)
+                if row is None:
+                    continue
+                for field, value in payload.items():
+                    if field in self._STRING_FIELDS:
+                        self._columns[field][row] = self._code(field, value)
+                    elif field == 'chunk_index':
+                        self._columns['chunk_index'][row] = value
+                    else:
+                        raise ValueError(f"NumPy 儲存不支援更新欄位: {field}")
+            self._mark_dirty()
+
+    def set_file_payload(self, data_name: str, file_name: str, payload: Dict):
+        self._check_writable()
+        with self._lock:
+            mask = self._mask([data_name], file_name)
+            for field, value in payload.items():
+                if field not in self._STRING_FIELDS:
+                    raise ValueError(f"NumPy 儲存不支援更新欄位: {field}")
+                self._columns[field][:self._count][mask] = self._code(field, value)
+            self._mark_dirty()
+
+    def delete(self, point_ids: List[str]):
+        self._check_writable()
+        with self._lock:
+            rows = self._rows()
+            for point_id in point_ids:
+                row = rows.pop(point_id, None)
+                if row is not None:
+                    self._columns['alive'][row] = False
+            self._mark_dirty()
+
+    def delete_where(self, data_names: List[str], file_name: Optional[str] = None) -> int:
+        self._check_writable()
+        with self._lock:
+            mask = self._mask(data_names, file_name)
+            total = int(mask.sum())
+            if total:
+                self._columns['alive'][:self._count][mask] = False
+                self._row_of = None
+                self._mark_dirty()
+            return total
+
+    def _mark_dirty(self):
+        """標記有尚未儲存的寫入，距離上次儲存超過 NUMPY_STORE_FLUSH_SECONDS 秒時才儲存"""
+        self._dirty = True
+        if time.time() - self._last_flush >= config.NUMPY_STORE_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        """儲存向量、文字與欄位（欄位檔整檔替換，唯讀程序看到的永遠是完整的版本）"""
+        with self._lock:
+            if self.read_only or not self._dirty:
+                return
+            self._maybe_compact()
+            self._maybe_train_ivf()
+            self._vectors.flush()
+            self._text_file.flush()
+            os.fsync(self._text_file.fileno())
+
+            meta = {
+                'count': self._count,
+                'generation': self._generation,
+                'dimension': self.dimension,
+                'strings': self._strings,
+                'ivf_trained': self._ivf_trained,
+            }
+            arrays = {name: values[:self._count] for name, values in self._columns.items()}
+            if self._ivf_centroids is not None:
+                arrays['ivf_centroids'] = self._ivf_centroids
+            temp_path = self._columns_path + ".tmp.npz"
+            np.savez(temp_path, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+            os.replace(temp_path, self._columns_path)
+            self._dirty = False
+            self._last_flush = time.time()
+            # 新的欄位檔已指向新世代，此後開啟的唯讀程序不會再使用舊檔
+            self._remove_stale_files()
+
+    def _remove_stale_files(self):
+        """刪除壓縮前的舊世代檔案（已映射的唯讀程序仍可讀取到關閉為止）"""
+        remaining = []
+        for path in self._stale_paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # 唯讀程序仍映射舊檔時（Windows）無法刪除，留待下次儲存
+                remaining.append(path)
+        self._stale_paths = remaining
+
+    def _maybe_compact(self):
+        """刪除的列超過 NUMPY_COMPACT_RATIO 時，把未刪除的列複製到新世代的檔案"""
+        alive = self._columns['alive'][:self._count]
+        deleted = self._count - int(alive.sum())
+        if deleted == 0 or deleted < self._count * config.NUMPY_COMPACT_RATIO:
+            return
+        rows = np.flatnonzero(alive)
+        generation = self._generation + 1
+        capacity = max(len(rows), 1024)
+
+        columns = self._empty_columns(capacity)
+        for name, values in self._columns.items():
+            columns[name][:len(rows)] = values[rows]
+        vectors = np.memmap(self._vectors_path(generation), dtype=np.float32, mode='w+',
+                            shape=(capacity, self.dimension))
+        with open(self._text_path(generation), "wb") as text_file:
+            offset = 0
+            for new_row, row in enumerate(rows):
+                vectors[new_row] = self._vectors[row]
+                text = self._read_text(row).encode("utf-8")
+                text_file.write(text)
+                columns['text_offset'][new_row] = offset
+                offset += len(text)
+        vectors.flush()
+
+        old_paths = [self._vectors_path(self._generation), self._text_path(self._generation)]
+        self._text_file.close()
+        self._columns = columns
+        self._vectors = vectors
+        self._capacity = capacity
+        self._count = len(rows)
+        self._generation = generation
+        self._ivf_order = None
+        self._row_of = None
+        self._text_file = open(self._text_path(generation), "a+b")
+        self._text_file.seek(0, os.SEEK_END)
+        self._text_size = self._text_file.tell()
+        # 唯讀程序可能仍依舊的 columns.npz 開啟舊檔，等 flush 發佈新的欄位檔後才刪除
+        self._stale_paths.extend(old_paths)
+        print(f"壓縮向量儲存: 移除 {deleted} 個已刪除的點", file=sys.stderr)
+
+    def _maybe_train_ivf(self):
+        """點數達門檻且比上次訓練時多一倍以上時，重新訓練 IVF 粗分群"""
+        lists = config.NUMPY_IVF_LISTS
+        alive_rows = np.flatnonzero(self._columns['alive'][:self._count])
+        if not lists or len(alive_rows) < max(config.NUMPY_IVF_MIN_POINTS, lists):
+            return
+        if self._ivf_centroids is not None and len(alive_rows) < 2 * self._ivf_trained:
+            return
+
+        # 球面 k-means（向量已正規化，以內積分群）
+        rng = np.random.default_rng(0)
+        sample_size = min(len(alive_rows), lists * config.NUMPY_IVF_TRAIN_PER_LIST)
+        sample = np.sort(rng.choice(alive_rows, sample_size, replace=False))
+        data = np.asarray(self._vectors[sample])
+        centroids = data[rng.choice(len(data), lists, replace=False)].copy()
+        for _ in range(config.NUMPY_IVF_ITERATIONS):
+            assign = self._nearest_lists(data, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            counts = np.bincount(assign, minlength=lists)
+            nonempty = counts > 0
+            centroids[nonempty] = self._normalize(sums[nonempty])
+
+        ivf_list = self._columns['ivf_list']
+        block = config.NUMPY_SEARCH_BLOCK_ROWS
+        for start in range(0, self._count, block):
+            stop = min(start + block, self._count)
+            ivf_list[start:stop] = self._nearest_lists(np.asarray(self._vectors[start:stop]), centroids)
+        self._ivf_centroids = centroids
+        self._ivf_trained = len(alive_rows)
+        self._ivf_order = None
+        print(f"訓練 IVF 索引: {lists} 個群，{len(alive_rows)} 個點", file=sys.stderr)
+
+    @staticmethod
+    def _nearest_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    # ---- 讀取 ----
+
+    def retrieve(self, point_ids: List[str], fields: List[str]) -> Dict[str, Dict]:
+        with self._lock:
+            self._refresh()
+            rows = self._rows()
+            return {
+                point_id: self._payload(rows[point_id], fields)
+                for point_id in point_ids if point_id in rows
+            }
+
+    def iter_payloads(self, fields: List[str], data_names: Optional[List[str]] = None,
+                      file_name: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        with self._lock:
+            self._refresh()
+            rows = np.flatnonzero(self._mask(data_names, file_name))
+            ids = self._columns['id']
+            items = [
+                (str(uuid.UUID(bytes=ids[row].tobytes())), self._payload(row, fields))
+                for row in rows
+            ]
+        yield from items
+
+    def iter_points(self, batch_size: int, data_names: Optional[List[str]] = None) -> Iterator[List[Point]]:
+        # 走訪期間可能有寫入、刪除、壓縮或重新載入（列號會改變），
+        # 因此先複製符合條件的列的欄位，並保留目前世代的向量映射與自己的文字檔讀取控制代碼
+        with self._lock:
+            self._refresh()
+            rows = np.flatnonzero(self._mask(data_names))
+            if not len(rows):
+                return
+            columns = {name: values[rows] for name, values in self._columns.items()}
+            vectors = self._vectors
+            if not self.read_only:
+                self._text_file.flush()
+            text_file = open(self._text_path(self._generation), "rb")
+        try:
+            for start in range(0, len(rows), batch_size):
+                yield [
+                    (str(uuid.UUID(bytes=columns['id'][i].tobytes())),
+                     np.array(vectors[rows[i]]), self._payload(i, columns=columns, text_file=text_file))
+                    for i in range(start, min(start + batch_size, len(rows)))
+                ]
+        finally:
+            text_file.close()
+
+    def count(self, data_names: Optional[List[str]] = None, file_name: Optional[str] = None) -> int:
+        with self._lock:
+            self._refresh()
+            return int(self._mask(data_names, file_name).sum())
+
+    def search(self, vectors: Optional[np.ndarray], sparse_vectors: Optional[List[Tuple]],
+               data_names: Optional[List[str]], limit: int) -> List[List[Dict]]:
+        if sparse_vectors is not None:
+            raise ValueError("NumPy 儲存沒有詞彙索引")
+        queries = self._normalize(vectors)
+        # 整個搜尋持有鎖：唯讀程序重新載入時列號會改變
+        with self._lock:
+            self._refresh()
+            mask = self._mask(data_names)
+            candidates = np.flatnonzero(mask)
+            probes = None
+            if self._ivf_centroids is not None and len(candidates) > limit * config.NUMPY_IVF_PROBES:
+                order, offsets = self._inverted_lists()
+                probes = np.argsort(-(queries @ self._ivf_centroids.T), axis=1)[:, :config.NUMPY_IVF_PROBES]
+                probed = np.unique(probes)
+                if (offsets[probed + 1] - offsets[probed]).sum() * 2 > self._count:
+                    # 批次查詢涵蓋大部分的群時，一次矩陣乘法的精確搜尋較快
+                    probes = None
+            if probes is None:
+                rankings = self._exact_top_k(self._vectors, queries, candidates, limit)
+            else:
+                # IVF：每個查詢只計算最接近的幾個群；候選不足時改用精確搜尋
+                rankings = []
+                for query, lists in zip(queries, probes):
+                    rows = np.sort(np.concatenate([order[offsets[i]:offsets[i + 1]] for i in lists]))
+                    rows = rows[mask[rows]]
+                    if len(rows) < limit:
+                        rows = candidates
+                    rankings.extend(self._exact_top_k(self._vectors, query[None, :], rows, limit))
+
+            fields = ['text', 'file_name', 'data_name', 'chunk_index']
+            return [
+                [dict(score=float(score), **self._payload(row, fields)) for row, score in ranking]
+                for ranking in rankings
+            ]
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """依 IVF 群排序的列與各群的起始位置（資料變動後第一次搜尋時重建）"""
+        if self._ivf_order is None:
+            ivf_list = self._columns['ivf_list'][:self._count]
+            order = np.argsort(ivf_list, kind='stable')
+            offsets = np.searchsorted(ivf_list[order], np.arange(len(self._ivf_centroids) + 1))
+            self._ivf_order = (order, offsets)
+        return self._ivf_order
+
+    @staticmethod
+    def _exact_top_k(matrix: np.ndarray, queries: np.ndarray, rows: np.ndarray,
+                     limit: int) -> List[List[Tuple[int, float]]]:
+        """以分塊矩陣乘法計算候選列的內積，保留每個查詢的前 limit 名"""
+        count = len(queries)
+        best_scores = np.empty((count, 0), dtype=np.float32)
+        best_rows = np.empty((count, 0), dtype=np.int64)
+        contiguous = len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows)
+        block = config.NUMPY_SEARCH_BLOCK_ROWS
+        for start in range(0, len(rows), block):
+            block_rows = rows[start:start + block]
+            # 連續的列直接切片（不複製），否則依列索引取出
+            block_vectors = matrix[block_rows[0]:block_rows[-1] + 1] if contiguous else matrix[block_rows]
+            scores = queries @ np.asarray(block_vectors).T
+            k = min(limit, len(block_rows))
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, block_rows[top]], axis=1)
+            if best_scores.shape[1] > limit:
+                keep = np.argpartition(-best_scores, limit - 1, axis=1)[:, :limit]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [list(zip(best_rows[i].tolist(), best_scores[i].tolist())) for i in range(count)]
+
+    def stats(self) -> Dict:
+        return {
+            'total_points': self.count(),
+            'vector_size': self.dimension,
+        }
+
+    def close(self):
+        """儲存尚未寫入的資料並釋放寫入鎖"""
+        with self._lock:
+            if self._text_file is None or self._text_file.closed:
+                return
+            self.flush()
+            self._text_file.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+
+VECTOR_STORES = {
+    'qdrant': QdrantStore,
+    'numpy': NumpyStore,
+}
+
+
+def create_vector_store(name: str = None, read_only: bool = False) -> VectorStore:
+    """
+    依名稱建立向量儲存
+
+    Args:
+        name: 儲存名稱（預設 config.VECTOR_STORE）
+        read_only: 唯讀開啟（供只做搜尋的程序使用）
+
+    Returns:
+        VectorStore 實例
+    """
+    name = name or config.VECTOR_STORE
+    if name not in VECTOR_STORES:
+        raise ValueError(f"未知的向量儲存: {name}（可用: {', '.join(VECTOR_STORES)}）")
+    return VECTOR_STORES[name](read_only=read_only)